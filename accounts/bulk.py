@@ -0,0 +1,155 @@
+"""
+Streaming helpers for the import_users and export_users commands and the
+user admin's bulk actions.
+
+Rows are read and written one at a time through generators, grouped into
+fixed-size batches, and users are read back in primary-key order with keyset
+chunks, so memory use does not grow with the size of the file or table.
+"""
+
+import csv
+import json
+import os
+import sys
+from itertools import islice
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+from .models import CustomUser
+from .signals import users_deactivated
+
+
+FORMATS = ('csv', 'jsonl')
+USER_FIELDS = ('email', 'username', 'firstName', 'lastName', 'is_active', 'is_staff')
+
+
+def guess_format(path, default='csv'):
+    extension = os.path.splitext(path)[1].lstrip('.').lower()
+    return extension if extension in FORMATS else default
+
+
+def read_records(stream, fmt):
+    """Yield one dict per CSV row or JSON line."""
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+    else:
+        for line in stream:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def batched(iterable, size):
+    """Yield lists of up to ``size`` items."""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def split(items, parts):
+    """Split a list into at most ``parts`` contiguous chunks."""
+    size = -(-len(items) // max(parts, 1))
+    return [items[i:i + size] for i in range(0, len(items), size)] if items else []
+
+
+def init_hashing_worker(settings_module):
+    """Process pool initializer; configures Django in spawned workers."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    django.setup()
+
+
+def hash_passwords(passwords):
+    """Hash raw passwords; ``None`` becomes an unusable password."""
+    return [make_password(password) for password in passwords]
+
+
+def to_bool(value, default):
+    if value is None or value == '':
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'y')
+
+
+def build_user(record, password_hash):
+    return CustomUser(
+        email=CustomUser.objects.normalize_email(record['email'].strip()),
+        username=record.get('username') or None,
+        firstName=record.get('firstName') or None,
+        lastName=record.get('lastName') or None,
+        is_active=to_bool(record.get('is_active'), True),
+        is_staff=to_bool(record.get('is_staff'), False),
+        password=password_hash,
+    )
+
+
+def iter_users(queryset, fields, chunk_size):
+    """Yield user rows as dicts, walking the primary key in chunks."""
+    last_pk = None
+    while True:
+        chunk = queryset.order_by('pk')
+        if last_pk is not None:
+            chunk = chunk.filter(pk__gt=last_pk)
+        rows = 0
+        for row in chunk.values('pk', *fields)[:chunk_size].iterator(chunk_size=chunk_size):
+            last_pk = row.pop('pk')
+            rows += 1
+            yield row
+        if rows < chunk_size:
+            return
+
+
+def deactivate_users(queryset, chunk_size):
+    """
+    Deactivate the active users of ``queryset`` with one UPDATE per keyset
+    chunk of primary keys; return how many were deactivated.
+    """
+    pks = queryset.filter(is_active=True).order_by('pk').values_list('pk', flat=True)
+    deactivated, last_pk = 0, None
+    while True:
+        chunk = list((pks if last_pk is None else pks.filter(pk__gt=last_pk))[:chunk_size])
+        if not chunk:
+            return deactivated
+        with transaction.atomic():
+            deactivated += CustomUser.objects.filter(pk__in=chunk, is_active=True).update(is_active=False)
+        users_deactivated.send(sender=CustomUser, pks=chunk)
+        last_pk = chunk[-1]
+
+
+class Echo:
+    """A stream whose ``write`` returns what it is given."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(fields, rows):
+    """Yield the header and every row as a line of CSV, for streaming."""
+    writer = csv.DictWriter(Echo(), fieldnames=fields)
+    yield writer.writeheader()
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def write_records(stream, fmt, fields, rows):
+    """Write rows to ``stream`` and yield after each one (for progress)."""
+    if fmt == 'csv':
+        writer = csv.DictWriter(stream, fieldnames=fields)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(row)
+            yield row
+    else:
+        for row in rows:
+            stream.write(json.dumps(row) + '\n')
+            yield row
+
+
+def open_input(path):
+    return sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+
+
+def open_output(path):
+    return sys.stdout if path == '-' else open(path, 'w', newline='', encoding='utf-8')
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.contrib.auth.hashers import get_hasher
+from django.core.checks import Error, Tags, Warning, register
+
+
+@register(Tags.security)
+def check_password_hasher(app_configs, **kwargs):
+    """Fail fast when the preferred password hasher cannot be loaded."""
+    errors = []
+    hasher = get_hasher('default')
+    try:
+        if hasher.library:
+            hasher._load_library()
+    except ValueError as e:
+        errors.append(Error(
+            f'The preferred password hasher cannot be used: {e}',
+            hint='Install its library (pip install argon2-cffi for argon2) or change PASSWORD_HASHER.',
+            id='accounts.E001',
+        ))
+    if settings.PASSWORD_HASHING_WORKERS and settings.PASSWORD_HASHING_MAX_QUEUE < 1:
+        errors.append(Error(
+            'PASSWORD_HASHING_MAX_QUEUE must be at least 1 when PASSWORD_HASHING_WORKERS is set.',
+            id='accounts.E002',
+        ))
+    elif settings.PASSWORD_HASHING_WORKERS > settings.PASSWORD_HASHING_MAX_QUEUE:
+        errors.append(Warning(
+            f'{settings.PASSWORD_HASHING_WORKERS} password hashing processes share '
+            f'{settings.PASSWORD_HASHING_MAX_QUEUE} queue slots; the others never get work.',
+            hint='Lower PASSWORD_HASHING_WORKERS or raise PASSWORD_HASHING_MAX_QUEUE.',
+            id='accounts.W001',
+        ))
+    return errors
@@ -0,0 +1,175 @@
+"""
+Password hashing off the request thread.
+
+``make_password`` and ``verify_password`` run the configured hasher on a
+per-process pool of worker processes, so a burst of logins or sign-ups
+cannot hold every request thread inside PBKDF2/scrypt. At most
+``PASSWORD_HASHING_MAX_QUEUE`` hashes may be queued or running per web
+process; callers that cannot get a slot within
+``PASSWORD_HASHING_QUEUE_TIMEOUT`` seconds get ``HashingOverloaded``, which
+DRF and ``HashingBackpressureMiddleware`` turn into a 503 with Retry-After.
+
+A pool broken by a worker that died (OOM killer, segfault) is replaced and
+the hash is retried once on the new pool.
+
+``PASSWORD_HASHING_WORKERS = 0`` hashes inline on the calling thread.
+The ``a*`` variants wait from a worker thread so async views never block
+the event loop.
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import hashers
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from reddit_clone.metrics import Counter, Histogram
+
+
+class HashingOverloaded(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Too many sign-ins are being processed right now, please retry shortly."
+    default_code = "hashing_overloaded"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # DRF's exception handler turns ``wait`` into a Retry-After header.
+        self.wait = settings.PASSWORD_HASHING_RETRY_AFTER
+
+
+class HashingMetrics:
+    def __init__(self):
+        self.hash_seconds = Histogram()
+        self.queue_wait_seconds = Histogram()
+        self.completed = Counter()
+        self.rejected = Counter()
+
+    def snapshot(self):
+        return {
+            'completed': self.completed.value,
+            'rejected': self.rejected.value,
+            'hash_seconds': self.hash_seconds.snapshot(),
+            'queue_wait_seconds': self.queue_wait_seconds.snapshot(),
+        }
+
+
+metrics = HashingMetrics()
+
+
+def init_worker(settings_module, password_hashers):
+    """Pool initializer: set Django up with the parent's hasher list."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    django.setup()
+    settings.PASSWORD_HASHERS = password_hashers
+    hashers.get_hashers.cache_clear()
+    hashers.get_hashers_by_algorithm.cache_clear()
+
+
+def _timed(func, submitted_at, *args):
+    started_at = time.time()
+    result = func(*args)
+    return result, started_at - submitted_at, time.time() - started_at
+
+
+class HashingPool:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._key = None
+        self._slots = None
+
+    def get_executor(self):
+        # A new pool is needed after a fork (gunicorn preload) or when the
+        # hasher configuration changed.
+        key = (
+            os.getpid(),
+            tuple(settings.PASSWORD_HASHERS),
+            settings.PASSWORD_HASHING_WORKERS,
+            settings.PASSWORD_HASHING_MAX_QUEUE,
+        )
+        with self._lock:
+            if self._key != key:
+                if self._executor is not None and self._key[0] == key[0]:
+                    self._executor.shutdown(wait=False)
+                self._executor = ProcessPoolExecutor(
+                    max_workers=settings.PASSWORD_HASHING_WORKERS,
+                    mp_context=multiprocessing.get_context(settings.PASSWORD_HASHING_START_METHOD),
+                    initializer=init_worker,
+                    initargs=(
+                        os.environ.get('DJANGO_SETTINGS_MODULE', 'reddit_clone.settings'),
+                        list(settings.PASSWORD_HASHERS),
+                    ),
+                )
+                self._slots = threading.BoundedSemaphore(settings.PASSWORD_HASHING_MAX_QUEUE)
+                self._key = key
+            return self._executor, self._slots
+
+    def discard(self, executor):
+        """Drop ``executor`` if it is still the current pool; the next call builds a new one."""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = self._key = None
+        executor.shutdown(wait=False)
+
+    def submit(self, func, *args):
+        executor, slots = self.get_executor()
+        if not slots.acquire(timeout=settings.PASSWORD_HASHING_QUEUE_TIMEOUT):
+            metrics.rejected.inc()
+            raise HashingOverloaded()
+        try:
+            return executor.submit(_timed, func, time.time(), *args).result()
+        except BrokenProcessPool:
+            self.discard(executor)
+            raise
+        finally:
+            slots.release()
+
+    def run(self, func, *args):
+        if not settings.PASSWORD_HASHING_WORKERS:
+            result, _, duration = _timed(func, time.time(), *args)
+            metrics.hash_seconds.observe(duration)
+            metrics.completed.inc()
+            return result
+
+        try:
+            result, queue_wait, duration = self.submit(func, *args)
+        except BrokenProcessPool:
+            result, queue_wait, duration = self.submit(func, *args)
+        metrics.queue_wait_seconds.observe(max(queue_wait, 0.0))
+        metrics.hash_seconds.observe(duration)
+        metrics.completed.inc()
+        return result
+
+
+pool = HashingPool()
+
+
+def make_password(raw_password):
+    """``django.contrib.auth.hashers.make_password`` on the hashing pool."""
+    if raw_password is None:
+        # Unusable passwords are a random string, not a hash.
+        return hashers.make_password(None)
+    return pool.run(hashers.make_password, raw_password)
+
+
+def verify_password(raw_password, encoded):
+    """Return ``(is_correct, must_update)`` computed on the hashing pool."""
+    return pool.run(hashers.verify_password, raw_password, encoded)
+
+
+async def amake_password(raw_password):
+    """See make_password()."""
+    return await sync_to_async(make_password, thread_sensitive=False)(raw_password)
+
+
+async def averify_password(raw_password, encoded):
+    """See verify_password()."""
+    return await sync_to_async(verify_password, thread_sensitive=False)(raw_password, encoded)
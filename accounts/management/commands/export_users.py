@@ -0,0 +1,61 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import F
+
+from accounts.bulk import FORMATS, USER_FIELDS, guess_format, iter_users, open_output, write_records
+from accounts.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream every user to a CSV or JSON-lines file. Users are read in "
+        "primary-key order with keyset chunks, so memory use stays flat."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to write, or '-' for stdout.")
+        parser.add_argument('--format', choices=FORMATS, help="Defaults to the file extension.")
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument(
+            '--with-password-hashes',
+            action='store_true',
+            help="Include the stored password hash so import_users can restore logins.",
+        )
+        parser.add_argument('--progress-every', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            raise CommandError("--chunk-size must be at least 1.")
+        fmt = options['format'] or guess_format(options['path'])
+        fields = list(USER_FIELDS)
+        queryset = CustomUser.objects.all()
+        if options['with_password_hashes']:
+            queryset = queryset.annotate(password_hash=F('password'))
+            fields.append('password_hash')
+
+        # Progress goes to stderr when the export itself is on stdout.
+        log = self.stderr if options['path'] == '-' else self.stdout
+        try:
+            stream = open_output(options['path'])
+        except OSError as exc:
+            raise CommandError(exc)
+
+        started = time.perf_counter()
+        exported = 0
+        try:
+            rows = iter_users(queryset, fields, chunk_size)
+            for exported, _ in enumerate(write_records(stream, fmt, fields, rows), start=1):
+                if exported % options['progress_every'] == 0:
+                    elapsed = time.perf_counter() - started
+                    log.write(f"{exported} rows exported, {exported / elapsed:.0f} rows/s")
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
+
+        elapsed = max(time.perf_counter() - started, 1e-9)
+        log.write(self.style.SUCCESS(
+            f"Exported {exported} users in {elapsed:.1f}s, {exported / elapsed:.0f} rows/s."
+        ))
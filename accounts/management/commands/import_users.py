@@ -0,0 +1,125 @@
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from accounts.bulk import (
+    FORMATS,
+    batched,
+    build_user,
+    guess_format,
+    hash_passwords,
+    init_hashing_worker,
+    open_input,
+    read_records,
+    split,
+)
+from accounts.models import CustomUser
+from accounts.signals import users_imported
+
+
+class Command(BaseCommand):
+    help = (
+        "Create users in bulk from a CSV or JSON-lines file. Each record needs "
+        "an email and may carry username, firstName, lastName, is_active, "
+        "is_staff and either a raw 'password' or an already hashed "
+        "'password_hash' (as written by export_users)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to read, or '-' for stdin.")
+        parser.add_argument('--format', choices=FORMATS, help="Defaults to the file extension.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count(),
+            help="Processes hashing passwords; 0 hashes in this process.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError("--batch-size must be at least 1.")
+        fmt = options['format'] or guess_format(options['path'])
+        workers = options['workers']
+
+        try:
+            stream = open_input(options['path'])
+        except OSError as exc:
+            raise CommandError(exc)
+
+        executor = None
+        if workers:
+            executor = ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=init_hashing_worker,
+                initargs=(os.environ.get('DJANGO_SETTINGS_MODULE', 'reddit_clone.settings'),),
+            )
+
+        self.started = time.perf_counter()
+        self.processed = self.inserted = self.duplicates = self.skipped = 0
+        try:
+            # While one batch is hashed in the pool the previous one is
+            # inserted, so hashing and INSERTs overlap.
+            pending = None
+            for batch in batched(read_records(stream, fmt), batch_size):
+                batch, skipped = self.valid_records(batch)
+                self.skipped += skipped
+                submitted = self.submit_hashing(executor, batch, workers)
+                if pending is not None:
+                    self.insert(*pending)
+                pending = (batch, submitted)
+            if pending is not None:
+                self.insert(*pending)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+            if stream is not sys.stdin:
+                stream.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {self.inserted} users ({self.duplicates} duplicates and "
+            f"{self.skipped} invalid rows skipped) in {time.perf_counter() - self.started:.1f}s, "
+            f"{self.rate():.0f} rows/s. Rows whose email or username already exist are left untouched."
+        ))
+
+    def valid_records(self, batch):
+        valid = [record for record in batch if (record.get('email') or '').strip()]
+        return valid, len(batch) - len(valid)
+
+    def submit_hashing(self, executor, batch, workers):
+        """Start hashing the raw passwords of a batch; returns a result getter."""
+        indexes = [i for i, record in enumerate(batch) if not record.get('password_hash')]
+        passwords = [batch[i].get('password') or None for i in indexes]
+        if executor is None:
+            hashes = hash_passwords(passwords)
+            return indexes, lambda: hashes
+        futures = [executor.submit(hash_passwords, chunk) for chunk in split(passwords, workers)]
+        return indexes, lambda: [h for future in futures for h in future.result()]
+
+    def insert(self, batch, submitted):
+        indexes, get_hashes = submitted
+        hashes = [record.get('password_hash') for record in batch]
+        for i, password_hash in zip(indexes, get_hashes()):
+            hashes[i] = password_hash
+        users = [build_user(record, password_hash) for record, password_hash in zip(batch, hashes)]
+        # ignore_conflicts doesn't say which rows went in; the batch's emails
+        # looked up before and after (through the unique index) do.
+        batch_users = CustomUser.objects.filter(email__in={user.email for user in users}).values_list('pk', flat=True)
+        with transaction.atomic():
+            existing = set(batch_users.all())
+            CustomUser.objects.bulk_create(users, batch_size=len(users), ignore_conflicts=True)
+            inserted = sorted(set(batch_users.all()) - existing)
+        if inserted:
+            users_imported.send(sender=CustomUser, pks=inserted)
+        self.inserted += len(inserted)
+        self.duplicates += len(users) - len(inserted)
+        self.processed += len(users)
+        self.stdout.write(f"{self.processed} rows processed, {self.rate():.0f} rows/s")
+
+    def rate(self):
+        return self.processed / max(time.perf_counter() - self.started, 1e-9)
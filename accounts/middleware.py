@@ -0,0 +1,36 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.http import HttpResponse
+
+from .hashing import HashingOverloaded
+
+
+class HashingBackpressureMiddleware:
+    """
+    Answer 503 with Retry-After when the password hashing queue is full.
+
+    DRF views already render ``HashingOverloaded`` themselves; this covers
+    the template views (login, register) and the admin login. It runs
+    natively under both WSGI and ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        return await self.get_response(request)
+
+    def process_exception(self, request, exception):
+        if not isinstance(exception, HashingOverloaded):
+            return None
+        response = HttpResponse(str(exception.detail), status=exception.status_code, content_type='text/plain')
+        response['Retry-After'] = str(exception.wait)
+        return response
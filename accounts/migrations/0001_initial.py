@@ -0,0 +1,35 @@
+# Generated by Django 5.1.4 on 2026-10-18 08:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomUser',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('password', models.CharField(max_length=128, verbose_name='password')),
+                ('last_login', models.DateTimeField(blank=True, null=True, verbose_name='last login')),
+                ('email', models.EmailField(max_length=255, unique=True, verbose_name='Email')),
+                ('username', models.CharField(blank=True, max_length=255, null=True, unique=True, verbose_name='User Name')),
+                ('firstName', models.CharField(blank=True, max_length=100, null=True, verbose_name='First Name')),
+                ('lastName', models.CharField(blank=True, max_length=100, null=True, verbose_name='Last Name')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Active')),
+                ('is_staff', models.BooleanField(default=False, verbose_name='Staff')),
+                ('is_superuser', models.BooleanField(default=False, verbose_name='Super User')),
+                ('groups', models.ManyToManyField(blank=True, help_text='The groups this user belongs to. A user will get all permissions granted to each of their groups.', related_name='user_set', related_query_name='user', to='auth.group', verbose_name='groups')),
+                ('user_permissions', models.ManyToManyField(blank=True, help_text='Specific permissions for this user.', related_name='user_set', related_query_name='user', to='auth.permission', verbose_name='user permissions')),
+            ],
+            options={
+                'verbose_name_plural': 'User',
+            },
+        ),
+    ]
@@ -0,0 +1,67 @@
+from django.db import migrations
+
+
+# Expressions match the SQL Django emits for the case-insensitive lookups on
+# Postgres, e.g. ``UPPER("username"::text) LIKE UPPER('abc%')``.
+TRIGRAM_INDEXES = [
+    (
+        'accounts_customuser_username_trgm',
+        'USING gin (UPPER(username::text) gin_trgm_ops)',
+    ),
+    (
+        'accounts_customuser_email_trgm',
+        'USING gin (UPPER(email::text) gin_trgm_ops)',
+    ),
+]
+
+PREFIX_INDEXES = [
+    (
+        'accounts_customuser_username_prefix',
+        '(UPPER(username::text) text_pattern_ops)',
+    ),
+    (
+        'accounts_customuser_email_prefix',
+        '(UPPER(email::text) text_pattern_ops)',
+    ),
+]
+
+
+def trigram_available(schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        return cursor.fetchone() is not None
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    indexes = PREFIX_INDEXES
+    # Servers without the contrib package keep substring search unindexed.
+    if trigram_available(schema_editor):
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        indexes = TRIGRAM_INDEXES + PREFIX_INDEXES
+    for name, definition in indexes:
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} '
+            f'ON accounts_customuser {definition}'
+        )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in TRIGRAM_INDEXES + PREFIX_INDEXES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
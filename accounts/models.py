@@ -1,6 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import BaseUserManager, AbstractBaseUser, PermissionsMixin
 
+from . import hashing
+
 
 class CustomUserManager(BaseUserManager):
     
@@ -32,12 +34,65 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     is_active = models.BooleanField('Active', default=True)
     is_staff = models.BooleanField('Staff', default=False)
     is_superuser = models.BooleanField('Super User', default=False)
+    # Signed into every JWT as the "gen" claim; bumping it revokes all of
+    # the user's tokens (see api/revocation.py).
+    token_generation = models.PositiveIntegerField('Token generation', default=0, editable=False)
+    # Maintained by api.models.FollowManager with F() updates.
+    followers_count = models.PositiveIntegerField('Followers', default=0, editable=False)
+    following_count = models.PositiveIntegerField('Following', default=0, editable=False)
     objects = CustomUserManager()
     USERNAME_FIELD = 'email'
+    COUNTER_FIELDS = ('followers_count', 'following_count')
 
     def __str__(self):
         return self.email
 
+    def save(self, *args, **kwargs):
+        if self.pk is not None and self._password is not None:
+            # A new password signs out every session. Hash upgrades in
+            # check_password() clear _password first and don't.
+            self.token_generation += 1
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'password' in update_fields:
+                kwargs['update_fields'] = [*update_fields, 'token_generation']
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            # Don't write back counters that other requests update in place.
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    def set_password(self, raw_password):
+        self.password = hashing.make_password(raw_password)
+        self._password = raw_password
+
+    def check_password(self, raw_password):
+        """
+        Verify on the hashing pool and upgrade hashes made with a hasher
+        other than the preferred one (see ``PASSWORD_HASHER``).
+        """
+        is_correct, must_update = hashing.verify_password(raw_password, self.password)
+        if is_correct and must_update:
+            self.set_password(raw_password)
+            self._password = None
+            self.save(update_fields=['password'])
+        return is_correct
+
+    async def aset_password(self, raw_password):
+        """See set_password()."""
+        self.password = await hashing.amake_password(raw_password)
+        self._password = raw_password
+
+    async def acheck_password(self, raw_password):
+        """See check_password()."""
+        is_correct, must_update = await hashing.averify_password(raw_password, self.password)
+        if is_correct and must_update:
+            await self.aset_password(raw_password)
+            self._password = None
+            await self.asave(update_fields=['password'])
+        return is_correct
+
     class Meta:
         '''Doc string for meta'''
         verbose_name_plural = "User"
\ No newline at end of file
@@ -0,0 +1,10 @@
+from django.dispatch import Signal
+
+
+# Sent with ``pks`` after a chunk of users is deactivated by a queryset
+# update, which sends no ``post_save`` for them.
+users_deactivated = Signal()
+
+# Sent with ``pks`` after a batch of users is inserted by ``bulk_create``
+# (the import_users command), which sends no ``post_save`` either.
+users_imported = Signal()
@@ -1,3 +1,415 @@
-from django.test import TestCase
+import io
+import json
+import os
+import tempfile
+import threading
+from concurrent.futures.process import BrokenProcessPool
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.contrib import admin
+from django.contrib.admin import helpers
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts import hashing
+from accounts.admin import CustomUserAdmin, EstimatedCountPaginator
+from accounts.checks import check_password_hasher
+from api.cache import get_cache_version
+from api.models import SearchDocument
+
+
+FAST_HASHER = ["django.contrib.auth.hashers.MD5PasswordHasher"]
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHER)
+class BulkUserCommandTests(TestCase):
+    """Test the import_users and export_users management commands."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, "w") as f:
+            f.write(content)
+        return path
+
+    def test_import_csv_in_batches(self):
+        """Test CSV rows are created with hashed passwords."""
+        path = self.write(
+            "users.csv",
+            "email,username,password\n"
+            "a@example.com,alice,secret-one\n"
+            "b@example.com,bob,secret-two\n"
+            ",nobody,secret\n"
+            "c@EXAMPLE.com,carol,\n",
+        )
+        out = io.StringIO()
+
+        call_command("import_users", path, "--batch-size", "2", "--workers", "0", stdout=out)
+
+        User = get_user_model()
+        self.assertEqual(User.objects.count(), 3)
+        self.assertTrue(User.objects.get(username="alice").check_password("secret-one"))
+        self.assertFalse(User.objects.get(username="carol").has_usable_password())
+        self.assertTrue(User.objects.filter(email="c@example.com").exists())
+        self.assertIn("1 invalid rows skipped", out.getvalue())
+
+    def test_import_jsonl_with_process_pool(self):
+        """Test hashing in worker processes gives usable passwords."""
+        path = self.write(
+            "users.jsonl",
+            "\n".join(
+                json.dumps({"email": f"user{i}@example.com", "password": f"pass-{i}"})
+                for i in range(5)
+            ),
+        )
+
+        call_command("import_users", path, "--workers", "2", stdout=io.StringIO())
+
+        user = get_user_model().objects.get(email="user3@example.com")
+        self.assertTrue(user.check_password("pass-3"))
+
+    def test_import_skips_existing_users(self):
+        """Test conflicting rows leave the existing account alone."""
+        get_user_model().objects.create_user(email="a@example.com", password="original")
+        path = self.write("users.csv", "email,password\na@example.com,changed\n")
+
+        out = io.StringIO()
+
+        call_command("import_users", path, "--workers", "0", stdout=out)
+
+        self.assertTrue(get_user_model().objects.get().check_password("original"))
+        self.assertIn("Imported 0 users (1 duplicates", out.getvalue())
+
+    def test_import_counts_inserted_rows(self):
+        """Test rows that conflict, with the table or the file, aren't counted as imported."""
+        get_user_model().objects.create_user(email="a@example.com", username="taken")
+        path = self.write(
+            "users.csv",
+            "email,username\n"
+            "a@example.com,alice\n"
+            "b@example.com,taken\n"
+            "c@example.com,carol\n"
+            "c@example.com,carol2\n"
+            "d@example.com,dave\n",
+        )
+        out = io.StringIO()
+
+        call_command("import_users", path, "--batch-size", "3", "--workers", "0", stdout=out)
+
+        self.assertEqual(get_user_model().objects.count(), 3)
+        self.assertIn("Imported 2 users (3 duplicates and 0 invalid rows skipped)", out.getvalue())
+
+    def test_imported_users_indexed(self):
+        """Test imported users get search documents and invalidate cached user listings."""
+        get_user_model().objects.create_user(email="a@example.com", username="taken")
+        path = self.write("users.csv", "email,username\na@example.com,alice\nb@example.com,bob\n")
+        version = get_cache_version("users")
+
+        call_command("import_users", path, "--workers", "0", stdout=io.StringIO())
+
+        self.assertEqual(
+            sorted(SearchDocument.objects.filter(kind="user").values_list("title", flat=True)), ["bob", "taken"]
+        )
+        self.assertNotEqual(get_cache_version("users"), version)
+
+    def test_export_round_trip(self):
+        """Test exported hashes restore logins on import."""
+        User = get_user_model()
+        for i in range(5):
+            User.objects.create_user(email=f"user{i}@example.com", password=f"pass-{i}")
+        path = os.path.join(self.directory, "users.jsonl")
+
+        call_command(
+            "export_users", path, "--chunk-size", "2", "--with-password-hashes",
+            stdout=io.StringIO(),
+        )
+        User.objects.all().delete()
+        call_command("import_users", path, "--workers", "0", stdout=io.StringIO())
+
+        with open(path) as f:
+            self.assertEqual(len(f.readlines()), 5)
+        self.assertTrue(User.objects.get(email="user4@example.com").check_password("pass-4"))
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHER, PASSWORD_HASHING_WORKERS=0)
+class PasswordHashingTests(TestCase):
+    """Test password hashing on the bounded hashing pool."""
+
+    def test_hashing_on_worker_processes(self):
+        """Test passwords hashed by pool workers verify with the same hasher."""
+        with self.settings(PASSWORD_HASHING_WORKERS=1):
+            user = get_user_model().objects.create_user(email="pool@example.com", password="secret-pass")
+            self.assertTrue(user.password.startswith("md5$"))
+            self.assertTrue(user.check_password("secret-pass"))
+            self.assertFalse(user.check_password("wrong-pass"))
+
+    def test_broken_pool_replaced(self):
+        """Test a pool whose worker died is rebuilt and the hash retried on it."""
+        with self.settings(PASSWORD_HASHING_WORKERS=1):
+            executor, _ = hashing.pool.get_executor()
+            with self.assertRaises(BrokenProcessPool):
+                executor.submit(os._exit, 1).result()
+
+            user = get_user_model().objects.create_user(email="pool@example.com", password="secret-pass")
+
+            self.assertTrue(user.check_password("secret-pass"))
+            self.assertIsNot(hashing.pool.get_executor()[0], executor)
+
+    @override_settings(PASSWORD_HASHERS=[
+        "django.contrib.auth.hashers.ScryptPasswordHasher",
+        "django.contrib.auth.hashers.MD5PasswordHasher",
+    ])
+    def test_rehash_on_login(self):
+        """Test a hash made with an older hasher is upgraded on login."""
+        user = get_user_model().objects.create_user(email="old@example.com")
+        user.password = make_password("secret-pass", hasher="md5")
+        user.save()
+
+        self.assertTrue(user.check_password("secret-pass"))
+
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith("scrypt$"))
+        self.assertTrue(user.check_password("secret-pass"))
+
+    def test_wrong_password_is_not_rehashed(self):
+        """Test a failed login leaves the stored hash alone."""
+        user = get_user_model().objects.create_user(email="keep@example.com", password="secret-pass")
+        stored = user.password
+
+        self.assertFalse(user.check_password("wrong-pass"))
+        user.refresh_from_db()
+        self.assertEqual(user.password, stored)
+
+    def test_metrics_record_hashes(self):
+        """Test completed hashes are counted and timed."""
+        before = hashing.metrics.snapshot()
+        get_user_model().objects.create_user(email="metrics@example.com", password="secret-pass")
+        after = hashing.metrics.snapshot()
+
+        self.assertEqual(after["completed"], before["completed"] + 1)
+        self.assertEqual(after["hash_seconds"]["count"], before["hash_seconds"]["count"] + 1)
+
+    @override_settings(PASSWORD_HASHING_MAX_QUEUE=1, PASSWORD_HASHING_QUEUE_TIMEOUT=5)
+    def test_waits_for_a_running_hash(self):
+        """Test a hash behind a running one waits for its slot instead of failing."""
+        with self.settings(PASSWORD_HASHING_WORKERS=1):
+            _, slots = hashing.pool.get_executor()
+            slots.acquire()
+            timer = threading.Timer(0.2, slots.release)
+            timer.start()
+            self.addCleanup(timer.join)
+
+            get_user_model()().set_password("secret-pass")
+
+    @override_settings(PASSWORD_HASHING_WORKERS=2, PASSWORD_HASHING_MAX_QUEUE=1)
+    def test_idle_hashing_workers_flagged(self):
+        """Test more hashing processes than queue slots is a warning."""
+        self.assertEqual([e.id for e in check_password_hasher(None)], ["accounts.W001"])
+
+
+@override_settings(
+    PASSWORD_HASHERS=FAST_HASHER,
+    PASSWORD_HASHING_WORKERS=1,
+    PASSWORD_HASHING_MAX_QUEUE=1,
+    PASSWORD_HASHING_QUEUE_TIMEOUT=0.01,
+    PASSWORD_HASHING_RETRY_AFTER=3,
+)
+class HashingBackpressureTests(TestCase):
+    """Test requests are shed with a 503 while the hashing queue is full."""
+
+    def setUp(self):
+        with self.settings(PASSWORD_HASHING_WORKERS=0):
+            get_user_model().objects.create_user(
+                email="busy@example.com", username="busy", password="secret-pass"
+            )
+        _, slots = hashing.pool.get_executor()
+        slots.acquire()
+        self.addCleanup(slots.release)
+
+    def test_model_raises_when_queue_is_full(self):
+        """Test hashing fails fast instead of queueing without bound."""
+        rejected = hashing.metrics.rejected.value
+        with self.assertRaises(hashing.HashingOverloaded):
+            get_user_model()().set_password("secret-pass")
+        self.assertEqual(hashing.metrics.rejected.value, rejected + 1)
+
+    def test_api_login_returns_503(self):
+        """Test the token endpoint answers 503 with Retry-After."""
+        res = self.client.post(
+            reverse("api:signin"), {"email": "busy@example.com", "password": "secret-pass"}
+        )
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(res["Retry-After"], "3")
+
+    def test_form_login_returns_503(self):
+        """Test the template login view answers 503 with Retry-After."""
+        res = self.client.post(
+            reverse("accounts:login"), {"username": "busy@example.com", "password": "secret-pass"}
+        )
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(res["Retry-After"], "3")
+
+
+CHANGELIST_URL = reverse("admin:accounts_customuser_changelist")
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHER)
+class UserAdminTests(TestCase):
+    """Test the user changelist and its bulk actions."""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.admin = User.objects.create_superuser("admin@example.com", "secret")
+        cls.users = [
+            User.objects.create_user(email=f"user{i}@example.com", username=f"user{i}")
+            for i in range(7)
+        ]
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+        patcher = mock.patch.object(CustomUserAdmin, "list_per_page", 3)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def page(self, url):
+        res = self.client.get(url)
+        self.assertEqual(res.status_code, 200)
+        return res.context["cl"]
+
+    def test_keyset_navigation(self):
+        """Test next and previous links walk every user by id."""
+        expected = sorted((user.pk for user in [self.admin, *self.users]), reverse=True)
+        cl, pages = self.page(CHANGELIST_URL), []
+        self.assertTrue(cl.keyset)
+        self.assertIsNone(cl.previous_url)
+        while True:
+            pages.append([user.pk for user in cl.result_list])
+            if cl.next_url is None:
+                break
+            cl = self.page(CHANGELIST_URL + cl.next_url)
+
+        self.assertEqual([pk for page in pages for pk in page], expected)
+        back = []
+        while cl.previous_url is not None:
+            cl = self.page(CHANGELIST_URL + cl.previous_url)
+            back.append([user.pk for user in cl.result_list])
+        self.assertEqual(back, pages[-2::-1])
+
+    def test_deep_page_has_no_offset(self):
+        """Test a keyset page seeks by id instead of skipping rows."""
+        with CaptureQueriesContext(connection) as queries:
+            self.page(f"{CHANGELIST_URL}?after={self.users[3].pk}")
+
+        self.assertFalse([query["sql"] for query in queries if "OFFSET" in query["sql"]])
+
+    def test_sorted_by_other_column_pages_by_number(self):
+        """Test other sortings keep the numbered pages."""
+        cl = self.page(f"{CHANGELIST_URL}?o=1")
+
+        self.assertFalse(cl.keyset)
+        self.assertNotIn("after", cl.get_query_string({"p": 2}))
+
+    def test_invalid_position_rejected(self):
+        """Test a malformed id is an invalid lookup."""
+        res = self.client.get(CHANGELIST_URL, {"after": "abc"})
+
+        self.assertRedirects(res, f"{CHANGELIST_URL}?e=1")
+
+    def test_prefix_search(self):
+        """Test search matches the start of the email address or username."""
+        get_user_model().objects.create_user(email="malice@example.com", username="alice")
+
+        cl = self.page(f"{CHANGELIST_URL}?q=user1")
+        self.assertEqual([user.username for user in cl.result_list], ["user1"])
+        cl = self.page(f"{CHANGELIST_URL}?q=alice")
+        self.assertEqual([user.email for user in cl.result_list], ["malice@example.com"])
+        cl = self.page(f"{CHANGELIST_URL}?q=lice")
+        self.assertEqual(list(cl.result_list), [])
+
+    def test_small_results_counted_exactly(self):
+        """Test counts under the limit are exact."""
+        cl = self.page(CHANGELIST_URL)
+
+        self.assertEqual(cl.result_count, 8)
+        self.assertFalse(cl.paginator.estimated)
+
+    @skipUnless(connection.vendor == "postgresql", "Count estimates are Postgres-only.")
+    def test_large_results_estimated(self):
+        """Test counts past the limit come from the planner."""
+        with mock.patch.object(EstimatedCountPaginator, "exact_count_limit", 0), \
+                CaptureQueriesContext(connection) as queries:
+            res = self.client.get(CHANGELIST_URL)
+
+        self.assertTrue(res.context["cl"].paginator.estimated)
+        self.assertContains(res, "About")
+        self.assertFalse([query["sql"] for query in queries if "COUNT(" in query["sql"]])
+
+    def post_action(self, action, users):
+        return self.client.post(CHANGELIST_URL, {
+            "action": action,
+            helpers.ACTION_CHECKBOX_NAME: [user.pk for user in users],
+        })
+
+    def test_delete_selected_removed(self):
+        """Test the delete action isn't offered."""
+        actions = admin.site._registry[get_user_model()].get_actions(self.client.get(CHANGELIST_URL).wsgi_request)
+
+        self.assertNotIn("delete_selected", actions)
+        self.assertIn("deactivate_users", actions)
+
+    def test_deactivate_in_chunks(self):
+        """Test deactivation updates chunk by chunk and drops search documents."""
+        selected = self.users[:5]
+
+        with mock.patch.object(CustomUserAdmin, "action_chunk_size", 2), \
+                CaptureQueriesContext(connection) as queries:
+            res = self.post_action("deactivate_users", selected)
+
+        self.assertRedirects(res, CHANGELIST_URL, fetch_redirect_response=False)
+        User = get_user_model()
+        self.assertEqual(
+            set(User.objects.filter(is_active=False).values_list("pk", flat=True)),
+            {user.pk for user in selected},
+        )
+        self.assertFalse(SearchDocument.objects.filter(object_id__in=[user.pk for user in selected]).exists())
+        self.assertTrue(SearchDocument.objects.filter(object_id=self.users[5].pk).exists())
+        updates = [query["sql"] for query in queries if query["sql"].startswith("UPDATE")]
+        self.assertEqual(len(updates), 3)
+
+    def test_export_streams_csv(self):
+        """Test the export action streams the selected users as CSV."""
+        with mock.patch.object(CustomUserAdmin, "action_chunk_size", 2):
+            res = self.post_action("export_csv", self.users[:3])
+            lines = b"".join(res.streaming_content).decode().splitlines()
+
+        self.assertEqual(res["Content-Type"], "text/csv")
+        self.assertEqual(lines[0], "email,username,firstName,lastName,is_active,is_staff")
+        self.assertEqual(
+            [line.split(",")[0] for line in lines[1:]],
+            [user.email for user in self.users[:3]],
+        )
+
+
+@skipUnless(connection.vendor == "postgresql", "Search indexes are Postgres-only.")
+class UserAdminSearchPlanTests(TestCase):
+    """Test the admin search is served by the prefix indexes."""
+
+    def test_search_uses_prefix_indexes(self):
+        model_admin = admin.site._registry[get_user_model()]
+        queryset, _ = model_admin.get_search_results(None, get_user_model().objects.all(), "ali")
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        plan = queryset.explain()
+
+        self.assertIn("accounts_customuser_email_prefix", plan)
+        self.assertIn("accounts_customuser_username_prefix", plan)
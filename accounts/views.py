@@ -7,6 +7,7 @@ from django.contrib import messages
 from django.views import View
 from django.contrib.auth import authenticate, login
 from django.contrib import messages
+from reddit_clone.throttling import LOGIN_THROTTLES, ThrottledViewMixin
 
 
 class RegisterUser(FormView):
@@ -25,7 +26,10 @@ class RegisterUser(FormView):
         return HttpResponseRedirect(reverse('accounts:login'))
 
 
-class LoginView(View):
+class LoginView(ThrottledViewMixin, View):
+    throttle_classes = LOGIN_THROTTLES
+    throttle_scope = 'login'
+    throttle_email_field = 'username'
 
     def post(self, request):
         username = request.POST['username']
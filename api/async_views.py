@@ -0,0 +1,211 @@
+"""
+Async versions of the register, login, refresh and profile endpoints.
+
+DRF's request/response cycle is synchronous, so these are plain Django
+async views: they parse JSON themselves, reuse the DRF serializers for
+validation and output, read and write through the async ORM (``aget``,
+``acreate``, ``asave``) and wait for password hashing from a worker
+thread. Error bodies and status codes match the DRF views. They are
+mounted under ``/api/async/`` and only pay off when served by the ASGI
+application (see ``reddit_clone/gunicorn_asgi.py``).
+"""
+
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.validators import UniqueValidator
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.settings import api_settings
+
+from accounts import hashing
+from accounts.models import CustomUser
+from reddit_clone.throttling import LOGIN_THROTTLES, REFRESH_THROTTLES
+from .authentication import StatelessJWTAuthentication
+from .serializers import (
+    CustomTokenObtainPairSerializer,
+    CustomUserSerializer,
+    RotatingTokenRefreshSerializer,
+    UserProfileSerializer,
+)
+
+
+async def avalidate(serializer):
+    """
+    ``serializer.is_valid(raise_exception=True)`` with the model's unique
+    checks run through the async ORM instead of DRF's sync validators.
+    """
+    unique = {}
+    for name, field in serializer.fields.items():
+        for validator in list(field.validators):
+            if isinstance(validator, UniqueValidator):
+                field.validators.remove(validator)
+                unique[name] = validator
+    serializer.is_valid(raise_exception=True)
+
+    errors = {}
+    for name, validator in unique.items():
+        field = serializer.fields[name]
+        value = serializer.validated_data.get(field.source)
+        if value is None:
+            continue
+        queryset = validator.queryset.filter(**{f"{field.source_attrs[-1]}__{validator.lookup}": value})
+        if serializer.instance is not None:
+            queryset = queryset.exclude(pk=serializer.instance.pk)
+        if await queryset.aexists():
+            errors[name] = [exceptions.ErrorDetail(validator.message, code="unique")]
+    if errors:
+        raise exceptions.ValidationError(errors)
+    return serializer.validated_data
+
+
+class AsyncAPIView(View):
+    """Base class: JSON in and out, DRF-style errors, optional JWT auth and throttling."""
+    authentication = StatelessJWTAuthentication()
+    authentication_required = False
+    throttle_classes = ()
+    throttle_scope = None
+    renderer = JSONRenderer()
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        # Token-authenticated like the DRF views, so no CSRF.
+        return csrf_exempt(super().as_view(**initkwargs))
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            await self.check_throttles(request)
+            if self.authentication_required:
+                await self.authenticate(request)
+            return await super().dispatch(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            return self.handle_exception(exc)
+
+    async def check_throttles(self, request):
+        waits = []
+        for throttle_class in self.throttle_classes:
+            throttle = throttle_class()
+            if not await throttle.aallow_request(request, self):
+                waits.append(throttle.wait())
+        if waits:
+            raise exceptions.Throttled(max(waits))
+
+    async def authenticate(self, request):
+        result = await self.authentication.aauthenticate(request)
+        if result is None:
+            raise exceptions.NotAuthenticated()
+        request.user, request.auth = result
+
+    def parse(self, request):
+        if request.content_type == "application/json":
+            try:
+                return json.loads(request.body or b"{}")
+            except ValueError as exc:
+                raise exceptions.ParseError(f"JSON parse error - {exc}")
+        return request.POST
+
+    def respond(self, data=None, status=status.HTTP_200_OK, headers=None):
+        if data is None:
+            return HttpResponse(status=status, headers=headers)
+        return HttpResponse(
+            self.renderer.render(data), status=status, headers=headers,
+            content_type="application/json",
+        )
+
+    def handle_exception(self, exc):
+        """Mirror ``rest_framework.views.exception_handler``."""
+        headers = {}
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            headers["WWW-Authenticate"] = self.authentication.authenticate_header(None)
+        if getattr(exc, "wait", None):
+            headers["Retry-After"] = str(int(exc.wait))
+        data = exc.detail if isinstance(exc.detail, (list, dict)) else {"detail": exc.detail}
+        return self.respond(data, status=exc.status_code, headers=headers)
+
+
+class AsyncCreateCustomUserView(AsyncAPIView):
+
+    async def post(self, request):
+        serializer = CustomUserSerializer(data=self.parse(request))
+        validated_data = dict(await avalidate(serializer))
+        validated_data["password"] = await hashing.amake_password(validated_data["password"])
+        serializer.instance = await CustomUser.objects.acreate(**validated_data)
+        return self.respond(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class AsyncTokenObtainPairView(AsyncAPIView):
+    serializer_class = CustomTokenObtainPairSerializer
+    throttle_classes = LOGIN_THROTTLES
+    throttle_scope = "login"
+
+    async def post(self, request):
+        serializer = self.serializer_class(data=self.parse(request))
+        attrs = serializer.to_internal_value(serializer.initial_data)
+        user = await self.aauthenticate(attrs[serializer.username_field], attrs["password"])
+        if not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise exceptions.AuthenticationFailed(
+                serializer.error_messages["no_active_account"], "no_active_account"
+            )
+
+        refresh = serializer.get_token(user)
+        return self.respond({
+            "refresh": str(refresh),
+            "access": str(refresh.access_token),
+            "user": serializer.get_user_data(user),
+        })
+
+    async def aauthenticate(self, username, password):
+        """``ModelBackend.authenticate`` on the async ORM."""
+        user = await CustomUser.objects.filter(**{CustomUser.USERNAME_FIELD: username}).afirst()
+        if user is None:
+            # Hash anyway so response time doesn't reveal unknown emails.
+            await CustomUser().aset_password(password)
+            return None
+        if await user.acheck_password(password) and user.is_active:
+            return user
+        return None
+
+
+class AsyncTokenRefreshView(AsyncAPIView):
+    throttle_classes = REFRESH_THROTTLES
+    throttle_scope = "refresh"
+
+    async def post(self, request):
+        serializer = RotatingTokenRefreshSerializer(data=self.parse(request))
+        try:
+            # Rotation reads the user state and updates the used-token store.
+            await sync_to_async(serializer.is_valid)(raise_exception=True)
+        except TokenError as e:
+            raise InvalidToken(e.args[0])
+        return self.respond(serializer.validated_data)
+
+
+class AsyncUserProfileView(AsyncAPIView):
+    authentication_required = True
+
+    async def get_object(self, request):
+        return await CustomUser.objects.aget(pk=request.user.id)
+
+    async def get(self, request):
+        user = await self.get_object(request)
+        return self.respond(UserProfileSerializer(user).data)
+
+    async def put(self, request, partial=False):
+        user = await self.get_object(request)
+        serializer = UserProfileSerializer(user, data=self.parse(request), partial=partial)
+        for attr, value in (await avalidate(serializer)).items():
+            setattr(user, attr, value)
+        await user.asave()
+        return self.respond(serializer.data)
+
+    async def patch(self, request):
+        return await self.put(request, partial=True)
+
+    async def delete(self, request):
+        user = await self.get_object(request)
+        await user.adelete()
+        return self.respond(status=status.HTTP_204_NO_CONTENT)
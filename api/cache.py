@@ -0,0 +1,83 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+from reddit_clone import replicas
+
+
+VERSION_KEY = "api:cache-version:{}"
+RESPONSE_KEY = "api:response:{}"
+
+
+def get_cache_version(namespace):
+    """Return the current version of a cache namespace."""
+    # Seeding with the clock means an evicted counter never comes back as
+    # a version that older entries were stored under.
+    return cache.get_or_set(VERSION_KEY.format(namespace), time.time_ns, None)
+
+
+def bump_cache_version(namespace):
+    """Invalidate every response cached under ``namespace``."""
+    key = VERSION_KEY.format(namespace)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def user_namespace(user_id):
+    return f"user:{user_id}"
+
+
+class CachedResponseMixin:
+    """
+    Cache successful GET responses of a DRF view.
+
+    Keys combine the absolute URL (path and query string), the requesting
+    user, the negotiated media type and the versions of the view's cache
+    namespaces. Views declare their namespaces through
+    ``get_cache_namespaces``; model signals bump them, so writes invalidate
+    precisely instead of waiting for the TTL. Responses read from a replica,
+    which may predate the last invalidation, are kept for no longer than the
+    replica lag allowed.
+    """
+    cache_timeout = None
+    cache_namespaces = ()
+
+    def get_cache_timeout(self):
+        if self.cache_timeout is not None:
+            return self.cache_timeout
+        return settings.API_RESPONSE_CACHE_TIMEOUT
+
+    def get_cache_namespaces(self):
+        return self.cache_namespaces
+
+    def get_response_cache_key(self, request):
+        versions = ",".join(
+            f"{namespace}={get_cache_version(namespace)}"
+            for namespace in self.get_cache_namespaces()
+        )
+        raw = "|".join(
+            [
+                request.build_absolute_uri(),
+                str(request.user.pk if request.user.is_authenticated else "anon"),
+                request.accepted_media_type or "",
+                versions,
+            ]
+        )
+        return RESPONSE_KEY.format(hashlib.md5(raw.encode()).hexdigest())
+
+    def get(self, request, *args, **kwargs):
+        key = self.get_response_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data, replicas.cache_timeout(self.get_cache_timeout()))
+        return response
@@ -0,0 +1,53 @@
+from rest_framework import filters
+from rest_framework.exceptions import ValidationError
+
+
+class UserSearchFilter(filters.SearchFilter):
+    """
+    ``SearchFilter`` with an explicit ``?search_mode=prefix|substring|exact``.
+
+    Each mode maps to the case-insensitive lookup that the indexes added in
+    ``accounts/migrations/0002_search_indexes.py`` serve on Postgres:
+    ``prefix`` and ``exact`` use the ``UPPER(col) text_pattern_ops`` btree
+    indexes, ``substring`` uses the ``pg_trgm`` GIN indexes. On SQLite the
+    same lookups run as plain ``LIKE`` scans.
+    """
+    search_mode_param = 'search_mode'
+    search_modes = {
+        'prefix': 'istartswith',
+        'substring': 'icontains',
+        'exact': 'iexact',
+    }
+    default_search_mode = 'substring'
+
+    def get_search_mode(self, request):
+        mode = request.query_params.get(self.search_mode_param, self.default_search_mode)
+        if mode not in self.search_modes:
+            raise ValidationError({
+                self.search_mode_param: f"Must be one of: {', '.join(self.search_modes)}."
+            })
+        return mode
+
+    def construct_search(self, field_name, queryset):
+        if field_name[0] in self.lookup_prefixes:
+            return super().construct_search(field_name, queryset)
+        return f'{field_name}__{self.search_modes[self.search_mode]}'
+
+    def filter_queryset(self, request, queryset, view):
+        self.search_mode = self.get_search_mode(request)
+        return super().filter_queryset(request, queryset, view)
+
+    def get_schema_operation_parameters(self, view):
+        return super().get_schema_operation_parameters(view) + [
+            {
+                'name': self.search_mode_param,
+                'required': False,
+                'in': 'query',
+                'description': 'How search terms are matched against the search fields.',
+                'schema': {
+                    'type': 'string',
+                    'enum': list(self.search_modes),
+                    'default': self.default_search_mode,
+                },
+            },
+        ]
@@ -0,0 +1,332 @@
+"""
+A background job queue kept in the ``Job`` table, without a broker.
+
+Functions registered with ``@task(name)`` are queued with ``enqueue()``,
+which inserts one row. Called inside a transaction, the job commits or
+rolls back with the rest of it. Requests and signal handlers can therefore
+queue their side effects and return.
+
+``manage.py run_workers`` runs the queue on a pool of processes and
+threads. Each worker claims up to ``JOBS_BATCH_SIZE`` jobs at a time with
+``SELECT ... FOR UPDATE SKIP LOCKED``, so workers never wait on each
+other's rows.
+
+A claimed job is leased for ``JOBS_LEASE_SECONDS``. Once the lease runs
+out, for instance because its worker died, the job is run again. Jobs must
+therefore be safe to run more than once.
+
+A job that raises is retried with exponential backoff and jitter, from
+``JOBS_RETRY_BASE_DELAY`` up to ``JOBS_RETRY_MAX_DELAY`` seconds. After
+``max_attempts`` runs it is kept as ``failed``, until the periodic
+``jobs.prune_failed`` deletes it ``JOBS_FAILED_RETENTION_DAYS`` later.
+
+A ``dedup_key`` folds an enqueue into a job with the same key that is
+still queued. That includes a job waiting out its backoff. A job that is
+already running does not absorb the enqueue.
+
+Tasks registered with ``every`` are periodic: each worker process queues
+a run of them when it starts (unless it only drains the queue,
+``--burst``), and every run queues the next one ``every`` seconds later. The ``dedup_key`` keeps a single run of each queued.
+
+With ``JOBS_EAGER`` set, ``enqueue()`` runs the task right away instead
+(the test runner does this).
+"""
+
+import logging
+import random
+import signal
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, close_old_connections, connections, router, transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+
+from reddit_clone.metrics import Counter, Histogram
+from .models import Job
+
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+# Seconds between runs of each periodic task.
+PERIODIC = {}
+
+
+def task(name, every=None):
+    """Register the decorated function as the task ``name``, run every ``every`` seconds if given."""
+    def register(func):
+        if TASKS.setdefault(name, func) is not func:
+            raise ValueError(f'Task {name!r} is already registered')
+        if every is not None:
+            PERIODIC[name] = every
+        return func
+    return register
+
+
+class JobMetrics:
+    def __init__(self):
+        self.enqueued = Counter()
+        self.completed = Counter()
+        self.retried = Counter()
+        self.failed = Counter()
+        # Seconds from a job's run_at to its claim, and spent running it.
+        self.latency = Histogram()
+        self.duration = Histogram()
+
+    def snapshot(self):
+        return {
+            'enqueued': self.enqueued.value,
+            'completed': self.completed.value,
+            'retried': self.retried.value,
+            'failed': self.failed.value,
+            'latency': self.latency.snapshot(),
+            'duration': self.duration.snapshot(),
+        }
+
+
+metrics = JobMetrics()
+
+
+def queue_stats():
+    """The queue's depth by status and the age of its oldest ready job."""
+    now = timezone.now()
+    # Each status is read through its partial index, without scanning the
+    # failed jobs kept for inspection along with the rest.
+    stats = Job.objects.filter(Q(status=Job.QUEUED) | Q(status=Job.RUNNING)).aggregate(
+        queued=Count('pk', filter=Q(status=Job.QUEUED)),
+        running=Count('pk', filter=Q(status=Job.RUNNING)),
+        oldest=Min('run_at', filter=Q(status=Job.QUEUED, run_at__lte=now)),
+    )
+    stats['failed'] = Job.objects.filter(status=Job.FAILED).count()
+    oldest = stats.pop('oldest')
+    stats['oldest_ready_age'] = round((now - oldest).total_seconds(), 3) if oldest else 0.0
+    return stats
+
+
+def enqueue(name, kwargs=None, priority=0, dedup_key=None, delay=0, max_attempts=None):
+    """
+    Queue the task ``name`` to run with ``kwargs`` (JSON) after ``delay``
+    seconds; jobs of higher ``priority`` run first.
+    """
+    if name not in TASKS:
+        raise ValueError(f'Unknown task {name!r}')
+    kwargs = kwargs or {}
+    metrics.enqueued.inc()
+    if settings.JOBS_EAGER:
+        TASKS[name](**kwargs)
+        return
+    now = timezone.now()
+    job = Job(
+        task=name,
+        kwargs=kwargs,
+        priority=priority,
+        dedup_key=dedup_key,
+        max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS,
+        enqueued_at=now,
+        run_at=now + timedelta(seconds=delay),
+    )
+    # A conflict is a queued job with the same dedup_key.
+    Job.objects.bulk_create([job], ignore_conflicts=dedup_key is not None)
+
+
+def retry_delay(attempts):
+    """Seconds to wait before the next run of a job that failed ``attempts`` times."""
+    delay = min(settings.JOBS_RETRY_MAX_DELAY, settings.JOBS_RETRY_BASE_DELAY * 2 ** (attempts - 1))
+    # Jitter spreads out jobs that failed together, say on an outage.
+    return delay * random.uniform(0.5, 1.0)
+
+
+def claim(limit):
+    """Lease up to ``limit`` ready jobs to this worker and return them."""
+    skip_locked = connections[router.db_for_write(Job)].features.has_select_for_update_skip_locked
+    token, now = uuid.uuid4().hex, timezone.now()
+    ready = Job.objects.filter(status=Job.QUEUED, run_at__lte=now).order_by('-priority', 'run_at', 'pk')
+    if skip_locked:
+        ready = ready.select_for_update(skip_locked=True)
+    # Without SKIP LOCKED (SQLite) nothing is locked and two workers may
+    # read the same rows; the status check lets only one of them take each.
+    with transaction.atomic() if skip_locked else nullcontext():
+        pks = list(ready.values_list('pk', flat=True)[:limit])
+        if not pks:
+            return []
+        Job.objects.filter(pk__in=pks, status=Job.QUEUED).update(
+            status=Job.RUNNING, claim=token, locked_at=now, attempts=F('attempts') + 1
+        )
+    jobs = list(Job.objects.filter(pk__in=pks, claim=token).order_by('-priority', 'run_at', 'pk'))
+    for job in jobs:
+        metrics.latency.observe(max(0.0, (now - job.run_at).total_seconds()))
+    return jobs
+
+
+def finish(job):
+    Job.objects.filter(pk=job.pk, claim=job.claim).delete()
+    metrics.completed.inc()
+
+
+def fail(job, error, permanent=False):
+    """Schedule ``job``'s next attempt, or keep it as failed once it has none left."""
+    leased = Job.objects.filter(pk=job.pk, claim=job.claim)
+    if permanent or job.attempts >= job.max_attempts:
+        leased.update(status=Job.FAILED, claim='', locked_at=None, last_error=error)
+        metrics.failed.inc()
+        return
+    try:
+        with transaction.atomic():
+            leased.update(
+                status=Job.QUEUED,
+                claim='',
+                locked_at=None,
+                last_error=error,
+                run_at=timezone.now() + timedelta(seconds=retry_delay(job.attempts)),
+            )
+    except IntegrityError:
+        # A job with the same dedup_key was queued meanwhile and does the same work.
+        leased.delete()
+    metrics.retried.inc()
+
+
+def run(job):
+    func = TASKS.get(job.task)
+    started = time.perf_counter()
+    try:
+        if func is None:
+            raise LookupError(f'Unknown task {job.task!r}')
+        func(**job.kwargs)
+    except Exception as exc:
+        logger.exception('Job %s (%s) failed on attempt %d', job.pk, job.task, job.attempts)
+        fail(job, f'{type(exc).__name__}: {exc}', permanent=func is None)
+    else:
+        finish(job)
+    finally:
+        metrics.duration.observe(time.perf_counter() - started)
+    if job.task in PERIODIC:
+        # Folded into the retry, if the run failed and has one.
+        enqueue(job.task, dedup_key=job.task, delay=PERIODIC[job.task])
+
+
+@task('jobs.prune_failed', every=3600)
+def prune_failed():
+    """Delete failed jobs whose last attempt is ``JOBS_FAILED_RETENTION_DAYS`` old."""
+    cutoff = timezone.now() - timedelta(days=settings.JOBS_FAILED_RETENTION_DAYS)
+    deleted, _ = Job.objects.filter(status=Job.FAILED, run_at__lt=cutoff).delete()
+    if deleted:
+        logger.info('Deleted %d failed jobs', deleted)
+    return deleted
+
+
+def schedule_periodic():
+    """Queue a run of every periodic task that has none queued."""
+    for name in PERIODIC:
+        enqueue(name, dedup_key=name)
+
+
+def release_expired():
+    """Retry, or fail, running jobs whose lease has run out; return how many."""
+    expired = Job.objects.filter(
+        status=Job.RUNNING,
+        locked_at__lt=timezone.now() - timedelta(seconds=settings.JOBS_LEASE_SECONDS),
+    )
+    jobs = list(expired)
+    for job in jobs:
+        logger.warning('Job %s (%s) outlived its lease', job.pk, job.task)
+        fail(job, 'Lease expired')
+    return len(jobs)
+
+
+def work(stop, batch_size=None, poll_interval=None, burst=False):
+    """
+    Claim and run jobs until ``stop`` is set, or, with ``burst``, until no
+    job is ready. Return how many jobs were run.
+    """
+    batch_size = batch_size or settings.JOBS_BATCH_SIZE
+    poll_interval = settings.JOBS_POLL_INTERVAL if poll_interval is None else poll_interval
+    ran, next_release = 0, 0.0
+    while not stop.is_set():
+        close_old_connections()
+        try:
+            if time.monotonic() >= next_release:
+                release_expired()
+                next_release = time.monotonic() + settings.JOBS_LEASE_SECONDS / 2
+            jobs = claim(batch_size)
+            for job in jobs:
+                run(job)
+        except DatabaseError:
+            if burst:
+                raise
+            # Jobs this worker held are run again once their lease ends.
+            logger.exception('Job queue unavailable')
+            stop.wait(poll_interval)
+            continue
+        ran += len(jobs)
+        if not jobs:
+            if burst:
+                break
+            stop.wait(poll_interval)
+    return ran
+
+
+@contextmanager
+def stop_on_signals(stop):
+    """Set ``stop`` on SIGINT or SIGTERM, so that workers finish their jobs and exit."""
+    handlers = {sig: signal.signal(sig, lambda signum, frame: stop.set()) for sig in (signal.SIGINT, signal.SIGTERM)}
+    try:
+        yield
+    finally:
+        for sig, handler in handlers.items():
+            signal.signal(sig, handler)
+
+
+def report(elapsed, completed, write=None):
+    """Write the metrics and the throughput since ``completed`` jobs; return the jobs completed."""
+    snapshot = metrics.snapshot()
+    line = (
+        f"Jobs: {snapshot['completed']} completed "
+        f"({(snapshot['completed'] - completed) / elapsed if elapsed else 0.0:.1f}/s), "
+        f"{snapshot['retried']} retried, {snapshot['failed']} failed; "
+        f"mean queue latency {snapshot['latency']['mean']:.3f}s"
+    )
+    (write or logger.info)(line)
+    return snapshot['completed']
+
+
+def run_threads(threads, stop, batch_size=None, poll_interval=None, burst=False, write=None):
+    """
+    Run ``work`` on ``threads`` threads; report the metrics every
+    ``JOBS_REPORT_INTERVAL`` seconds and at the end. Return how many jobs
+    were run.
+    """
+    ran = []
+    if not burst:
+        schedule_periodic()
+
+    def worker():
+        try:
+            ran.append(work(stop, batch_size, poll_interval, burst))
+        finally:
+            connections.close_all()
+
+    pool = [threading.Thread(target=worker, name=f'jobs-worker-{i}') for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    last, completed = time.monotonic(), metrics.completed.value
+    # Joining with a timeout keeps the main thread able to take signals.
+    while any(thread.is_alive() for thread in pool):
+        for thread in pool:
+            thread.join(timeout=0.5)
+        if time.monotonic() - last >= settings.JOBS_REPORT_INTERVAL:
+            completed = report(time.monotonic() - last, completed, write)
+            last = time.monotonic()
+    report(time.monotonic() - last, completed, write)
+    return sum(ran)
+
+
+def run_process(threads, batch_size, poll_interval, burst, write=None):
+    """Entry point of a worker process forked by ``run_workers``."""
+    stop = threading.Event()
+    with stop_on_signals(stop):
+        run_threads(threads, stop, batch_size, poll_interval, burst, write)
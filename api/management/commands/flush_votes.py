@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from api.votes import VOTE_MODELS, apply_pending
+
+
+class Command(BaseCommand):
+    help = "Apply every pending vote to its post's or comment's counters."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Votes per transaction.")
+
+    def handle(self, *args, **options):
+        for vote_model in VOTE_MODELS:
+            applied = apply_pending(vote_model, batch_size=options['batch_size'])
+            self.stdout.write(f"Applied {applied} pending {vote_model._meta.verbose_name_plural}")
@@ -0,0 +1,41 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+from drf_spectacular.settings import spectacular_settings
+
+from api.schema import SCHEMA_FORMATS, schema_path
+
+
+class Command(BaseCommand):
+    help = "Generate the OpenAPI schema served by /api-schema/ as JSON and YAML."
+
+    renderers = {
+        'json': OpenApiJsonRenderer,
+        'yaml': OpenApiYamlRenderer,
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output-dir',
+            default=None,
+            help="Directory to write to (defaults to settings.API_SCHEMA_DIR).",
+        )
+
+    def handle(self, *args, **options):
+        output_dir = options['output_dir'] or settings.API_SCHEMA_DIR
+        os.makedirs(output_dir, exist_ok=True)
+
+        generator = spectacular_settings.DEFAULT_GENERATOR_CLASS()
+        schema = generator.get_schema(request=None, public=True)
+
+        for schema_format in SCHEMA_FORMATS:
+            content = self.renderers[schema_format]().render(schema, renderer_context={})
+            path = schema_path(schema_format, output_dir)
+            # Write then rename so running workers never read a partial file.
+            with open(f'{path}.tmp', 'wb') as schema_file:
+                schema_file.write(content)
+            os.replace(f'{path}.tmp', path)
+            self.stdout.write(f"Wrote {path} ({len(content)} bytes)")
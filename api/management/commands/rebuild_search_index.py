@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from api.search import rebuild
+
+
+class Command(BaseCommand):
+    help = "Rewrite the search documents of every user, community and post."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Objects per upsert.")
+
+    def handle(self, *args, **options):
+        for kind, count in rebuild(batch_size=options['batch_size']).items():
+            self.stdout.write(f"Indexed {count} {kind} documents")
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from api.votes import VOTE_MODELS, apply_pending, rebuild_counts, target_model
+
+
+class Command(BaseCommand):
+    help = "Recompute every post's and comment's vote counters from the vote tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Targets per transaction.")
+
+    def handle(self, *args, **options):
+        for vote_model in VOTE_MODELS:
+            apply_pending(vote_model)
+            rebuilt = rebuild_counts(vote_model, batch_size=options['batch_size'])
+            self.stdout.write(f"Rebuilt the counters of {rebuilt} {target_model(vote_model)._meta.verbose_name_plural}")
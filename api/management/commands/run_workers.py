@@ -0,0 +1,64 @@
+import multiprocessing
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from api import jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued background jobs on a pool of worker processes, each with "
+        "a pool of threads, until interrupted (SIGINT or SIGTERM). Workers "
+        "finish the jobs they hold before exiting."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1, help="Worker processes; 1 runs in this process.")
+        parser.add_argument('--threads', type=int, default=1, help="Worker threads per process.")
+        parser.add_argument('--batch-size', type=int, help="Jobs claimed at a time; defaults to JOBS_BATCH_SIZE.")
+        parser.add_argument('--poll-interval', type=float, help="Seconds between polls of an idle queue.")
+        parser.add_argument('--burst', action='store_true', help="Exit once no job is ready.")
+
+    def handle(self, *args, **options):
+        processes, threads = options['processes'], options['threads']
+        if processes < 1 or threads < 1:
+            raise CommandError("--processes and --threads must be at least 1.")
+        batch_size, poll_interval, burst = options['batch_size'], options['poll_interval'], options['burst']
+
+        if processes == 1:
+            stop = threading.Event()
+            with jobs.stop_on_signals(stop):
+                ran = jobs.run_threads(threads, stop, batch_size, poll_interval, burst, write=self.stdout.write)
+            self.stdout.write(f"Ran {ran} jobs")
+            return
+
+        # Forked workers must not share the parent's connections.
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        pool = [
+            context.Process(
+                target=jobs.run_process,
+                args=(threads, batch_size, poll_interval, burst),
+                kwargs={'write': self.stdout.write},
+                name=f'jobs-{i}',
+            )
+            for i in range(processes)
+        ]
+        for process in pool:
+            process.start()
+        stop = threading.Event()
+        with jobs.stop_on_signals(stop):
+            # Passed on as SIGTERM, on which each worker finishes its jobs.
+            while any(process.is_alive() for process in pool):
+                if stop.is_set():
+                    for process in pool:
+                        process.terminate()
+                    break
+                stop.wait(0.5)
+        for process in pool:
+            process.join()
+        failed = [process.name for process in pool if process.exitcode]
+        if failed:
+            raise CommandError(f"Worker processes exited with an error: {', '.join(failed)}")
@@ -0,0 +1,119 @@
+"""
+Serialization of ``.values()`` rows for read-only listings.
+
+``RowMapper`` is compiled once per serializer class. It reads the
+serializer's fields up front, so a page of rows is mapped with one dict per
+row, without model instances or DRF's per-field ``get_attribute`` and
+``to_representation`` calls. The output equals the serializer's own.
+
+Only fields backed by a model column, directly or through foreign keys
+(``source="author.username"``), can be mapped. Strings, integers and
+booleans are copied as they are; any other field, a ``DateTimeField`` say,
+still converts its values with its ``to_representation``. A serializer with
+nested serializers, method fields or other computed values raises
+``ImproperlyConfigured`` when its mapper is compiled.
+"""
+
+import functools
+from operator import itemgetter
+
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from rest_framework import fields, serializers
+from rest_framework.fields import empty
+from rest_framework.response import Response
+
+
+# Field classes whose to_representation returns the column's value as is.
+PLAIN_FIELDS = (fields.CharField, fields.IntegerField, fields.BooleanField)
+
+
+def is_plain(field):
+    return any(
+        isinstance(field, base) and type(field).to_representation is base.to_representation
+        for base in PLAIN_FIELDS
+    )
+
+
+class RowMapper:
+    """Maps ``.values(*mapper.columns)`` rows to the representation of ``serializer_class``."""
+
+    def __init__(self, serializer_class):
+        serializer = serializer_class()
+        model = serializer.Meta.model
+        self.names, self.columns, self.converters = [], [], []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            self.names.append(name)
+            self.columns.append(self.column(model, field, serializer_class))
+            self.converters.append(None if is_plain(field) else field.to_representation)
+        self.get = itemgetter(*self.columns) if len(self.columns) > 1 else (lambda row: (row[self.columns[0]],))
+        if not any(self.converters):
+            self.converters = None
+
+    def column(self, model, field, serializer_class):
+        """The ``.values()`` lookup of ``field``."""
+        where = f'{serializer_class.__name__}.{field.field_name}'
+        if isinstance(field, (serializers.BaseSerializer, serializers.SerializerMethodField)) or field.source == '*':
+            raise ImproperlyConfigured(f'{where} is not a model column and cannot be read from .values().')
+        nullable = False
+        for position, attr in enumerate(field.source_attrs):
+            try:
+                model_field = model._meta.get_field(attr)
+            except FieldDoesNotExist:
+                raise ImproperlyConfigured(f'{where} reads {attr!r}, which is not a field of {model.__name__}.')
+            last = position == len(field.source_attrs) - 1
+            if model_field.is_relation != (not last) or (model_field.is_relation and model_field.many_to_many):
+                raise ImproperlyConfigured(f'{where} must end at a column, through foreign keys only.')
+            if not last:
+                nullable = nullable or model_field.null
+                model = model_field.related_model
+        # Through a missing relation the serializer would fall back to the
+        # default, or leave the field out; a row has None.
+        if nullable and field.default is not None and not (field.default is empty and field.allow_null):
+            raise ImproperlyConfigured(f'{where} goes through a nullable relation; give it default=None.')
+        return '__'.join(field.source_attrs)
+
+    def map(self, rows):
+        names, get, converters = self.names, self.get, self.converters
+        if converters is None:
+            return [dict(zip(names, get(row))) for row in rows]
+        return [
+            {
+                name: value if value is None or convert is None else convert(value)
+                for name, convert, value in zip(names, converters, get(row))
+            }
+            for row in rows
+        ]
+
+
+@functools.cache
+def mapper_for(serializer_class):
+    return RowMapper(serializer_class)
+
+
+class ValuesListMixin:
+    """
+    Lists rows read with ``.values()`` and mapped by ``RowMapper`` instead of
+    serializing model instances. The view's serializer still describes the
+    output, and the schema. Besides the serializer's columns, rows carry the
+    primary key and the orderable fields, which keyset pagination reads its
+    cursors from.
+    """
+
+    def get_values_columns(self, mapper):
+        orderings = [
+            *(getattr(self, 'ordering_fields', None) or ()),
+            *(getattr(self, 'keyset_sorts', None) or {}).values(),
+            getattr(self, 'keyset_default_ordering', 'pk'),
+        ]
+        extra = ['pk', *(ordering.lstrip('-') for ordering in orderings)]
+        return list(dict.fromkeys(mapper.columns + [column for column in extra if column != 'id']))
+
+    def list(self, request, *args, **kwargs):
+        mapper = mapper_for(self.get_serializer_class())
+        queryset = self.filter_queryset(self.get_queryset()).values(*self.get_values_columns(mapper))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(mapper.map(page))
+        return Response(mapper.map(queryset))
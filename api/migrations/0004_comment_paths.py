@@ -0,0 +1,59 @@
+# Generated by Django 5.1.4 on 2026-10-18 09:38
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_paths(apps, schema_editor):
+    """Set path, depth and replies_count on existing comments, a level at a time."""
+    Comment = apps.get_model('api', 'Comment')
+    comments = Comment.objects.using(schema_editor.connection.alias)
+    level = comments.filter(parent__isnull=True)
+    depth = 0
+    while level.exists():
+        batch = []
+        for comment in level.annotate(reply_count=Count('replies')).select_related('parent').iterator():
+            prefix = comment.parent.path if comment.parent_id else ''
+            comment.path = f'{prefix}{comment.pk:010d}'
+            comment.depth = depth
+            comment.replies_count = comment.reply_count
+            batch.append(comment)
+        comments.bulk_update(batch, ['path', 'depth', 'replies_count'], batch_size=1000)
+        level = comments.filter(parent__in=level)
+        depth += 1
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_votes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='comment',
+            name='comment_post_created_idx',
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='path',
+            field=models.CharField(default='', editable=False, max_length=1000),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='replies_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_paths, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', 'path'], name='comment_post_path_idx'),
+        ),
+    ]
@@ -0,0 +1,79 @@
+from django.conf import settings
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import Value
+
+
+BATCH_SIZE = 1000
+
+
+# How each kind's title and body are built as of this migration, from the
+# historical models. api/search.py is free to change after it.
+def user_document(user):
+    if not user.is_active or not user.username:
+        return None
+    return user.username, ' '.join(filter(None, (user.firstName, user.lastName)))
+
+
+def community_document(community):
+    return community.name, f'{community.title}\n{community.description}'
+
+
+def post_document(post):
+    return post.title, post.body
+
+
+SOURCES = [
+    ('user', 'accounts', 'CustomUser', ('username', 'firstName', 'lastName', 'is_active'), user_document),
+    ('community', 'api', 'Community', ('name', 'title', 'description'), community_document),
+    ('post', 'api', 'Post', ('title', 'body'), post_document),
+]
+
+
+def backfill_search_documents(apps, schema_editor):
+    """Index the users, communities and posts that predate 0005_search_documents."""
+    using = schema_editor.connection.alias
+    vectors = schema_editor.connection.vendor == 'postgresql'
+    SearchDocument = apps.get_model('api', 'SearchDocument')
+    for kind, app_label, model_name, fields, document in SOURCES:
+        objects = apps.get_model(app_label, model_name)._default_manager.using(using).only(*fields).order_by('pk')
+        last = 0
+        while True:
+            batch = list(objects.filter(pk__gt=last)[:BATCH_SIZE])
+            if not batch:
+                break
+            documents = []
+            for instance in batch:
+                built = document(instance)
+                if built is None:
+                    continue
+                title, body = built
+                documents.append(SearchDocument(
+                    kind=kind,
+                    object_id=instance.pk,
+                    title=title,
+                    body=body,
+                    vector=(
+                        SearchVector(Value(title), weight='A', config=settings.SEARCH_CONFIG)
+                        + SearchVector(Value(body), weight='B', config=settings.SEARCH_CONFIG)
+                    ) if vectors else None,
+                ))
+            # Documents written since by the signals are left as they are.
+            SearchDocument.objects.using(using).bulk_create(documents, ignore_conflicts=True)
+            last = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    # Each batch commits on its own instead of one transaction holding every
+    # row, and the migration is safe to run again after a failure.
+    atomic = False
+
+    dependencies = [
+        ('accounts', '0004_follow_counters'),
+        ('api', '0006_jobs'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_search_documents, migrations.RunPython.noop, elidable=True),
+    ]
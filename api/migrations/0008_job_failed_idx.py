@@ -0,0 +1,17 @@
+# Generated by Django 5.1.4 on 2026-10-18 11:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_backfill_search_documents'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(condition=models.Q(('status', 'failed')), fields=['run_at'], name='job_failed_idx'),
+        ),
+    ]
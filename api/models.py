@@ -1,3 +1,425 @@
-from django.db import models
+from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
+from django.core.validators import RegexValidator
+from django.db import IntegrityError, models, transaction
+from django.db.models import Case, Exists, F, OuterRef, Q, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
 
-# Create your models here.
+from accounts.models import CustomUser
+from . import ranking, threads
+
+
+def shifted(counter, delta):
+    # Greatest() keeps a counter that drifted from going negative.
+    return Greatest(F(counter) + delta, 0, output_field=models.PositiveIntegerField())
+
+
+class FollowManager(models.Manager):
+
+    def follow(self, follower_id, followee_id):
+        """Add the edge and bump both counters; return False if it existed."""
+        with transaction.atomic(using=self.db):
+            try:
+                with transaction.atomic(using=self.db):
+                    self.create(follower_id=follower_id, followee_id=followee_id)
+            except IntegrityError:
+                return False
+            self.adjust_counts(follower_id, followee_id, 1)
+        return True
+
+    def unfollow(self, follower_id, followee_id):
+        """Remove the edge and decrement both counters; return False if there was none."""
+        with transaction.atomic(using=self.db):
+            deleted, _ = self.filter(follower_id=follower_id, followee_id=followee_id).delete()
+            if deleted:
+                self.adjust_counts(follower_id, followee_id, -1)
+        return bool(deleted)
+
+    def adjust_counts(self, follower_id, followee_id, delta):
+        """Shift ``following_count`` of one user and ``followers_count`` of the other in one UPDATE."""
+        CustomUser.objects.using(self.db).filter(pk__in=[follower_id, followee_id]).update(
+            following_count=Case(
+                When(pk=follower_id, then=shifted('following_count', delta)), default=F('following_count')
+            ),
+            followers_count=Case(
+                When(pk=followee_id, then=shifted('followers_count', delta)), default=F('followers_count')
+            ),
+        )
+
+    def followers_of(self, user_id):
+        return self.filter(followee_id=user_id)
+
+    def following_of(self, user_id):
+        return self.filter(follower_id=user_id)
+
+    def mutuals_of(self, user_id):
+        """
+        Edges from the user to users who follow back.
+
+        Walks the user's following range and probes the unique index for
+        the reverse edge, so the cost follows the page size and how many
+        the user follows, never the follower count.
+        """
+        return self.following_of(user_id).filter(
+            Exists(self.filter(follower_id=OuterRef('followee_id'), followee_id=user_id))
+        )
+
+    def id_batches(self, queryset, column, batch_size=1000):
+        """Yield the ``column`` ids of the edges in ``queryset``, ``batch_size`` at a time, by keyset."""
+        last = 0
+        while True:
+            ids = list(
+                queryset.filter(**{f'{column}__gt': last})
+                .order_by(column)
+                .values_list(column, flat=True)[:batch_size]
+            )
+            if not ids:
+                return
+            yield ids
+            last = ids[-1]
+
+    def detach(self, user_id, batch_size=1000):
+        """
+        Decrement the counters of everyone on the other end of the user's
+        edges, one UPDATE per ``batch_size`` users, before the edges are
+        deleted with the user.
+        """
+        for queryset, column, counter in (
+            (self.followers_of(user_id), 'follower_id', 'following_count'),
+            (self.following_of(user_id), 'followee_id', 'followers_count'),
+        ):
+            for ids in self.id_batches(queryset, column, batch_size):
+                CustomUser.objects.using(self.db).filter(pk__in=ids).update(**{counter: shifted(counter, -1)})
+
+
+class Follow(models.Model):
+    """A directed "follows" edge between two users."""
+    # Both columns lead one of the composite indexes below, which serve the
+    # foreign keys too.
+    follower = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='following_edges', db_index=False
+    )
+    followee = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='follower_edges', db_index=False
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = FollowManager()
+
+    class Meta:
+        constraints = [
+            # Also the index for "who does X follow", in followee order.
+            models.UniqueConstraint(fields=['follower', 'followee'], name='follow_unique_edge'),
+            models.CheckConstraint(condition=~Q(follower=F('followee')), name='follow_not_self'),
+        ]
+        indexes = [
+            # "Who follows X", in follower order.
+            models.Index(fields=['followee', 'follower'], name='follow_followee_follower_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.follower_id} -> {self.followee_id}'
+
+
+class Community(models.Model):
+    """A subreddit."""
+    name = models.CharField(
+        max_length=21,
+        unique=True,
+        validators=[RegexValidator(r'^[a-z0-9_]{3,21}$', '3 to 21 lowercase letters, digits or underscores.')],
+    )
+    title = models.CharField(max_length=100)
+    description = models.TextField(blank=True)
+    creator = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name='created_communities'
+    )
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name_plural = 'communities'
+
+    def __str__(self):
+        return self.name
+
+
+# Columns a feed page reads; see PostListSerializer.
+FEED_FIELDS = (
+    'id', 'title', 'url', 'score', 'comments_count', 'created_at', 'hot',
+    'community__id', 'community__name', 'author__id', 'author__username',
+)
+
+
+class PostManager(models.Manager):
+
+    def feed(self):
+        return self.select_related('community', 'author').only(*FEED_FIELDS)
+
+    def apply_votes(self, deltas, absolute=False):
+        """
+        Add ``{post_id: (ups, downs)}`` vote deltas (or with ``absolute``,
+        set the counts) and recompute the score and ``hot`` of those posts
+        only, in one UPDATE. Returns the number of posts updated.
+        """
+        if not deltas:
+            return 0
+        with transaction.atomic(using=self.db):
+            posts = list(
+                self.select_for_update()
+                .filter(pk__in=deltas)
+                .order_by('pk')
+                .only('ups', 'downs', 'created_at')
+            )
+            for post in posts:
+                ups, downs = deltas[post.pk]
+                if not absolute:
+                    ups, downs = post.ups + ups, post.downs + downs
+                post.ups, post.downs = max(ups, 0), max(downs, 0)
+                post.score = post.ups - post.downs
+                post.hot = ranking.hot(post.score, post.created_at)
+            self.bulk_update(posts, ['ups', 'downs', 'score', 'hot'])
+        return len(posts)
+
+
+class Post(models.Model):
+    # Indexed by the per-community feed indexes below.
+    community = models.ForeignKey(Community, on_delete=models.CASCADE, related_name='posts', db_index=False)
+    author = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name='posts')
+    title = models.CharField(max_length=300)
+    url = models.URLField(max_length=2000, blank=True)
+    body = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    ups = models.PositiveIntegerField(default=0)
+    downs = models.PositiveIntegerField(default=0)
+    score = models.IntegerField(default=0)
+    comments_count = models.PositiveIntegerField(default=0)
+    # ranking.hot(score, created_at), kept current by PostManager.apply_votes
+    hot = models.FloatField(default=0, editable=False)
+
+    objects = PostManager()
+
+    class Meta:
+        # One index per feed sort, front page and per community, matching
+        # KeysetPagination's (field, id) seek in descending order.
+        indexes = [
+            models.Index(fields=['-hot', '-id'], name='post_hot_idx'),
+            models.Index(fields=['-score', '-id'], name='post_top_idx'),
+            models.Index(fields=['-created_at', '-id'], name='post_new_idx'),
+            models.Index(fields=['community', '-hot', '-id'], name='post_community_hot_idx'),
+            models.Index(fields=['community', '-score', '-id'], name='post_community_top_idx'),
+            models.Index(fields=['community', '-created_at', '-id'], name='post_community_new_idx'),
+        ]
+
+    def __str__(self):
+        return self.title
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            self.hot = ranking.hot(self.score, self.created_at)
+        super().save(*args, **kwargs)
+
+
+THREAD_FIELDS = (
+    'id', 'parent_id', 'path', 'depth', 'author__username', 'body', 'score', 'replies_count', 'created_at',
+)
+
+
+class CommentManager(models.Manager):
+
+    def apply_votes(self, deltas, absolute=False):
+        """Add ``{comment_id: (ups, downs)}`` vote deltas (or set the totals) to the comments' scores in one UPDATE."""
+        if not deltas:
+            return 0
+        with transaction.atomic(using=self.db):
+            comments = list(self.select_for_update().filter(pk__in=deltas).order_by('pk').only('score'))
+            for comment in comments:
+                ups, downs = deltas[comment.pk]
+                comment.score = ups - downs + (0 if absolute else comment.score)
+            self.bulk_update(comments, ['score'])
+        return len(comments)
+
+    def add(self, post_id, author_id, body, parent_id=None):
+        """
+        Create a comment, with its path under the parent's, and bump the
+        post's ``comments_count`` and the parent's ``replies_count``.
+        """
+        with transaction.atomic(using=self.db):
+            path, depth = '', 0
+            if parent_id is not None:
+                parent = self.filter(pk=parent_id, post_id=post_id).values_list('path', 'depth').get()
+                path, depth = parent[0], parent[1] + 1
+                if depth >= threads.MAX_DEPTH:
+                    raise ValueError(f'Comments nest at most {threads.MAX_DEPTH} deep')
+                self.filter(pk=parent_id).update(replies_count=F('replies_count') + 1)
+            comment = self.create(post_id=post_id, author_id=author_id, body=body, parent_id=parent_id, depth=depth)
+            comment.path = path + threads.encode(comment.pk)
+            self.filter(pk=comment.pk).update(path=comment.path)
+            Post.objects.using(self.db).filter(pk=post_id).update(comments_count=F('comments_count') + 1)
+        return comment
+
+    def thread(self, post_id, cursor=None, depth=None, min_score=None):
+        """
+        ``THREAD_FIELDS`` of the post's comments in path order, as one range
+        of the ``(post, path)`` index: the whole thread, or with ``cursor``
+        the rest of that comment's siblings and their replies. ``depth``
+        limits the levels below the top one and ``min_score`` the score.
+        """
+        comments = self.filter(post_id=post_id)
+        top = 0
+        if cursor:
+            top = threads.depth_of(cursor)
+            comments = comments.filter(path__gte=cursor)
+            if top:
+                comments = comments.filter(path__lt=threads.successor(cursor[:-threads.SEGMENT]))
+        if depth is not None:
+            comments = comments.filter(depth__lte=top + depth)
+        if min_score is not None:
+            comments = comments.filter(score__gte=min_score)
+        return comments.order_by('path').values(*THREAD_FIELDS)
+
+
+class Comment(models.Model):
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments', db_index=False)
+    parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='replies')
+    author = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name='comments'
+    )
+    body = models.TextField()
+    created_at = models.DateTimeField(default=timezone.now)
+    score = models.IntegerField(default=0)
+    # See api/threads.py; set by CommentManager.add
+    path = models.CharField(max_length=threads.SEGMENT * threads.MAX_DEPTH, editable=False, default='')
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    replies_count = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = CommentManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'path'], name='comment_post_path_idx'),
+        ]
+
+    def __str__(self):
+        return f'Comment {self.pk} on post {self.post_id}'
+
+
+class Vote(models.Model):
+    """
+    One user's vote on a target; subclasses add the ``target`` foreign key.
+
+    ``value`` is the current vote (1, -1, or 0 once withdrawn) and
+    ``applied`` the value the target's counters reflect. ``pending`` marks
+    rows where they differ; api/votes.py folds those into the counters in
+    batches.
+    """
+    VALUES = (1, 0, -1)
+
+    # Votes outlive their voter's account, so deleting it keeps the scores.
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name='+')
+    value = models.SmallIntegerField(default=0)
+    applied = models.SmallIntegerField(default=0)
+    pending = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+
+
+class PostVote(Vote):
+    # Indexed by the (post, user) constraint.
+    target = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='votes', db_index=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['target', 'user'], name='post_vote_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['id'], condition=Q(pending=True), name='post_vote_pending_idx'),
+        ]
+
+
+class CommentVote(Vote):
+    target = models.ForeignKey(Comment, on_delete=models.CASCADE, related_name='votes', db_index=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['target', 'user'], name='comment_vote_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['id'], condition=Q(pending=True), name='comment_vote_pending_idx'),
+        ]
+
+
+class SearchDocument(models.Model):
+    """
+    The searchable text of one user, community or post, written by
+    api/search.py. ``vector`` is only filled in on Postgres, where it is
+    GIN indexed.
+    """
+    KINDS = [
+        ('user', 'User'),
+        ('community', 'Community'),
+        ('post', 'Post'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KINDS)
+    object_id = models.BigIntegerField()
+    title = models.TextField()
+    body = models.TextField(blank=True)
+    vector = SearchVectorField(null=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='search_document_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.kind} {self.object_id}'
+
+
+class Job(models.Model):
+    """
+    A unit of background work for api/jobs.py: ``task`` names a registered
+    function and ``kwargs`` are its JSON arguments.
+
+    Queued jobs run by descending ``priority``, then ``run_at``. While a job
+    is queued, no other job with its ``dedup_key`` can be. Finished jobs are
+    deleted; jobs out of attempts stay as ``failed`` for
+    ``JOBS_FAILED_RETENTION_DAYS``.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUSES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (FAILED, 'Failed'),
+    ]
+
+    task = models.CharField(max_length=100)
+    kwargs = models.JSONField(default=dict)
+    priority = models.SmallIntegerField(default=0)
+    dedup_key = models.CharField(max_length=200, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUSES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    enqueued_at = models.DateTimeField(default=timezone.now)
+    run_at = models.DateTimeField(default=timezone.now)
+    # Set by the worker that claimed the job, which alone may finish it.
+    claim = models.CharField(max_length=32, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['dedup_key'], condition=Q(status='queued'), name='job_queued_dedup_key'),
+        ]
+        indexes = [
+            models.Index(fields=['-priority', 'run_at'], condition=Q(status='queued'), name='job_queued_idx'),
+            models.Index(fields=['locked_at'], condition=Q(status='running'), name='job_running_idx'),
+            models.Index(fields=['run_at'], condition=Q(status='failed'), name='job_failed_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.task} {self.pk} ({self.status})'
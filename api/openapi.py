@@ -0,0 +1,30 @@
+from drf_spectacular.openapi import AutoSchema as SpectacularAutoSchema
+from drf_spectacular.plumbing import get_doc
+from drf_spectacular.settings import spectacular_settings
+
+
+class AutoSchema(SpectacularAutoSchema):
+    """
+    Describes an endpoint with the first docstring in its view's MRO, as
+    drf-spectacular does, but passes over the view mixins in
+    ``undocumented_bases``. Those are shared by most endpoints and document
+    themselves, not the endpoint.
+    """
+    undocumented_bases = (
+        'reddit_clone.instrumentation.InstrumentedViewMixin',
+        'api.cache.CachedResponseMixin',
+        'api.mappers.ValuesListMixin',
+    )
+
+    def get_description(self):
+        action_or_method = getattr(self.view, getattr(self.view, 'action', self.method.lower()), None)
+        return get_doc(action_or_method) or self.get_view_doc()
+
+    def get_view_doc(self):
+        excluded = spectacular_settings.GET_LIB_DOC_EXCLUDES()
+        for cls in type(self.view).__mro__:
+            if cls in excluded:
+                break
+            if cls.__doc__ and f'{cls.__module__}.{cls.__qualname__}' not in self.undocumented_bases:
+                return get_doc(cls)
+        return ''
@@ -1,7 +1,310 @@
-from rest_framework.pagination import PageNumberPagination
+from django.core import signing
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
 
 class CustomPagination(PageNumberPagination):
     page_size = 25
     page_size_query_param = 'page_size'
     page_query_param = 'page'
-    max_page_size = 100
\ No newline at end of file
+    max_page_size = 100
+
+
+def estimated_count(queryset):
+    """
+    Return the planner's row estimate for an unfiltered queryset on Postgres.
+
+    Reads ``pg_class.reltuples`` instead of running ``COUNT(*)``. Returns
+    None when the queryset is filtered, the database is not Postgres or the
+    table has never been analyzed.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql' or queryset.query.where:
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+            [queryset.model._meta.db_table],
+        )
+        row = cursor.fetchone()
+    if row is None or row[0] < 0:
+        return None
+    return row[0]
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination that seeks on ``(ordering field, id)``.
+
+    Every page is a ``WHERE field >= value AND (field > value OR id > last_id)
+    ORDER BY field, id LIMIT n`` query, so page 10,000 costs the same as
+    page 1 and no ``COUNT(*)`` is run. The ordering is picked from the
+    view's ``ordering_fields`` with the usual ``?ordering=-field`` parameter
+    and falls back to ``default_ordering``. NULLs sort last in either
+    direction.
+
+    Views may instead offer named sorts with ``keyset_sorts``, e.g.
+    ``{'hot': '-hot', 'new': '-created_at'}``, picked with ``?sort=``.
+
+    Cursors are signed with the project's ``SECRET_KEY``; a tampered or
+    foreign cursor is rejected with 404, like DRF's own cursor pagination.
+
+    ``count_mode = 'estimate'`` adds a ``count`` read from
+    ``pg_class.reltuples`` for unfiltered listings (null otherwise).
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering_param = OrderingFilter.ordering_param
+    sort_param = 'sort'
+    default_ordering = 'id'
+    tie_breaker = 'pk'
+    count_mode = None
+    cursor_salt = 'api.pagination.KeysetPagination'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.model = queryset.model
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.count_mode = getattr(view, 'keyset_count_mode', self.count_mode)
+        self.count = self.get_count(queryset)
+
+        cursor = self.decode_cursor(request)
+        if cursor is None:
+            position, reverse = None, False
+        else:
+            position, reverse = cursor
+
+        rows = self.fetch(queryset, position, forward=not reverse, limit=self.page_size + 1)
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+
+        if reverse:
+            rows.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+
+        self.page = rows
+        return rows
+
+    def get_ordering(self, request, queryset, view):
+        """Return ``(field name, descending)`` for this request."""
+        allowed = getattr(view, 'ordering_fields', None) or ()
+        sorts = getattr(view, 'keyset_sorts', None) or {}
+        requested = request.query_params.get(self.ordering_param, '').split(',')[0].strip()
+        sort = request.query_params.get(self.sort_param)
+        if sort in sorts:
+            ordering = sorts[sort]
+        elif requested and requested.lstrip('-') in allowed:
+            ordering = requested
+        else:
+            ordering = getattr(view, 'keyset_default_ordering', self.default_ordering)
+        field_name = ordering.lstrip('-')
+        if field_name == 'id':
+            field_name = 'pk'
+        return field_name, ordering.startswith('-')
+
+    def get_count(self, queryset):
+        if self.count_mode == 'estimate':
+            return estimated_count(queryset)
+        return None
+
+    def get_field(self, field_name):
+        opts = self.model._meta
+        return opts.pk if field_name == 'pk' else opts.get_field(field_name)
+
+    def fetch(self, queryset, position, forward, limit):
+        """
+        Return up to ``limit`` rows after ``position`` in the requested
+        direction.
+
+        Non-NULL values are read with one index range scan; for nullable
+        fields the NULL section is read with a second query only when the
+        page crosses into it.
+        """
+        field_name, descending = self.ordering
+        field = self.get_field(field_name)
+        pk = self.tie_breaker
+        # When walking backwards every comparison and order flips.
+        step_down = descending != (not forward)
+
+        sections = ['values', 'nulls'] if field.null else ['values']
+        if not forward:
+            sections.reverse()
+
+        if position is None:
+            start, bound = sections[0], None
+        else:
+            value, last_pk = position
+            start = 'nulls' if value is None else 'values'
+            bound = (value, last_pk)
+
+        rows = []
+        for section in sections[sections.index(start):]:
+            if section == 'values':
+                qs = queryset.filter(**{f'{field_name}__isnull': False}) if field.null else queryset
+                if bound is not None and section == start:
+                    value, last_pk = bound
+                    if field_name == pk:
+                        qs = qs.filter(**{f'{pk}__{"lt" if step_down else "gt"}': last_pk})
+                    else:
+                        qs = qs.filter(
+                            Q(**{f'{field_name}__{"lte" if step_down else "gte"}': value}),
+                            Q(**{f'{field_name}__{"lt" if step_down else "gt"}': value})
+                            | Q(**{f'{pk}__{"lt" if step_down else "gt"}': last_pk}),
+                        )
+                order = [f'-{field_name}', f'-{pk}'] if step_down else [field_name, pk]
+            else:
+                qs = queryset.filter(**{f'{field_name}__isnull': True})
+                if bound is not None and section == start:
+                    qs = qs.filter(**{f'{pk}__{"lt" if step_down else "gt"}': bound[1]})
+                order = [f'-{pk}'] if step_down else [pk]
+            if field_name == pk:
+                order = order[1:]
+
+            rows.extend(qs.order_by(*order)[:limit - len(rows)])
+            if len(rows) >= limit:
+                break
+        return rows
+
+    def get_position(self, instance):
+        field_name, _ = self.ordering
+        if isinstance(instance, dict):
+            value, pk = instance[field_name], instance[self.tie_breaker]
+        else:
+            value, pk = getattr(instance, field_name), instance.pk
+        if hasattr(value, 'isoformat'):
+            value = value.isoformat()
+        return value, pk
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            payload = signing.loads(encoded, salt=self.cursor_salt)
+            ordering, value, pk, reverse = payload
+        except (signing.BadSignature, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if tuple(ordering) != self.ordering:
+            raise NotFound(self.invalid_cursor_message)
+        if value is not None:
+            value = self.get_field(self.ordering[0]).to_python(value)
+        return (value, pk), reverse
+
+    def encode_cursor(self, instance, reverse=False):
+        value, pk = self.get_position(instance)
+        payload = [list(self.ordering), value, pk, reverse]
+        encoded = signing.dumps(payload, salt=self.cursor_salt, compress=True)
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        payload = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+        }
+        if self.count_mode is not None:
+            payload['count'] = self.count
+        payload['results'] = data
+        return Response(payload)
+
+    def get_schema_operation_parameters(self, view):
+        parameters = super().get_schema_operation_parameters(view)
+        sorts = getattr(view, 'keyset_sorts', None)
+        if sorts:
+            parameters.append({
+                'name': self.sort_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Sort order.',
+                'schema': {'type': 'string', 'enum': list(sorts)},
+            })
+        return parameters
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count'] = {
+            'type': 'integer',
+            'nullable': True,
+            'description': 'Estimated number of rows, when available.',
+        }
+        return response_schema
+
+
+class SearchPagination(CursorPagination):
+    """
+    Cursor pagination for ranked search hits (see api/search.py).
+
+    Ranks are computed per query, so there is no column to seek on: the
+    cursor carries the last hit's ``(rank, document id)`` position, signed
+    together with the query and kinds it belongs to, and the search resumes
+    below it. Pages only go forward.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_salt = 'api.pagination.SearchPagination'
+
+    def paginate_search(self, search, request, key):
+        """Return a page of ``search(after, limit)`` hits for the query ``key``."""
+        self.base_url = request.build_absolute_uri()
+        self.key = list(key)
+        self.page_size = self.get_page_size(request)
+        hits = search(self.decode_cursor(request), self.page_size + 1)
+        self.has_next = len(hits) > self.page_size
+        self.page = hits[:self.page_size]
+        return self.page
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            key, rank, pk = signing.loads(encoded, salt=self.cursor_salt)
+        except (signing.BadSignature, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if key != self.key:
+            raise NotFound(self.invalid_cursor_message)
+        return rank, pk
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        encoded = signing.dumps([self.key, *self.page[-1]['position']], salt=self.cursor_salt, compress=True)
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_previous_link(self):
+        return None
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.get_next_link(), 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        del response_schema['properties']['previous']
+        return response_schema
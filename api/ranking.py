@@ -0,0 +1,24 @@
+"""
+Feed ranking scores.
+
+Posts store their ``hot`` score in an indexed column, so a feed page is an
+index range scan instead of an ``ORDER BY`` over an expression. The score
+only depends on the vote score and the creation time; it is computed when
+a post is created and recomputed for exactly the posts whose votes change
+(``PostManager.apply_votes``). As with Reddit's formula, newer posts
+outrank older ones with the same score, and every 10x in score is worth
+12.5 hours, so scores never need to decay in place.
+"""
+
+import math
+
+# Seconds, 2005-12-08 07:46:43 UTC; keeps the time term small.
+EPOCH = 1134028003
+HALF_DAY = 45000
+
+
+def hot(score, created_at):
+    order = math.log10(max(abs(score), 1))
+    sign = (score > 0) - (score < 0)
+    seconds = created_at.timestamp() - EPOCH
+    return round(sign * order + seconds / HALF_DAY, 7)
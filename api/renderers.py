@@ -0,0 +1,29 @@
+import orjson
+from rest_framework.renderers import JSONRenderer
+
+
+# Renders with orjson, producing the same bytes as ``JSONRenderer`` several
+# times faster.
+#
+# Dates, times and other types JSON has no notation for go through DRF's
+# encoder, so they render as before. Indented and ASCII-only output, and
+# anything orjson refuses (integers beyond 64 bits, non-string keys), fall
+# back to ``JSONRenderer``. Two differences remain, so views opt in only
+# when their payloads avoid them: floats that need an exponent are written
+# without the ``+`` or leading zeroes (``1e16`` rather than ``1e+16``), and
+# NaN and infinities become ``null`` instead of an error.
+class FastJSONRenderer(JSONRenderer):
+    options = orjson.OPT_PASSTHROUGH_DATETIME
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        if self.ensure_ascii or not self.compact or self.get_indent(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=self.options)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # JSONRenderer escapes these to keep the output a JavaScript subset.
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
@@ -0,0 +1,72 @@
+import functools
+import hashlib
+import logging
+import os
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+from drf_spectacular.utils import extend_schema
+from drf_spectacular.views import SCHEMA_KWARGS, SpectacularAPIView
+
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_FORMATS = ('json', 'yaml')
+
+
+class JWTScheme(SimpleJWTScheme):
+    target_class = 'api.authentication.JWTAuthentication'
+
+
+class StatelessJWTScheme(SimpleJWTScheme):
+    target_class = 'api.authentication.StatelessJWTAuthentication'
+    name = 'statelessJwtAuth'
+
+
+def schema_path(schema_format, directory=None):
+    return os.path.join(directory or settings.API_SCHEMA_DIR, f'openapi.{schema_format}')
+
+
+@functools.lru_cache(maxsize=None)
+def load_schema(schema_format):
+    """
+    Read a generated schema once per process. A missing file raises
+    ``FileNotFoundError``, which isn't cached, so a schema generated later
+    is still picked up.
+    """
+    with open(schema_path(schema_format), 'rb') as schema_file:
+        content = schema_file.read()
+    return content, '"%s"' % hashlib.sha256(content).hexdigest()
+
+
+class PrecomputedSchemaView(SpectacularAPIView):
+    """
+    Serve the schema written by ``manage.py generate_schema`` from memory.
+
+    The format still comes from DRF content negotiation. Responses carry a
+    strong ETag and answer ``If-None-Match`` with 304. The schema is
+    generated per request when ``DEBUG`` is on, so development always sees
+    the current views, and when no file was generated.
+    """
+
+    @extend_schema(**SCHEMA_KWARGS)
+    def get(self, request, *args, **kwargs):
+        if settings.DEBUG:
+            return super().get(request, *args, **kwargs)
+
+        try:
+            content, etag = load_schema(request.accepted_renderer.format)
+        except FileNotFoundError:
+            logger.warning("The API schema has not been generated; run manage.py generate_schema.")
+            return super().get(request, *args, **kwargs)
+
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match and (etag in parse_etags(if_none_match) or if_none_match.strip() == '*'):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(content, content_type=request.accepted_media_type)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'no-cache'
+        return response
@@ -0,0 +1,322 @@
+"""
+Full-text search over users, communities and posts.
+
+Every searchable object has one ``SearchDocument``: a title, ranked above
+the body, and on Postgres a stored ``tsvector`` of both behind a GIN
+index. A ``post_save`` queues a ``search.index`` job (api/jobs.py) that
+writes the document with one upsert computing the vector in the database,
+and a ``post_delete`` removes it at once (api/signals.py);
+``manage.py rebuild_search_index`` rewrites them all, for rows written
+without signals (``bulk_create``, ``update``, fixtures). ``import_users``
+sends ``users_imported`` for its batches, which are indexed at once. Queries use
+``websearch_to_tsquery`` syntax, are ranked with ``ts_rank`` and
+highlighted with ``ts_headline``, which Postgres runs for the returned page
+only.
+
+On other databases (SQLite in development and tests) the same documents
+are searched with ``InvertedIndex``, a per-process index that is rebuilt
+whenever the table has changed. It lowercases words and drops English stop
+words like the ``english`` configuration, but does not stem them.
+"""
+
+import html
+import math
+import re
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank, SearchVector
+from django.db import connections, router
+from django.db.models import Count, F, FloatField, Max, Q, Sum, Value
+from django.db.models.functions import Cast
+
+from accounts.models import CustomUser
+from . import jobs
+from .models import Community, Post, SearchDocument
+
+
+# ts_headline() doesn't escape the text around its markers, so it marks
+# matches with control characters, swapped for tags once escaped.
+START_SEL, STOP_SEL = '\x02', '\x03'
+HIGHLIGHT = ('<mark>', '</mark>')
+# ts_rank()'s default weights for A (title) and B (body).
+TITLE_WEIGHT, BODY_WEIGHT = 1.0, 0.4
+SNIPPET_WORDS = 35
+
+
+class Source:
+    """How instances of ``model`` become documents of ``kind``."""
+
+    def __init__(self, kind, model, fields, document, searchable=None):
+        self.kind = kind
+        self.model = model
+        # A save touching none of these leaves the document as it is.
+        self.fields = frozenset(fields)
+        self.document = document
+        self.searchable = searchable or (lambda instance: True)
+
+
+SOURCES = {
+    source.model: source
+    for source in (
+        Source(
+            'user', CustomUser, ('username', 'firstName', 'lastName', 'is_active'),
+            lambda user: (user.username, ' '.join(filter(None, (user.firstName, user.lastName)))),
+            searchable=lambda user: user.is_active and bool(user.username),
+        ),
+        Source(
+            'community', Community, ('name', 'title', 'description'),
+            lambda community: (community.name, f'{community.title}\n{community.description}'),
+        ),
+        Source('post', Post, ('title', 'body'), lambda post: (post.title, post.body)),
+    )
+}
+KINDS = [source.kind for source in SOURCES.values()]
+
+
+def uses_vectors(using):
+    return connections[using].vendor == 'postgresql'
+
+
+def document_vector(title, body):
+    config = settings.SEARCH_CONFIG
+    return (
+        SearchVector(Value(title), weight='A', config=config)
+        + SearchVector(Value(body), weight='B', config=config)
+    )
+
+
+def index_objects(model, instances, using=None):
+    """Write the documents of ``instances`` in one upsert, removing unsearchable ones."""
+    source = SOURCES[model]
+    using = using or router.db_for_write(SearchDocument)
+    documents, hidden = [], []
+    for instance in instances:
+        if not source.searchable(instance):
+            hidden.append(instance.pk)
+            continue
+        title, body = source.document(instance)
+        documents.append(SearchDocument(
+            kind=source.kind,
+            object_id=instance.pk,
+            title=title,
+            body=body,
+            vector=document_vector(title, body) if uses_vectors(using) else None,
+        ))
+    if documents:
+        SearchDocument.objects.using(using).bulk_create(
+            documents,
+            update_conflicts=True,
+            unique_fields=['kind', 'object_id'],
+            update_fields=['title', 'body', 'vector', 'updated_at'],
+        )
+    if hidden:
+        remove_objects(model, hidden, using)
+
+
+def remove_objects(model, pks, using=None):
+    using = using or router.db_for_write(SearchDocument)
+    SearchDocument.objects.using(using).filter(kind=SOURCES[model].kind, object_id__in=pks).delete()
+
+
+@jobs.task('search.index')
+def index_document(kind, pk):
+    """Bring one object's document up to date, or remove it if the object is gone."""
+    model = next(model for model, source in SOURCES.items() if source.kind == kind)
+    instance = model._default_manager.filter(pk=pk).first()
+    if instance is None:
+        remove_objects(model, [pk])
+    else:
+        index_objects(model, [instance])
+
+
+def queue_index(model, pk):
+    """Queue the reindexing of one object; saves in quick succession share a job."""
+    kind = SOURCES[model].kind
+    jobs.enqueue('search.index', {'kind': kind, 'pk': pk}, dedup_key=f'search.index:{kind}:{pk}')
+
+
+def rebuild(batch_size=1000, using=None):
+    """Rewrite every document and drop orphans; return the count per kind."""
+    using = using or router.db_for_write(SearchDocument)
+    counts = {}
+    for model, source in SOURCES.items():
+        documents = SearchDocument.objects.using(using).filter(kind=source.kind)
+        objects = model._default_manager.using(using).order_by('pk')
+        seen, last = 0, 0
+        while True:
+            batch = list(objects.filter(pk__gt=last)[:batch_size])
+            if not batch:
+                break
+            index_objects(model, batch, using)
+            documents.filter(object_id__gt=last, object_id__lt=batch[-1].pk).exclude(
+                object_id__in=[instance.pk for instance in batch]
+            ).delete()
+            seen += len(batch)
+            last = batch[-1].pk
+        documents.filter(object_id__gt=last).delete()
+        counts[source.kind] = documents.count()
+    return counts
+
+
+def highlight(text):
+    """Escape ``text`` and turn the match markers into ``HIGHLIGHT`` tags."""
+    return html.escape(text).replace(START_SEL, HIGHLIGHT[0]).replace(STOP_SEL, HIGHLIGHT[1])
+
+
+def search(text, kinds, after=None, limit=20, using=None):
+    """
+    Up to ``limit`` hits for ``text`` among documents of ``kinds``, best
+    first, after the ``(rank, document id)`` position ``after``. Each hit
+    has the document's ``kind``, ``id`` (the object's), highlighted
+    ``title`` and ``snippet``, ``rank`` and ``position``.
+    """
+    using = using or router.db_for_read(SearchDocument)
+    if uses_vectors(using):
+        rows = search_vectors(text, kinds, after, limit, using)
+    else:
+        rows = fallback_index.search(text, kinds, after, limit, using)
+    return [
+        {
+            'kind': row['kind'],
+            'id': row['object_id'],
+            'title': highlight(row['title_headline']),
+            'snippet': highlight(row['snippet']),
+            'rank': row['rank'],
+            'position': (row['rank'], row['pk']),
+        }
+        for row in rows
+    ]
+
+
+def search_vectors(text, kinds, after, limit, using):
+    query = SearchQuery(text, search_type='websearch', config=settings.SEARCH_CONFIG)
+    # ts_rank() is a float4; as a double it survives the cursor round trip.
+    rank = Cast(SearchRank(F('vector'), query), FloatField())
+    documents = (
+        SearchDocument.objects.using(using)
+        .filter(vector=query, kind__in=kinds)
+        .annotate(rank=rank)
+    )
+    if after is not None:
+        documents = documents.filter(Q(rank__lt=after[0]) | Q(rank=after[0], pk__lt=after[1]))
+    options = {'config': settings.SEARCH_CONFIG, 'start_sel': START_SEL, 'stop_sel': STOP_SEL}
+    return list(
+        documents.annotate(
+            title_headline=SearchHeadline('title', query, highlight_all=True, **options),
+            snippet=SearchHeadline(
+                'body', query, max_words=SNIPPET_WORDS, min_words=15, max_fragments=2,
+                fragment_delimiter=' … ', **options,
+            ),
+        )
+        .order_by('-rank', '-pk')
+        .values('pk', 'kind', 'object_id', 'rank', 'title_headline', 'snippet')[:limit]
+    )
+
+
+WORD = re.compile(r'\w+')
+STOP_WORDS = frozenset(
+    'a an and are as at be but by for from has have he her his i if in into is it its me my no not of on or our '
+    'she so such than that the their them then there these they this to was we were what when which who will '
+    'with you your'.split()
+)
+
+
+def words(text):
+    return [word for word in WORD.findall(text.lower()) if word not in STOP_WORDS]
+
+
+def parse_query(text):
+    """Required and excluded words of a websearch-style query; ``or`` is not supported."""
+    required, excluded = [], []
+    for token in text.split():
+        target = excluded if token.startswith('-') else required
+        target.extend(word for word in words(token) if word != 'or')
+    return required, excluded
+
+
+def mark_words(text, matches, limit=None):
+    """``text`` with ``matches`` marked, cut to ``limit`` words around the first one."""
+    spans = list(WORD.finditer(text))
+    if limit is not None and len(spans) > limit:
+        first = next((i for i, m in enumerate(spans) if m.group().lower() in matches), 0)
+        start = max(0, min(first - limit // 3, len(spans) - limit))
+        spans = spans[start:start + limit]
+        text_start, text_end = spans[0].start(), spans[-1].end()
+    else:
+        text_start, text_end = 0, len(text)
+    parts, position = [], text_start
+    for match in spans:
+        if match.group().lower() in matches:
+            parts.append(text[position:match.start()])
+            parts.append(f'{START_SEL}{match.group()}{STOP_SEL}')
+            position = match.end()
+    parts.append(text[position:text_end])
+    return ''.join(parts)
+
+
+class InvertedIndex:
+    """
+    Postings of every document's words, weighted by field, for databases
+    without full-text search. Rebuilt from the table when its row count,
+    id sum or latest ``updated_at`` changes, which costs one aggregate
+    query per search.
+    """
+
+    def __init__(self):
+        self.signature = None
+        self.postings = defaultdict(dict)
+        self.documents = {}
+        self._lock = threading.Lock()
+
+    def refresh(self, using):
+        documents = SearchDocument.objects.using(using)
+        signature = tuple(documents.aggregate(Count('pk'), Sum('pk'), Max('updated_at')).values())
+        with self._lock:
+            if signature == self.signature:
+                return
+            self.postings, self.documents = defaultdict(dict), {}
+            for document in documents.values('pk', 'kind', 'object_id', 'title', 'body').iterator():
+                self.add(document)
+            self.signature = signature
+
+    def add(self, document):
+        self.documents[document['pk']] = document
+        for weight, text in ((TITLE_WEIGHT, document['title']), (BODY_WEIGHT, document['body'])):
+            for word in words(text):
+                postings = self.postings[word]
+                postings[document['pk']] = postings.get(document['pk'], 0) + weight
+
+    def search(self, text, kinds, after, limit, using):
+        self.refresh(using)
+        required, excluded = parse_query(text)
+        postings, documents = self.postings, self.documents
+        if not required or any(word not in postings for word in required):
+            return []
+        matches = set.intersection(*(set(postings[word]) for word in required))
+        for word in excluded:
+            matches.difference_update(postings.get(word, ()))
+        total = len(documents)
+        idf = {word: math.log(1 + total / len(postings[word])) for word in required}
+        hits = []
+        for pk in matches:
+            if documents[pk]['kind'] not in kinds:
+                continue
+            rank = sum(math.log(1 + postings[word][pk]) * idf[word] for word in required)
+            if after is None or (rank, pk) < tuple(after):
+                hits.append((rank, pk))
+        hits.sort(reverse=True)
+        required = set(required)
+        return [
+            {
+                **documents[pk],
+                'rank': rank,
+                'title_headline': mark_words(documents[pk]['title'], required),
+                'snippet': mark_words(documents[pk]['body'], required, SNIPPET_WORDS),
+            }
+            for rank, pk in hits[:limit]
+        ]
+
+
+fallback_index = InvertedIndex()
@@ -1,10 +1,19 @@
 from rest_framework import serializers
 from accounts.models import CustomUser
-from rest_framework_simplejwt.tokens import RefreshToken
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from . import search, threads
+from .models import Comment, Community, Follow, Post
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema_field
+from .revocation import consume_refresh_token, used_tokens
+from reddit_clone.replicas import PIN_CLAIM
+from .tokens import ClaimsRefreshToken
 
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = ClaimsRefreshToken
     default_error_messages = {
         "no_active_account": (
             "No account exists with these credentials, check password and email"
@@ -14,18 +23,77 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     def validate(self, attrs):
         data = super(CustomTokenObtainPairSerializer, self).validate(attrs)
         # Custom data
-        data.update(
-            {
-                "user": {
-                    "email": self.user.email,
-                    "username": self.user.username,
-                    "id": self.user.id,
-                    "is_staff": self.user.is_staff,
-                }
-            }
-        )
+        data.update({"user": self.get_user_data(self.user)})
         return data
 
+    @staticmethod
+    def get_user_data(user):
+        return {
+            "email": user.email,
+            "username": user.username,
+            "id": user.id,
+            "is_staff": user.is_staff,
+        }
+
+
+class RotatingTokenRefreshSerializer(TokenRefreshSerializer):
+    """Exchange a refresh token, once, for an access token and a new refresh token."""
+    token_class = ClaimsRefreshToken
+    refresh = serializers.CharField(help_text="Replaced by the new refresh token in the response")
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+        user = consume_refresh_token(refresh)
+        # Issued afresh, so a changed email, username or staff flag is
+        # picked up; only the replica pin carries over.
+        rotated = self.token_class.for_user(user)
+        if PIN_CLAIM in refresh:
+            rotated[PIN_CLAIM] = refresh[PIN_CLAIM]
+        return {"access": str(rotated.access_token), "refresh": str(rotated)}
+
+
+class LogoutSerializer(serializers.Serializer):
+    refresh = serializers.CharField(write_only=True)
+    all = serializers.BooleanField(
+        default=False, write_only=True, help_text="Revoke the tokens of every session, not just this one"
+    )
+
+    def validate_refresh(self, value):
+        try:
+            refresh = ClaimsRefreshToken(value)
+        except TokenError as e:
+            raise InvalidToken(e.args[0])
+        if refresh.get(api_settings.USER_ID_CLAIM) != self.context["request"].user.pk:
+            raise serializers.ValidationError("Token belongs to another user.")
+        return refresh
+
+    def save(self):
+        refresh = self.validated_data["refresh"]
+        used_tokens.mark_used(refresh[api_settings.JTI_CLAIM], refresh["exp"])
+
+
+class ChangePasswordSerializer(serializers.Serializer):
+    old_password = serializers.CharField(write_only=True, style={"input_type": "password"})
+    new_password = serializers.CharField(write_only=True, min_length=8, style={"input_type": "password"})
+    access = serializers.CharField(read_only=True)
+    refresh = serializers.CharField(read_only=True)
+
+    def validate_old_password(self, value):
+        if not self.instance.check_password(value):
+            raise serializers.ValidationError("Wrong password.")
+        return value
+
+    def update(self, user, validated_data):
+        # Saving a new password bumps the token generation, signing out
+        # every other session; this one continues with a fresh pair.
+        user.set_password(validated_data["new_password"])
+        user.save(update_fields=["password"])
+        return user
+
+    def to_representation(self, user):
+        refresh = ClaimsRefreshToken.for_user(user)
+        return {"access": str(refresh.access_token), "refresh": str(refresh)}
+
 
 class CustomUserSerializer(serializers.ModelSerializer):
     password = serializers.CharField(
@@ -50,20 +118,28 @@ class CustomUserSerializer(serializers.ModelSerializer):
             "refresh",
         )
 
+    def __init__(self, *args, **kwargs):
+        super(CustomUserSerializer, self).__init__(*args, **kwargs)
+        self._token_pairs = {}
+
+    @extend_schema_field(OpenApiTypes.STR)
     def get_refresh(self, user):
-        refresh = RefreshToken.for_user(user)
-        return str(refresh)
+        return str(self._get_token_pair(user))
 
+    @extend_schema_field(OpenApiTypes.STR)
     def get_access(self, user):
-        refresh = RefreshToken.for_user(user)
-        access = (str(refresh.access_token),)
-        return access
+        return str(self._get_token_pair(user).access_token)
+
+    def _get_token_pair(self, user):
+        """Sign one refresh token per user and reuse it for both fields."""
+        if user.pk not in self._token_pairs:
+            self._token_pairs[user.pk] = ClaimsRefreshToken.for_user(user)
+        return self._token_pairs[user.pk]
 
     def create(self, validated_data):
-        user = super(CustomUserSerializer, self).create(validated_data)
-        user.set_password(validated_data["password"])
-        user.save()
-        return user
+        # One INSERT with the hashed password, instead of inserting the raw
+        # password and updating it.
+        return CustomUser.objects.create_user(**validated_data)
 
 
 class ListCustomUserSerializer(serializers.ModelSerializer):
@@ -78,3 +154,168 @@ class ListCustomUserSerializer(serializers.ModelSerializer):
             "lastName",
             "is_staff",
         )
+
+
+class UserProfileSerializer(serializers.ModelSerializer):
+    """Token-free representation of the authenticated user's profile."""
+
+    class Meta:
+        model = CustomUser
+        fields = (
+            "id",
+            "username",
+            "email",
+            "firstName",
+            "lastName",
+            "is_staff",
+        )
+        read_only_fields = ("id", "is_staff")
+
+
+class PublicUserSerializer(serializers.ModelSerializer):
+    """What anyone signed in may see about another user."""
+
+    class Meta:
+        model = CustomUser
+        fields = (
+            "id",
+            "username",
+            "firstName",
+            "lastName",
+            "followers_count",
+            "following_count",
+        )
+        read_only_fields = fields
+
+
+class FollowerSerializer(serializers.ModelSerializer):
+    user = PublicUserSerializer(source="follower", read_only=True)
+
+    class Meta:
+        model = Follow
+        fields = ("user", "created_at")
+
+
+class FollowingSerializer(serializers.ModelSerializer):
+    user = PublicUserSerializer(source="followee", read_only=True)
+
+    class Meta:
+        model = Follow
+        fields = ("user", "created_at")
+
+
+class CommunitySerializer(serializers.ModelSerializer):
+    creator = serializers.CharField(source="creator.username", read_only=True, default=None)
+
+    class Meta:
+        model = Community
+        fields = ("id", "name", "title", "description", "creator", "created_at")
+        read_only_fields = ("id", "created_at")
+
+    def to_internal_value(self, data):
+        if isinstance(data.get("name"), str):
+            data = data.copy()
+            data["name"] = data["name"].strip().lower()
+        return super().to_internal_value(data)
+
+
+class PostListSerializer(serializers.ModelSerializer):
+    """A feed entry; reads only ``models.FEED_FIELDS``."""
+    community = serializers.CharField(source="community.name", read_only=True)
+    author = serializers.CharField(source="author.username", read_only=True, default=None)
+
+    class Meta:
+        model = Post
+        fields = ("id", "title", "url", "community", "author", "score", "comments_count", "created_at")
+        read_only_fields = fields
+
+
+class PostSerializer(serializers.ModelSerializer):
+    community = serializers.SlugRelatedField(slug_field="name", queryset=Community.objects.all())
+    author = serializers.CharField(source="author.username", read_only=True, default=None)
+
+    class Meta:
+        model = Post
+        fields = PostListSerializer.Meta.fields + ("body",)
+        read_only_fields = ("id", "score", "comments_count", "created_at")
+
+
+class VoteSerializer(serializers.Serializer):
+    value = serializers.ChoiceField(
+        choices=[1, 0, -1], help_text="1 to upvote, -1 to downvote, 0 to withdraw the vote"
+    )
+
+
+class CommentSerializer(serializers.ModelSerializer):
+    parent = serializers.IntegerField(
+        source="parent_id", required=False, allow_null=True, help_text="The comment replied to"
+    )
+    author = serializers.CharField(source="author.username", read_only=True, default=None)
+
+    class Meta:
+        model = Comment
+        fields = ("id", "parent", "author", "body", "score", "depth", "replies_count", "created_at")
+        read_only_fields = ("id", "score", "depth", "replies_count", "created_at")
+
+
+class MoreRepliesSerializer(serializers.Serializer):
+    count = serializers.IntegerField(help_text="Replies not loaded")
+    cursor = serializers.CharField(help_text="Pass as ``cursor`` to load them")
+
+
+class CommentNodeSerializer(CommentSerializer):
+    """A comment in a thread, read from ``models.THREAD_FIELDS`` values."""
+    author = serializers.CharField(source="author__username", read_only=True, default=None)
+    replies = serializers.ListField(
+        child=serializers.DictField(), read_only=True, help_text="Loaded replies, as comments"
+    )
+    more = MoreRepliesSerializer(read_only=True, allow_null=True)
+
+    class Meta(CommentSerializer.Meta):
+        fields = CommentSerializer.Meta.fields + ("replies", "more")
+
+
+class CommentThreadSerializer(serializers.Serializer):
+    results = CommentNodeSerializer(many=True)
+    next = serializers.CharField(allow_null=True, help_text="Cursor for the top level comments not loaded")
+
+
+class CommentThreadQuerySerializer(serializers.Serializer):
+    cursor = serializers.CharField(
+        required=False, help_text="A ``next`` or ``more`` cursor, to continue a thread"
+    )
+    depth = serializers.IntegerField(
+        default=8, min_value=0, max_value=threads.MAX_DEPTH, help_text="Levels of replies to load"
+    )
+    limit = serializers.IntegerField(default=200, min_value=1, max_value=500, help_text="Comments to load")
+    min_score = serializers.IntegerField(required=False, help_text="Leave out comments scored lower, with their replies")
+    sort = serializers.ChoiceField(
+        choices=["score", "old"],
+        default="score",
+        help_text=(
+            "Order of the loaded siblings: by score, or as posted. Either way comments are paged in "
+            "thread order, so only siblings within the page are ranked; this is not a top sort"
+        ),
+    )
+
+    def validate_cursor(self, value):
+        if not threads.is_cursor(value):
+            raise serializers.ValidationError("Invalid cursor.")
+        return value
+
+
+class SearchQuerySerializer(serializers.Serializer):
+    q = serializers.CharField(
+        max_length=200, help_text="Web search syntax: every word must match and -word excludes one"
+    )
+    type = serializers.MultipleChoiceField(
+        choices=search.KINDS, required=False, help_text="Kinds of results, all by default"
+    )
+
+
+class SearchResultSerializer(serializers.Serializer):
+    kind = serializers.ChoiceField(choices=search.KINDS)
+    id = serializers.IntegerField()
+    title = serializers.CharField(help_text="HTML escaped, with matches in <mark> tags")
+    snippet = serializers.CharField(help_text="Matching passages of the text, marked up like the title")
+    rank = serializers.FloatField()
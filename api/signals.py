@@ -0,0 +1,59 @@
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from accounts.models import CustomUser
+from accounts.signals import users_deactivated, users_imported
+from . import search
+from .authentication import forget_user_state
+from .cache import bump_cache_version, user_namespace
+from .models import Community, Follow, Post
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def clear_cached_user_state(sender, instance, **kwargs):
+    forget_user_state(instance.pk)
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_cached_user_responses(sender, instance, **kwargs):
+    bump_cache_version("users")
+    bump_cache_version(user_namespace(instance.pk))
+
+
+@receiver(pre_delete, sender=CustomUser)
+def release_follow_counts(sender, instance, **kwargs):
+    Follow.objects.db_manager(kwargs.get("using")).detach(instance.pk)
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_save, sender=Community)
+@receiver(post_save, sender=Post)
+def index_search_document(sender, instance, update_fields=None, **kwargs):
+    # Logins and counter updates save fields the document doesn't use.
+    if update_fields is not None and search.SOURCES[sender].fields.isdisjoint(update_fields):
+        return
+    search.queue_index(sender, instance.pk)
+
+
+@receiver(post_delete, sender=CustomUser)
+@receiver(post_delete, sender=Community)
+@receiver(post_delete, sender=Post)
+def remove_search_document(sender, instance, **kwargs):
+    search.remove_objects(sender, [instance.pk], kwargs.get("using"))
+
+
+@receiver(users_deactivated)
+def forget_deactivated_users(sender, pks, **kwargs):
+    for pk in pks:
+        forget_user_state(pk)
+        bump_cache_version(user_namespace(pk))
+    bump_cache_version("users")
+    search.remove_objects(CustomUser, pks)
+
+
+@receiver(users_imported)
+def index_imported_users(sender, pks, **kwargs):
+    bump_cache_version("users")
+    search.index_objects(CustomUser, CustomUser.objects.filter(pk__in=pks))
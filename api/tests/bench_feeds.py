@@ -0,0 +1,129 @@
+"""
+Benchmark for the post feeds over a large table.
+
+Not collected by the default test run; execute it explicitly with:
+
+    python manage.py test api.tests.bench_feeds
+
+``BENCH_FEED_POSTS`` posts (default 1,000,000) are spread over
+``BENCH_FEED_COMMUNITIES`` communities with random votes and ages. Each
+feed is timed on its first page and on a page halfway down, reached with
+a cursor, and compared with ordering by an expression (``ups - downs``)
+with ``LIMIT``/``OFFSET``, which has to sort the table on every request.
+Run it against Postgres for representative numbers.
+"""
+
+import os
+import random
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.db import connection
+from django.db.models import ExpressionWrapper, F, IntegerField
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api import ranking
+from api.models import Community, Post
+from api.pagination import KeysetPagination
+
+
+POSTS = int(os.environ.get("BENCH_FEED_POSTS", 1_000_000))
+COMMUNITIES = int(os.environ.get("BENCH_FEED_COMMUNITIES", 1_000))
+BATCH_SIZE = 10_000
+REPEAT = 20
+
+
+def median_ms(call, repeat=REPEAT):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def seed_posts(count, communities, authors):
+    rng = random.Random(42)
+    now = timezone.now()
+    for start in range(0, count, BATCH_SIZE):
+        posts = []
+        for _ in range(min(BATCH_SIZE, count - start)):
+            ups = int(rng.paretovariate(1.2)) - 1
+            downs = rng.randrange(ups // 4 + 1)
+            created_at = now - timedelta(seconds=rng.randrange(90 * 86400))
+            posts.append(Post(
+                community_id=rng.choice(communities),
+                author_id=rng.choice(authors),
+                title="Benchmark post",
+                created_at=created_at,
+                ups=ups,
+                downs=downs,
+                score=ups - downs,
+                hot=ranking.hot(ups - downs, created_at),
+            ))
+        Post.objects.bulk_create(posts)
+
+
+class FeedBenchmark(TestCase):
+    """Feed page latency with stored scores against an expression sort."""
+
+    @classmethod
+    def setUpTestData(cls):
+        started = time.perf_counter()
+        authors = [
+            get_user_model().objects.create_user(email=f"author{i}@example.com", username=f"author{i}").pk
+            for i in range(20)
+        ]
+        communities = Community.objects.bulk_create(
+            Community(name=f"community_{i}", title=f"Community {i}") for i in range(COMMUNITIES)
+        )
+        community_ids = list(Community.objects.values_list("pk", flat=True))
+        seed_posts(POSTS, community_ids, authors)
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE api_post")
+        cls.community = communities[0].name
+        print(f"\nseeded {POSTS:,} posts in {COMMUNITIES:,} communities in {time.perf_counter() - started:.0f}s")
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def cursor(self, ordering, queryset):
+        """A signed cursor for the middle of ``queryset`` in ``ordering``."""
+        field = ordering.lstrip("-")
+        middle = queryset.order_by(ordering, "-id").values(field, "id")[queryset.count() // 2]
+        value = middle[field]
+        if hasattr(value, "isoformat"):
+            value = value.isoformat()
+        payload = [[field, True], value, middle["id"], False]
+        return signing.dumps(payload, salt=KeysetPagination.cursor_salt, compress=True)
+
+    def get(self, url):
+        response = self.client.get(url)
+        assert response.status_code == 200, response.status_code
+        return response
+
+    def test_feeds(self):
+        print(f"\n{'feed':<40}{'first page':>12}{'middle page':>14}   (median ms, {connection.vendor})")
+        for url, queryset in (
+            (reverse("api:feed"), Post.objects.all()),
+            (reverse("api:community-posts", args=[self.community]), Post.objects.filter(community__name=self.community)),
+        ):
+            for sort, ordering in (("hot", "-hot"), ("top", "-score"), ("new", "-created_at")):
+                first = median_ms(lambda: self.get(f"{url}?sort={sort}"))
+                cursor = self.cursor(ordering, queryset)
+                middle = median_ms(lambda: self.get(f"{url}?sort={sort}&cursor={cursor}"))
+                print(f"{url + ' ' + sort:<40}{first:12.2f}{middle:14.2f}")
+
+    def test_expression_sort(self):
+        score = ExpressionWrapper(F("ups") - F("downs"), output_field=IntegerField())
+        queryset = Post.objects.feed().order_by(score.desc(), "-id")
+        first = median_ms(lambda: list(queryset[:50]), repeat=3)
+        middle = median_ms(lambda: list(queryset[POSTS // 2:POSTS // 2 + 50]), repeat=3)
+        print(f"\n{'ORDER BY ups - downs':<40}{first:12.2f}{middle:14.2f}   (queries only, no HTTP)")
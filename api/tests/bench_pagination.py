@@ -0,0 +1,96 @@
+"""
+Deep-page benchmark for the user listing.
+
+Not collected by the default test run; execute it explicitly with:
+
+    python manage.py test api.tests.bench_pagination
+
+``BENCH_USERS`` sets the table size (default 1,000,000) and
+``BENCH_PAGE_SIZE`` the page size (default 100, so page 10,000 is the last
+page of a million users). Each page is timed with the previous
+``LimitOffsetPagination`` and with ``KeysetPagination``.
+"""
+
+import os
+import time
+from urllib.parse import parse_qs, urlsplit
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.pagination import LimitOffsetPagination
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.pagination import KeysetPagination
+from api.views import ListCustomUsersApiView
+
+
+USERS = int(os.environ.get("BENCH_USERS", 1_000_000))
+PAGE_SIZE = int(os.environ.get("BENCH_PAGE_SIZE", 100))
+DEEP_PAGE = min(10_000, USERS // PAGE_SIZE)
+REPEAT = 5
+
+
+def best_of(func, repeat=REPEAT):
+    """Return the fastest of ``repeat`` runs in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return min(timings)
+
+
+class DeepPageBenchmark(TestCase):
+    """Compare page 1 and a deep page with offset and keyset pagination."""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        batch = 10_000
+        for start in range(0, USERS, batch):
+            User.objects.bulk_create(
+                User(email=f"user{i}@example.com", username=f"user{i:07d}")
+                for i in range(start, min(start + batch, USERS))
+            )
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.view = ListCustomUsersApiView()
+        self.queryset = get_user_model().objects.all()
+
+    def request(self, **params):
+        return Request(self.factory.get("/api/users", params))
+
+    def offset_page(self, page):
+        paginator = LimitOffsetPagination()
+        request = self.request(
+            ordering="username", limit=PAGE_SIZE, offset=(page - 1) * PAGE_SIZE
+        )
+        return lambda: list(
+            paginator.paginate_queryset(
+                self.queryset.order_by("username", "id"), request, self.view
+            )
+        )
+
+    def keyset_page(self, page):
+        params = {"ordering": "username", "page_size": PAGE_SIZE}
+        if page > 1:
+            anchor = self.queryset.order_by("username", "id")[(page - 1) * PAGE_SIZE - 1]
+            paginator = KeysetPagination()
+            paginator.paginate_queryset(self.queryset, self.request(**params), self.view)
+            link = paginator.encode_cursor(anchor)
+            params["cursor"] = parse_qs(urlsplit(link).query)["cursor"][0]
+        request = self.request(**params)
+        return lambda: list(
+            KeysetPagination().paginate_queryset(self.queryset, request, self.view)
+        )
+
+    def test_deep_pages(self):
+        print(f"\n{USERS:,} users, {PAGE_SIZE} per page")
+        for name, page_factory in (("offset", self.offset_page), ("keyset", self.keyset_page)):
+            first = best_of(page_factory(1))
+            deep = best_of(page_factory(DEEP_PAGE))
+            print(
+                f"{name:>7}: page 1 {first:8.2f} ms   page {DEEP_PAGE:,} {deep:8.2f} ms"
+            )
@@ -0,0 +1,133 @@
+"""
+Benchmark for full-text search against the user listing's SearchFilter.
+
+Not collected by the default test run; execute it explicitly with:
+
+    python manage.py test api.tests.bench_search
+
+``BENCH_SEARCH_USERS`` users (default 100,000) and ``BENCH_SEARCH_POSTS``
+posts (default 100,000, with Zipf-distributed words) are seeded and
+indexed with ``api.search.rebuild``. Users are searched through
+``/api/users?search=`` (``ILIKE`` over the trigram and prefix indexes) and
+``/api/search?type=user``; posts through an ``ILIKE`` filter on title and
+body, which is what SearchFilter would run, and ``/api/search?type=post``.
+Run it against Postgres for representative numbers; on SQLite the search
+endpoint uses the in-process inverted index.
+"""
+
+import os
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from accounts.factories import seed_users
+from api import search
+from api.models import Community, Post, SearchDocument
+from api.tokens import ClaimsRefreshToken
+
+
+USERS = int(os.environ.get("BENCH_SEARCH_USERS", 100_000))
+POSTS = int(os.environ.get("BENCH_SEARCH_POSTS", 100_000))
+VOCABULARY = 20_000
+BATCH_SIZE = 5_000
+REPEAT = 20
+
+
+def median_ms(call, repeat=REPEAT):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def vocabulary(rng, size):
+    syllables = ["ka", "lo", "mi", "ne", "ru", "ta", "vi", "zo", "pe", "shi", "do", "ga"]
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(syllables) for _ in range(rng.randrange(2, 5))))
+    return sorted(words)
+
+
+def seed_posts(count, community, words):
+    """Posts whose words follow a Zipf distribution, like natural text."""
+    rng = random.Random(42)
+    weights = [1 / rank for rank in range(1, len(words) + 1)]
+    for start in range(0, count, BATCH_SIZE):
+        Post.objects.bulk_create(
+            Post(
+                community=community,
+                title=" ".join(rng.choices(words, weights, k=6)).capitalize(),
+                body=" ".join(rng.choices(words, weights, k=80)),
+            )
+            for _ in range(min(BATCH_SIZE, count - start))
+        )
+
+
+class SearchBenchmark(TestCase):
+    """Search latency with the search index against ILIKE filters."""
+
+    @classmethod
+    def setUpTestData(cls):
+        started = time.perf_counter()
+        seed_users(USERS)
+        cls.words = vocabulary(random.Random(7), VOCABULARY)
+        community = Community.objects.create(name="bench", title="Benchmark")
+        seed_posts(POSTS, community, cls.words)
+        seeded = time.perf_counter()
+        search.rebuild(batch_size=BATCH_SIZE)
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+        print(
+            f"\nseeded {USERS:,} users and {POSTS:,} posts in {seeded - started:.0f}s, "
+            f"indexed {SearchDocument.objects.count():,} documents in {time.perf_counter() - seeded:.0f}s"
+        )
+        cls.user = get_user_model().objects.order_by("pk").first()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {ClaimsRefreshToken.for_user(self.user).access_token}")
+
+    def get(self, url, params):
+        # The user listing caches its responses; time the query instead.
+        cache.clear()
+        response = self.client.get(url, params)
+        assert response.status_code == 200, response.status_code
+        return response
+
+    def test_users(self):
+        users, found = reverse("api:users"), reverse("api:search")
+        print(f"\n{'user query':<44}{'SearchFilter':>14}{'search':>10}   (median ms, {connection.vendor})")
+        for label, term in (
+            ("unique username", f"seed{USERS // 2:07d}"),
+            ("first name shared by 0.1%", "first421"),
+        ):
+            ilike = median_ms(lambda: self.get(users, {"search": term}))
+            ranked = median_ms(lambda: self.get(found, {"q": term, "type": "user"}))
+            print(f"{label:<44}{ilike:14.2f}{ranked:10.2f}")
+
+    def test_posts(self):
+        found = reverse("api:search")
+        print(f"\n{'post query, first page':<44}{'ILIKE':>14}{'search':>10}   (median ms, {connection.vendor})")
+        for label, text in (
+            ("rare word", self.words[-1]),
+            ("common word", self.words[0]),
+            ("two words", f"{self.words[10]} {self.words[500]}"),
+        ):
+            terms = text.split()
+            matches = Q()
+            for term in terms:
+                matches &= Q(title__icontains=term) | Q(body__icontains=term)
+            ilike = median_ms(lambda: list(Post.objects.filter(matches).order_by("-pk")[:20]), repeat=5)
+            ranked = median_ms(lambda: self.get(found, {"q": text, "type": "post"}), repeat=5)
+            print(f"{label:<44}{ilike:14.2f}{ranked:10.2f}")
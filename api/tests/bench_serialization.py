@@ -0,0 +1,85 @@
+"""
+Benchmark for the user listing's serialization path.
+
+Not collected by the default test run; execute it explicitly with:
+
+    python manage.py test api.tests.bench_serialization
+
+``BENCH_SERIALIZATION_USERS`` users (default 10,000) are seeded, and 100 to
+10,000 of them are read and serialized in two ways. The model path builds
+instances and runs ``ListCustomUserSerializer``. The values path reads
+``.values()`` rows and maps them with ``RowMapper``. Each path's payload is
+rendered by ``JSONRenderer`` and by ``FastJSONRenderer``, and the fast
+renderer's bytes are checked against the stdlib renderer's.
+"""
+
+import os
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from rest_framework.renderers import JSONRenderer
+
+from accounts.factories import seed_users
+from api.mappers import RowMapper
+from api.renderers import FastJSONRenderer
+from api.serializers import ListCustomUserSerializer
+
+
+USERS = int(os.environ.get("BENCH_SERIALIZATION_USERS", 10_000))
+SIZES = (100, 1_000, 10_000)
+REPEAT = 20
+
+
+def median_ms(call, repeat=REPEAT):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+class SerializationBenchmark(TestCase):
+    """Listing serialization through model instances against values() rows."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_users(USERS)
+
+    def setUp(self):
+        self.users = get_user_model().objects.order_by("pk")
+        self.mapper = RowMapper(ListCustomUserSerializer)
+
+    def model_path(self, size):
+        return ListCustomUserSerializer(list(self.users[:size]), many=True).data
+
+    def values_path(self, size):
+        return self.mapper.map(list(self.users.values(*self.mapper.columns)[:size]))
+
+    def test_serialization(self):
+        stdlib, fast = JSONRenderer(), FastJSONRenderer()
+        print(f"\n{'rows':>8}{'model+stdlib':>15}{'values+orjson':>15}{'speedup':>9}   (median ms, {connection.vendor})")
+        for size in (size for size in SIZES if size <= USERS):
+            expected = stdlib.render(self.model_path(size))
+            assert fast.render(self.values_path(size)) == expected, "output differs"
+            repeat = REPEAT if size < 10_000 else 5
+            before = median_ms(lambda: stdlib.render(self.model_path(size)), repeat)
+            after = median_ms(lambda: fast.render(self.values_path(size)), repeat)
+            print(f"{size:>8,}{before:15.2f}{after:15.2f}{before / after:8.1f}x")
+
+    def test_stages(self):
+        stdlib, fast = JSONRenderer(), FastJSONRenderer()
+        size = min(10_000, USERS)
+        instances = self.model_path(size)
+        rows = self.values_path(size)
+        print(f"\n{f'{size:,} rows, one stage at a time':<44}{'median ms':>12}")
+        for label, call in (
+            ("fetch + ModelSerializer", lambda: self.model_path(size)),
+            ("fetch .values() + RowMapper", lambda: self.values_path(size)),
+            ("JSONRenderer", lambda: stdlib.render(instances)),
+            ("FastJSONRenderer", lambda: fast.render(rows)),
+        ):
+            print(f"{label:<44}{median_ms(call, repeat=5):12.2f}")
@@ -0,0 +1,159 @@
+"""
+Benchmark for loading comment threads.
+
+Not collected by the default test run; execute it explicitly with:
+
+    python manage.py test api.tests.bench_threads
+
+One post gets ``BENCH_THREAD_COMMENTS`` comments (default 50,000) in a
+random tree, most replies going to recent comments so threads run deep.
+The thread endpoint's first page and a "load more" continuation are timed
+over HTTP, and the path range scan with the tree assembly is timed for the
+whole thread and compared with loading an adjacency list (every comment of
+the post by ``parent_id``), which has to read the whole thread to show any
+part of it in order. Run it against Postgres for representative numbers.
+"""
+
+import os
+import random
+import statistics
+import time
+from collections import defaultdict
+
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from api import threads
+from api.models import Comment, Community, Post
+
+
+COMMENTS = int(os.environ.get("BENCH_THREAD_COMMENTS", 50_000))
+BATCH_SIZE = 5_000
+REPEAT = 20
+
+
+def median_ms(call, repeat=REPEAT):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def seed_thread(post, count):
+    """Comments with explicit ids, so their paths are known before the insert."""
+    rng = random.Random(42)
+    first = (Comment.objects.order_by("-pk").values_list("pk", flat=True).first() or 0) + 1
+    comments, replies = [], defaultdict(int)
+    for pk in range(first, first + count):
+        parent = None
+        if comments and rng.random() > 0.2:
+            parent = comments[max(0, len(comments) - 1 - int(rng.expovariate(0.05)))]
+            if parent.depth + 1 >= threads.MAX_DEPTH:
+                parent = None
+        comments.append(Comment(
+            id=pk,
+            post=post,
+            parent=parent,
+            body="Benchmark comment " * 5,
+            score=rng.randrange(-5, 50),
+            path=(parent.path if parent else "") + threads.encode(pk),
+            depth=parent.depth + 1 if parent else 0,
+        ))
+        if parent:
+            replies[parent.pk] += 1
+    for comment in comments:
+        comment.replies_count = replies[comment.pk]
+    Comment.objects.bulk_create(comments, batch_size=BATCH_SIZE)
+    Post.objects.filter(pk=post.pk).update(comments_count=len(comments))
+    return len(comments)
+
+
+def first_more(nodes):
+    """The first "load more replies" cursor in a thread page, depth first."""
+    for node in nodes:
+        if node["more"]:
+            return node["more"]
+        found = first_more(node["replies"])
+        if found:
+            return found
+    return None
+
+
+def adjacency_tree(post_id):
+    """The whole thread from parent ids: the baseline without paths."""
+    rows = list(Comment.objects.filter(post_id=post_id).values(
+        "id", "parent_id", "author__username", "body", "score", "created_at"
+    ))
+    children = defaultdict(list)
+    for row in rows:
+        children[row["parent_id"]].append(row)
+    stack, ordered = list(reversed(children[None])), []
+    while stack:
+        row = stack.pop()
+        ordered.append(row)
+        stack.extend(reversed(children[row["id"]]))
+    return ordered
+
+
+class ThreadBenchmark(TestCase):
+    """Thread page latency with materialized paths against an adjacency list."""
+
+    @classmethod
+    def setUpTestData(cls):
+        started = time.perf_counter()
+        community = Community.objects.create(name="bench", title="Benchmark")
+        cls.post = Post.objects.create(community=community, title="Benchmark post")
+        count = seed_thread(cls.post, COMMENTS)
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE api_comment")
+        depth = Comment.objects.order_by("-depth").values_list("depth", flat=True).first()
+        print(f"\nseeded {count:,} comments, {depth} deep, in {time.perf_counter() - started:.0f}s")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.url = reverse("api:post-comments", args=[self.post.pk])
+
+    def get(self, url, params=None):
+        response = self.client.get(url, params)
+        assert response.status_code == 200, response.status_code
+        return response
+
+    def load(self, limit, depth=None):
+        rows = list(Comment.objects.thread(self.post.pk, depth=depth)[:limit + 1])
+        return threads.build(rows[:limit], 0, len(rows) > limit)
+
+    def test_thread_pages(self):
+        first = self.get(self.url).data
+        more = first_more(first["results"])
+        print(f"\n{'thread request':<48}{'median ms':>12}   ({connection.vendor})")
+        for label, params in (
+            ("first page (200 comments, 8 levels)", None),
+            ("next page of top level comments", {"cursor": first["next"]}),
+            ("load more replies", {"cursor": more["cursor"]}),
+            ("first page, min_score=10", {"min_score": 10}),
+        ):
+            print(f"{label:<48}{median_ms(lambda: self.get(self.url, params)):12.2f}")
+
+    def test_whole_thread(self):
+        print(f"\n{'whole thread, no HTTP':<48}{'median ms':>12}")
+        for label, call in (
+            ("path range scan + build, first 200", lambda: self.load(200)),
+            ("adjacency list, first 200", lambda: adjacency_tree(self.post.pk)[:200]),
+            (f"path range scan + build, all {COMMENTS:,}", lambda: self.load(COMMENTS)),
+            (f"adjacency list, all {COMMENTS:,}", lambda: adjacency_tree(self.post.pk)),
+        ):
+            print(f"{label:<48}{median_ms(call, repeat=5):12.2f}")
+
+    def test_build_is_linear(self):
+        # Time per comment still creeps up with size, as the cyclic garbage
+        # collector walks a bigger heap; with gc disabled it is flat.
+        rows = list(Comment.objects.thread(self.post.pk))
+        print(f"\n{'tree assembly only':<48}{'median ms':>12}{'us/comment':>12}")
+        for size in (len(rows) // 10, len(rows) // 2, len(rows)):
+            elapsed = median_ms(lambda: threads.build(rows[:size], 0, False), repeat=5)
+            print(f"{f'{size:,} comments':<48}{elapsed:12.2f}{elapsed * 1000 / size:12.2f}")
@@ -0,0 +1,108 @@
+"""
+Benchmark for refresh token rotation and the used token store.
+
+Not collected by the default test run; execute it explicitly with:
+
+    python manage.py test api.tests.bench_token_refresh
+
+``/api/refresh`` is compared with simplejwt's plain, non-rotating
+serializer. The store's memory is computed for millions of refreshes over
+the refresh token lifetime, and one shard is filled to its share of that
+load to check the false positive rate. The blacklist figure is the token
+text alone, which simplejwt's ``OutstandingToken`` stores per row.
+"""
+
+import math
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+
+from api.revocation import BloomFilter, UsedTokenStore
+from api.serializers import RotatingTokenRefreshSerializer
+from api.tokens import ClaimsRefreshToken
+from api.views import CustomTokenRefreshView
+
+
+ITERATIONS = 300
+ISSUED = (1_000_000, 10_000_000, 50_000_000)
+PROBES = 200_000
+
+
+class PlainTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = ClaimsRefreshToken
+
+
+def requests_per_second(make_request, iterations=ITERATIONS):
+    """Call ``make_request`` repeatedly and return the achieved rate."""
+    started = time.perf_counter()
+    for i in range(iterations):
+        make_request(i)
+    return iterations / (time.perf_counter() - started)
+
+
+@override_settings(THROTTLING_ENABLED=False)
+class TokenRefreshBenchmark(TestCase):
+    """Refresh throughput and used token store size."""
+
+    def setUp(self):
+        cache.clear()
+        self.factory = APIRequestFactory()
+        self.user = get_user_model().objects.create_user(
+            email="bench@example.com", password="benchpass123", username="bench"
+        )
+
+    def refresh_rps(self, serializer_class):
+        view = CustomTokenRefreshView.as_view(serializer_class=serializer_class)
+        tokens = [str(ClaimsRefreshToken.for_user(self.user)) for _ in range(ITERATIONS)]
+
+        def make_request(i):
+            response = view(self.factory.post("/api/refresh", {"refresh": tokens[i]}, format="json"))
+            response.render()
+            assert response.status_code == 200, response.data
+
+        return requests_per_second(make_request)
+
+    def test_refresh_throughput(self):
+        before = self.refresh_rps(PlainTokenRefreshSerializer)
+        after = self.refresh_rps(RotatingTokenRefreshSerializer)
+        print(f"\n/api/refresh  plain: {before:8.1f} req/s   rotating: {after:8.1f} req/s")
+
+    def test_store_memory(self):
+        lifetime = settings.SIMPLE_JWT["REFRESH_TOKEN_LIFETIME"].total_seconds()
+        bucket_seconds = settings.REFRESH_TOKEN_BLOOM_BUCKET_SECONDS
+        buckets = math.ceil(lifetime / bucket_seconds)
+        error_rate = settings.REFRESH_TOKEN_BLOOM_ERROR_RATE
+        shards = settings.REFRESH_TOKEN_BLOOM_SHARDS
+        token_bytes = len(str(ClaimsRefreshToken.for_user(self.user)))
+
+        print(f"\n{buckets} buckets over the refresh lifetime, {shards} shards each, error rate {error_rate:g}")
+        for issued in ISSUED:
+            store = UsedTokenStore(bucket_seconds, math.ceil(issued / buckets), error_rate, shards)
+            size_mb = buckets * store.bucket_bytes / 2**20
+            blacklist_mb = issued * token_bytes / 2**20
+            print(
+                f"{issued:>11,} refreshes: bloom {size_mb:8.1f} MiB ({size_mb * 2**20 * 8 / issued:4.1f} bits each)"
+                f"   blacklist token text {blacklist_mb:9.1f} MiB"
+            )
+
+        # One shard of the largest load, filled to capacity.
+        per_shard = math.ceil(ISSUED[-1] / buckets / shards)
+        bloom = BloomFilter(*BloomFilter.sizing(per_shard, error_rate))
+        for _ in range(per_shard):
+            bloom.add(uuid.uuid4().bytes + bytes(4))
+        false_positives = sum(uuid.uuid4().bytes + bytes(4) in bloom for _ in range(PROBES))
+        print(f"full shard ({per_shard:,} ids): {false_positives} false positives in {PROBES:,} probes")
+
+    def test_mark_used_throughput(self):
+        store = UsedTokenStore.from_settings()
+        exp = time.time() + 3600
+        jtis = [uuid.uuid4().hex for _ in range(ITERATIONS * 10)]
+
+        rate = requests_per_second(lambda i: store.mark_used(jtis[i], exp), len(jtis))
+        print(f"\nmark_used on the {settings.CACHES['default']['BACKEND'].rsplit('.', 1)[-1]}: {rate:8.1f} ops/s")
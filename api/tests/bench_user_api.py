@@ -0,0 +1,95 @@
+"""
+Throughput benchmark for the register and profile endpoints.
+
+Not collected by the default test run; execute it explicitly with:
+
+    python manage.py test api.tests.bench_user_api
+
+The "before" numbers replay the previous serializer, which minted a fresh
+refresh token in both ``get_access`` and ``get_refresh`` and was also used
+for profile reads. Password hashing is switched to MD5 so the figures show
+the serialization and token-signing cost rather than PBKDF2.
+"""
+
+import time
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from api.serializers import CustomUserSerializer, UserProfileSerializer
+from api.views import CreateCustomUserApiView, UserProfileApiView
+
+
+ITERATIONS = 300
+
+
+class LegacyCustomUserSerializer(CustomUserSerializer):
+    """The serializer as it was before a token pair was minted once."""
+
+    def get_refresh(self, user):
+        refresh = RefreshToken.for_user(user)
+        return str(refresh)
+
+    def get_access(self, user):
+        refresh = RefreshToken.for_user(user)
+        access = (str(refresh.access_token),)
+        return access
+
+
+def requests_per_second(make_request, iterations=ITERATIONS):
+    """Call ``make_request`` repeatedly and return the achieved rate."""
+    started = time.perf_counter()
+    for i in range(iterations):
+        make_request(i)
+    return iterations / (time.perf_counter() - started)
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class UserApiThroughputBenchmark(TestCase):
+    """Compare requests per second before and after the token changes."""
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.user = get_user_model().objects.create_user(
+            email="bench@example.com", password="benchpass123", username="bench"
+        )
+
+    def profile_rps(self, serializer_class):
+        view = UserProfileApiView.as_view(serializer_class=serializer_class)
+
+        def make_request(i):
+            request = self.factory.get("/api/profile")
+            force_authenticate(request, user=self.user)
+            response = view(request)
+            response.render()
+
+        return requests_per_second(make_request)
+
+    def register_rps(self, serializer_class, prefix):
+        view = CreateCustomUserApiView.as_view(serializer_class=serializer_class)
+
+        def make_request(i):
+            request = self.factory.post(
+                "/api/register",
+                {
+                    "email": f"{prefix}{i}@example.com",
+                    "username": f"{prefix}{i}",
+                    "password": "benchpass123",
+                },
+            )
+            response = view(request)
+            response.render()
+
+        return requests_per_second(make_request)
+
+    def test_profile_throughput(self):
+        before = self.profile_rps(LegacyCustomUserSerializer)
+        after = self.profile_rps(UserProfileSerializer)
+        print(f"\n/api/profile   before: {before:8.1f} req/s   after: {after:8.1f} req/s")
+
+    def test_register_throughput(self):
+        before = self.register_rps(LegacyCustomUserSerializer, "legacy")
+        after = self.register_rps(CustomUserSerializer, "current")
+        print(f"\n/api/register  before: {before:8.1f} req/s   after: {after:8.1f} req/s")
@@ -0,0 +1,183 @@
+"""
+Query and CPU budgets for endpoints.
+
+An endpoint's budget is the maximum number of SQL queries and the maximum
+CPU time (``time.process_time``) one request may use, measured with the
+test client against a database seeded with ``BUDGET_SEED_USERS`` users
+(default 100,000). A request over budget fails its test, so an N+1 query
+or an extra token signature shows up in CI instead of in production.
+
+Every run also writes a JSON report (``BUDGET_REPORT``, default
+``budget-report.json`` in the project root) for comparing trends between
+commits. Slow CI machines can scale the CPU budgets with
+``BUDGET_CPU_SCALE``.
+
+Declare budgets in a test module::
+
+    @with_budget_tests
+    class MyBudgetTests(BudgetTestCase):
+        budgets = [
+            Budget("api:users", max_queries=2, max_cpu_ms=15, request=as_user),
+        ]
+"""
+
+import json
+import os
+import subprocess
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+
+from accounts.factories import seed_users
+
+
+SEED_USERS = int(os.environ.get("BUDGET_SEED_USERS", 100_000))
+CPU_SCALE = float(os.environ.get("BUDGET_CPU_SCALE", 1))
+REPORT_PATH = os.environ.get("BUDGET_REPORT", os.path.join(settings.BASE_DIR, "budget-report.json"))
+# CPU time is the fastest of this many runs; queries are the most of them.
+RUNS = 3
+# Savepoints come from running inside TestCase's transaction, not from the view.
+SAVEPOINT_PREFIXES = ("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT")
+
+
+class Budget:
+    """
+    The limits for one request.
+
+    ``request(test, run)`` returns the keyword arguments for the test
+    client call (``data``, ``format``, ``headers``...), plus optionally
+    ``query`` and URL ``args``; it runs before the measurement starts, so
+    it may create users or make setup requests.
+    """
+
+    def __init__(self, url_name, method="get", *, max_queries, max_cpu_ms,
+                 status=200, label=None, request=None, args=()):
+        self.url_name = url_name
+        self.method = method
+        self.max_queries = max_queries
+        self.max_cpu_ms = max_cpu_ms
+        self.status = status
+        self.label = label or f"{url_name.replace(':', '_').replace('-', '_')}_{method}"
+        self.request = request
+        self.args = args
+
+    def __repr__(self):
+        return f"<Budget {self.label}>"
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def count_queries(captured):
+    return sum(not query["sql"].startswith(SAVEPOINT_PREFIXES) for query in captured.captured_queries)
+
+
+class BudgetReport:
+    def __init__(self):
+        self.results = []
+
+    def add(self, result):
+        self.results.append(result)
+
+    def write(self, path=REPORT_PATH):
+        report = {
+            "generated_at": timezone.now().isoformat(),
+            "commit": git_commit(),
+            "database": connection.vendor,
+            "seed_users": SEED_USERS,
+            "cpu_scale": CPU_SCALE,
+            "results": sorted(self.results, key=lambda result: result["label"]),
+        }
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+report = BudgetReport()
+
+
+@override_settings(
+    # Budgets measure the application, not the password hasher.
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+    PASSWORD_HASHING_WORKERS=0,
+)
+class BudgetTestCase(TestCase):
+    budgets = ()
+
+    @classmethod
+    def setUpTestData(cls):
+        seed_users(SEED_USERS)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        if cls.budgets:
+            report.write()
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def measure(self, budget):
+        """Return ``(queries, cpu_ms, status)`` for the budget's request."""
+        method = getattr(self.client, budget.method)
+        queries, cpu_times, status = 0, [], None
+        for run in range(RUNS):
+            kwargs = budget.request(self, run) if budget.request else {}
+            path = reverse(budget.url_name, args=kwargs.pop("args", budget.args)) + kwargs.pop("query", "")
+            cache.clear()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.process_time()
+                response = method(path, **kwargs)
+                cpu_times.append((time.process_time() - started) * 1000)
+            queries = max(queries, count_queries(captured))
+            status = response.status_code
+            self.client.logout()
+        return queries, min(cpu_times), status
+
+    def check_budget(self, budget):
+        queries, cpu_ms, status = self.measure(budget)
+        max_cpu_ms = budget.max_cpu_ms * CPU_SCALE
+        passed = status == budget.status and queries <= budget.max_queries and cpu_ms <= max_cpu_ms
+        report.add({
+            "label": budget.label,
+            "url_name": budget.url_name,
+            "method": budget.method.upper(),
+            "status": status,
+            "queries": queries,
+            "max_queries": budget.max_queries,
+            "cpu_ms": round(cpu_ms, 3),
+            "max_cpu_ms": max_cpu_ms,
+            "passed": passed,
+        })
+        self.assertEqual(status, budget.status, f"{budget.label} returned {status}")
+        self.assertLessEqual(
+            queries, budget.max_queries, f"{budget.label} ran {queries} queries, budget {budget.max_queries}"
+        )
+        self.assertLessEqual(
+            cpu_ms, max_cpu_ms, f"{budget.label} used {cpu_ms:.1f} ms CPU, budget {max_cpu_ms:.1f} ms"
+        )
+
+
+def with_budget_tests(cls):
+    """Class decorator adding a ``test_budget_<label>`` method per budget."""
+    for budget in cls.budgets:
+        def test(self, budget=budget):
+            self.check_budget(budget)
+        test.__name__ = f"test_budget_{budget.label}"
+        test.__doc__ = f"Test {budget.method.upper()} {budget.url_name} stays within its budget."
+        setattr(cls, test.__name__, test)
+    return cls
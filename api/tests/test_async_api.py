@@ -0,0 +1,147 @@
+"""
+Tests for the async auth and profile endpoints.
+"""
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+
+
+CREATE_USER_URL = reverse("api:async-signup")
+TOKEN_URL = reverse("api:async-signin")
+REFRESH_URL = reverse("api:async-refresh")
+PROFILE_URL = reverse("api:async-profile")
+
+
+def create_user(**params):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(**params)
+
+
+acreate_user = sync_to_async(create_user)
+
+
+@override_settings(
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+    PASSWORD_HASHING_WORKERS=0,
+)
+class AsyncAuthApiTests(TestCase):
+    """Test the async register, login and refresh endpoints."""
+
+    def setUp(self):
+        cache.clear()
+
+    async def test_register_returns_tokens(self):
+        """Test registering creates the user and returns a token pair."""
+        payload = {"email": "async@example.com", "password": "testpass123", "username": "async"}
+        res = await self.async_client.post(CREATE_USER_URL, payload, content_type="application/json")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        data = res.json()
+        self.assertNotIn("password", data)
+        self.assertIn("access", data)
+        self.assertIn("refresh", data)
+        user = await get_user_model().objects.aget(email=payload["email"])
+        self.assertTrue(await user.acheck_password(payload["password"]))
+
+    async def test_register_errors_match_sync_view(self):
+        """Test validation errors have the same body as the DRF view."""
+        await get_user_model().objects.acreate(email="taken@example.com", username="taken")
+        payload = {"email": "taken@example.com", "password": "short", "username": "taken"}
+
+        res = await self.async_client.post(CREATE_USER_URL, payload, content_type="application/json")
+        sync_res = await self.async_client.post(reverse("api:signup"), payload, content_type="application/json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.json()["password"], sync_res.json()["password"])
+
+        payload["password"] = "long-enough-pass"
+        res = await self.async_client.post(CREATE_USER_URL, payload, content_type="application/json")
+        sync_res = await self.async_client.post(reverse("api:signup"), payload, content_type="application/json")
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.json(), sync_res.json())
+
+    async def test_login_and_refresh(self):
+        """Test logging in returns tokens that refresh and authenticate."""
+        await acreate_user(email="login@example.com", password="testpass123", username="login")
+
+        res = await self.async_client.post(
+            TOKEN_URL, {"email": "login@example.com", "password": "testpass123"},
+            content_type="application/json",
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        tokens = res.json()
+        self.assertEqual(tokens["user"]["username"], "login")
+
+        res = await self.async_client.post(
+            REFRESH_URL, {"refresh": tokens["refresh"]}, content_type="application/json"
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn("access", res.json())
+
+        res = await self.async_client.get(PROFILE_URL, headers={"Authorization": f"Bearer {tokens['access']}"})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()["email"], "login@example.com")
+
+    async def test_login_bad_credentials(self):
+        """Test a wrong password is rejected like the DRF view."""
+        await acreate_user(email="login@example.com", password="testpass123")
+        payload = {"email": "login@example.com", "password": "wrong-pass"}
+
+        res = await self.async_client.post(TOKEN_URL, payload, content_type="application/json")
+        sync_res = await self.async_client.post(reverse("api:signin"), payload, content_type="application/json")
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(res.json(), sync_res.json())
+
+    async def test_refresh_invalid_token(self):
+        """Test an invalid refresh token is rejected with 401."""
+        res = await self.async_client.post(REFRESH_URL, {"refresh": "nope"}, content_type="application/json")
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(res.json()["code"], "token_not_valid")
+
+
+@override_settings(
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+    PASSWORD_HASHING_WORKERS=0,
+)
+class AsyncProfileApiTests(TestCase):
+    """Test the async profile endpoint."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user(email="profile@example.com", password="testpass123", username="profile")
+        res = self.client.post(
+            reverse("api:signin"), {"email": "profile@example.com", "password": "testpass123"}
+        )
+        self.headers = {"Authorization": f"Bearer {res.json()['access']}"}
+
+    async def test_requires_authentication(self):
+        """Test the profile is not served without a token."""
+        res = await self.async_client.get(PROFILE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn("WWW-Authenticate", res.headers)
+
+    async def test_update_profile(self):
+        """Test PATCH updates the profile and returns it."""
+        res = await self.async_client.patch(
+            PROFILE_URL, {"firstName": "Ada"}, content_type="application/json", headers=self.headers
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()["firstName"], "Ada")
+        await self.user.arefresh_from_db()
+        self.assertEqual(self.user.firstName, "Ada")
+
+    async def test_delete_profile(self):
+        """Test DELETE removes the user."""
+        res = await self.async_client.delete(PROFILE_URL, headers=self.headers)
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(await get_user_model().objects.filter(pk=self.user.pk).aexists())
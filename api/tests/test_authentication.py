@@ -0,0 +1,93 @@
+"""
+Tests for the stateless JWT authentication backend.
+"""
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.authentication import ClaimsUser
+from api.tokens import ClaimsRefreshToken
+
+
+USERS_URL = reverse("api:users")
+TOKEN_URL = reverse("api:signin")
+
+
+def create_user(**params):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(**params)
+
+
+class StatelessJWTAuthenticationTests(TestCase):
+    """Test requests authenticated from token claims."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user(
+            email="test@example.com",
+            password="testpass123",
+            username="Test Name",
+        )
+        self.client = APIClient()
+        access = ClaimsRefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+
+    def test_login_tokens_carry_user_claims(self):
+        """Test the login endpoint signs the public user fields."""
+        res = APIClient().post(
+            TOKEN_URL, {"email": "test@example.com", "password": "testpass123"}
+        )
+
+        access = AccessToken(res.data["access"])
+        self.assertEqual(access["email"], self.user.email)
+        self.assertEqual(access["username"], self.user.username)
+        self.assertFalse(access["is_staff"])
+
+    def test_cached_state_skips_user_select(self):
+        """Test a warm request runs only the listing queries."""
+        self.client.get(USERS_URL)
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(USERS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertFalse(
+            any('"accounts_customuser"."id" =' in q["sql"] for q in queries.captured_queries)
+        )
+
+    def test_deactivated_user_rejected(self):
+        """Test saving an inactive user drops the cached state."""
+        self.client.get(USERS_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(USERS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_user_rejected(self):
+        """Test tokens of deleted users are refused."""
+        self.user.delete()
+
+        res = self.client.get(USERS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_claims_user_loads_model_on_demand(self):
+        """Test attributes outside the claims come from the database."""
+        self.user.firstName = "First"
+        self.user.save()
+        user = ClaimsUser(ClaimsRefreshToken.for_user(self.user).access_token)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(user.email, self.user.email)
+        with self.assertNumQueries(1):
+            self.assertEqual(user.firstName, "First")
@@ -0,0 +1,133 @@
+"""
+Tests for response caching and its invalidation.
+"""
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from reddit_clone.cache import cache_anonymous_page
+
+
+USERS_URL = reverse("api:users")
+PROFILE_URL = reverse("api:profile")
+HOME_URL = reverse("home")
+CONTACT_URL = reverse("contact")
+
+
+def create_user(**params):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(**params)
+
+
+class CachedResponseTests(TestCase):
+    """Test API responses are cached until a user changes."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user(
+            email="test@example.com",
+            password="testpass123",
+            username="Test Name",
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_listing_served_from_cache(self):
+        """Test a repeated listing request runs no queries."""
+        first = self.client.get(USERS_URL)
+
+        with self.assertNumQueries(0):
+            second = self.client.get(USERS_URL)
+
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(first.data, second.data)
+
+    def test_new_user_invalidates_listing(self):
+        """Test saving a user bumps the listing version."""
+        self.client.get(USERS_URL)
+        create_user(email="other@example.com", password="testpass123")
+
+        res = self.client.get(USERS_URL)
+
+        emails = [row["email"] for row in res.data["results"]]
+        self.assertIn("other@example.com", emails)
+
+    def test_profile_update_invalidates_profile(self):
+        """Test a profile PATCH is visible on the next read."""
+        self.client.get(PROFILE_URL)
+        self.client.patch(PROFILE_URL, {"firstName": "Changed"})
+
+        res = self.client.get(PROFILE_URL)
+
+        self.assertEqual(res.data["firstName"], "Changed")
+
+    def test_responses_not_shared_between_users(self):
+        """Test the requesting user is part of the key."""
+        other = create_user(email="other@example.com", password="testpass123")
+        self.client.get(PROFILE_URL)
+        self.client.force_authenticate(user=other)
+
+        res = self.client.get(PROFILE_URL)
+
+        self.assertEqual(res.data["email"], "other@example.com")
+
+
+class CachedPageTests(TestCase):
+    """Test the home page cache only serves signed-out visitors."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_anonymous_home_page_cached(self):
+        """Test the second anonymous hit skips rendering."""
+        self.client.get(HOME_URL)
+
+        with self.assertTemplateNotUsed("index.html"):
+            res = self.client.get(HOME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_authenticated_home_page_not_cached(self):
+        """Test signed-in visitors always get their own page."""
+        self.client.get(HOME_URL)
+        user = create_user(email="test@example.com", password="testpass123")
+        self.client.force_login(user)
+
+        res = self.client.get(HOME_URL)
+
+        self.assertContains(res, "test@example.com")
+
+    def test_pages_with_csrf_token_not_cached(self):
+        """Test each visitor of a form gets a token matching their cookie."""
+        first = self.client.get(CONTACT_URL)
+        self.client.cookies.clear()
+
+        second = self.client.get(CONTACT_URL)
+
+        self.assertTemplateUsed(second, "contact.html")
+        token = second.cookies["csrftoken"].value
+        self.assertNotEqual(token, first.cookies["csrftoken"].value)
+
+    def test_csrf_token_page_not_stored(self):
+        """Test the page cache skips a response that rendered a CSRF token."""
+        calls = []
+
+        @cache_anonymous_page()
+        def form(request):
+            calls.append(request)
+            return HttpResponse(get_token(request))
+
+        for _ in range(2):
+            request = RequestFactory().get("/form")
+            request.user = AnonymousUser()
+            form(request)
+
+        self.assertEqual(len(calls), 2)
@@ -0,0 +1,155 @@
+"""
+Tests for database connection management.
+"""
+
+from unittest import mock
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from reddit_clone import middleware
+from reddit_clone.checks import check_database_connections, check_shared_cache
+from reddit_clone.db import connection_settings, connections_per_process
+
+
+POSTGRES = "django.db.backends.postgresql"
+SQLITE = "django.db.backends.sqlite3"
+
+
+class ConnectionSettingsTests(SimpleTestCase):
+    """Test the environment-driven connection settings."""
+
+    def test_wsgi_profile_uses_persistent_connections(self):
+        """Test the default profile keeps connections with health checks."""
+        config = connection_settings(POSTGRES, {})
+
+        self.assertEqual(config["CONN_MAX_AGE"], 60)
+        self.assertTrue(config["CONN_HEALTH_CHECKS"])
+        self.assertEqual(config["OPTIONS"], {})
+
+    def test_asgi_profile_uses_pool(self):
+        """Test the ASGI profile pools instead of persisting connections."""
+        config = connection_settings(POSTGRES, {"DB_CONNECTION_PROFILE": "asgi", "DB_POOL_MAX_SIZE": "6"})
+
+        self.assertEqual(config["CONN_MAX_AGE"], 0)
+        self.assertEqual(config["OPTIONS"]["pool"], {"min_size": 2, "max_size": 6, "timeout": 10})
+        self.assertEqual(connections_per_process(config), 6)
+
+    def test_pool_ignored_on_sqlite(self):
+        """Test the pool is only configured for Postgres."""
+        config = connection_settings(SQLITE, {"DB_CONNECTION_PROFILE": "asgi"})
+
+        self.assertEqual(config["OPTIONS"], {})
+
+    def test_pool_overrides_persistent_connections(self):
+        """Test enabling the pool forces CONN_MAX_AGE to 0."""
+        config = connection_settings(POSTGRES, {"DB_POOL": "true", "DB_CONN_MAX_AGE": "600"})
+
+        self.assertEqual(config["CONN_MAX_AGE"], 0)
+        self.assertIn("pool", config["OPTIONS"])
+
+    def test_environment_overrides(self):
+        """Test each default can be overridden."""
+        config = connection_settings(POSTGRES, {"DB_CONN_MAX_AGE": "300", "DB_CONN_HEALTH_CHECKS": "off"})
+
+        self.assertEqual(config["CONN_MAX_AGE"], 300)
+        self.assertFalse(config["CONN_HEALTH_CHECKS"])
+        self.assertEqual(connections_per_process(config, threads=2), 2)
+
+    def test_unknown_profile(self):
+        """Test an unknown profile is rejected at startup."""
+        with self.assertRaises(ImproperlyConfigured):
+            connection_settings(POSTGRES, {"DB_CONNECTION_PROFILE": "threads"})
+
+
+class RawConnection:
+    """Stand-in for a DB-API connection."""
+
+
+class ConnectionMetricsMiddlewareTests(TestCase):
+    """Test connections opened per request are counted."""
+
+    def open_connection(self, raw):
+        fake = mock.Mock(alias="default", connection=raw, execute_wrappers=[])
+        connection_created.send(sender=type(connection), connection=fake)
+
+    def test_counts_new_connections(self):
+        """Test a new physical connection is counted once."""
+        raw = RawConnection()
+
+        def get_response(request):
+            self.open_connection(raw)
+            return HttpResponse()
+
+        handler = middleware.DatabaseConnectionMetricsMiddleware(get_response)
+        before = middleware.metrics.snapshot()
+
+        first = handler(RequestFactory().get("/"))
+        # A pool handing the same connection out again is not a new one.
+        second = handler(RequestFactory().get("/"))
+
+        after = middleware.metrics.snapshot()
+        self.assertEqual(first["X-DB-Connections-Opened"], "1")
+        self.assertEqual(second["X-DB-Connections-Opened"], "0")
+        self.assertEqual(after["requests"], before["requests"] + 2)
+        self.assertEqual(
+            after["connections_opened_in_requests"], before["connections_opened_in_requests"] + 1
+        )
+
+    def test_reused_connection_reports_zero(self):
+        """Test requests on an already open connection report none opened."""
+        res = self.client.get(reverse("api:users"))
+
+        self.assertEqual(res["X-DB-Connections-Opened"], "0")
+
+
+class DatabaseCheckTests(TestCase):
+    """Test the startup database self-check."""
+
+    def test_reachable_database_passes(self):
+        """Test the configured database passes the check."""
+        self.assertEqual(check_database_connections(None, databases=["default"]), [])
+
+    def test_pool_without_psycopg_pool(self):
+        """Test a pool without psycopg_pool installed is an error."""
+        with mock.patch.dict(settings.DATABASES["default"], {"OPTIONS": {"pool": True}}), mock.patch(
+            "reddit_clone.checks.importlib.util.find_spec", return_value=None
+        ):
+            errors = check_database_connections(None, databases=["default"])
+
+        self.assertEqual([e.id for e in errors], ["reddit_clone.E001"])
+
+    @override_settings(DB_CONNECTION_PROFILE="asgi")
+    def test_persistent_connections_under_asgi(self):
+        """Test persistent connections under ASGI are flagged."""
+        with mock.patch.dict(settings.DATABASES["default"], {"CONN_MAX_AGE": 60, "OPTIONS": {}}):
+            errors = check_database_connections(None, databases=["default"])
+
+        self.assertIn("reddit_clone.W001", [e.id for e in errors])
+
+
+class SharedCacheCheckTests(SimpleTestCase):
+    """Test the check that production runs on a shared cache."""
+
+    LOCMEM = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+    REDIS = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache"}}
+
+    @override_settings(DEBUG=False, CACHES=LOCMEM)
+    def test_local_cache_in_production(self):
+        """Test a per-process cache without DEBUG is an error."""
+        self.assertEqual([e.id for e in check_shared_cache(None)], ["reddit_clone.E003"])
+
+    @override_settings(DEBUG=True, CACHES=LOCMEM)
+    def test_local_cache_in_development(self):
+        """Test DEBUG allows a per-process cache."""
+        self.assertEqual(check_shared_cache(None), [])
+
+    @override_settings(DEBUG=False, CACHES=REDIS)
+    def test_shared_cache_in_production(self):
+        """Test a shared cache passes."""
+        self.assertEqual(check_shared_cache(None), [])
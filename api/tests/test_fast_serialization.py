@@ -0,0 +1,186 @@
+"""
+Tests for values()-based list serialization and the orjson renderer.
+"""
+
+import datetime
+import decimal
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+
+from rest_framework import serializers, status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from api.mappers import RowMapper
+from api.models import Community, Post
+from api.renderers import FastJSONRenderer
+from api.serializers import FollowerSerializer, ListCustomUserSerializer, PostListSerializer
+from api.tokens import ClaimsRefreshToken
+
+
+USERS_URL = reverse("api:users")
+TRICKY = 'Zoë "quoted" \\ back\nslash \x1f     😀 <tag>'
+
+
+def create_user(**params):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(**params)
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    """Test the orjson renderer writes the same bytes as JSONRenderer."""
+
+    def assertSameBytes(self, data, accepted_media_type=None):
+        expected = JSONRenderer().render(data, accepted_media_type)
+        self.assertEqual(FastJSONRenderer().render(data, accepted_media_type), expected)
+
+    def test_plain_values(self):
+        """Test strings, numbers, booleans and nesting."""
+        self.assertSameBytes({
+            "text": TRICKY,
+            "numbers": [0, -1, 2**63 - 1, 0.1, 123456.789, 1.5],
+            "flags": [True, False, None],
+            "nested": {"list": [{"a": []}, {}], "empty": ""},
+        })
+
+    def test_types_json_lacks(self):
+        """Test values DRF's encoder converts are converted the same way."""
+        self.assertSameBytes({
+            "aware": datetime.datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=datetime.timezone.utc),
+            "naive": datetime.datetime(2024, 5, 1, 12, 30),
+            "date": datetime.date(2024, 5, 1),
+            "time": datetime.time(8, 15),
+            "delta": datetime.timedelta(minutes=90),
+            "decimal": decimal.Decimal("1.25"),
+            "uuid": uuid.UUID(int=7),
+            "lazy": gettext_lazy("This field is required."),
+            "tuple": (1, 2),
+        })
+
+    def test_fallbacks(self):
+        """Test indented output and values orjson refuses still render."""
+        self.assertSameBytes({"a": [1, 2]}, "application/json; indent=2")
+        self.assertSameBytes({"big": 2**70})
+        self.assertSameBytes({1: "integer key"})
+
+    def test_none_renders_empty(self):
+        """Test a body-less response renders no bytes."""
+        self.assertEqual(FastJSONRenderer().render(None), b"")
+
+
+class RowMapperTests(TestCase):
+    """Test mapped rows equal the serializer's output."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user(email="zoe@example.com", username="zoe", firstName=TRICKY, is_staff=True)
+        create_user(email="anon@example.com", username="anon")
+        community = Community.objects.create(name="python", title="Python")
+        Post.objects.create(community=community, author=cls.user, title=TRICKY, url="https://example.com")
+        Post.objects.create(community=community, title="No author")
+
+    def assertMapsLikeSerializer(self, serializer_class, queryset):
+        mapper = RowMapper(serializer_class)
+        expected = serializer_class(queryset, many=True).data
+
+        mapped = mapper.map(queryset.values(*mapper.columns))
+
+        self.assertEqual(JSONRenderer().render(mapped), JSONRenderer().render(expected))
+        return mapped
+
+    def test_user_listing(self):
+        """Test users map to the listing's representation."""
+        User = get_user_model()
+        mapped = self.assertMapsLikeSerializer(ListCustomUserSerializer, User.objects.order_by("pk"))
+
+        self.assertEqual(mapped[0]["firstName"], TRICKY)
+        self.assertIs(mapped[0]["is_staff"], True)
+
+    def test_relations_and_datetimes(self):
+        """Test foreign key sources, nullable ones and converted fields."""
+        with timezone.override("Europe/Paris"):
+            mapped = self.assertMapsLikeSerializer(PostListSerializer, Post.objects.order_by("pk"))
+
+        self.assertEqual([post["author"] for post in mapped], ["zoe", None])
+        self.assertIsInstance(mapped[0]["created_at"], str)
+
+    def test_nested_serializer_refused(self):
+        """Test serializers that aren't plain columns can't be mapped."""
+        with self.assertRaises(ImproperlyConfigured):
+            RowMapper(FollowerSerializer)
+
+    def test_nullable_relation_without_default_refused(self):
+        """Test a source through a nullable relation needs default=None."""
+
+        class AuthorSerializer(serializers.ModelSerializer):
+            author = serializers.CharField(source="author.username", read_only=True)
+
+            class Meta:
+                model = Post
+                fields = ("id", "author")
+
+        with self.assertRaises(ImproperlyConfigured):
+            RowMapper(AuthorSerializer)
+
+
+class FastUserListingTests(TestCase):
+    """Test the user listing serves the same bytes from values() rows."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            create_user(email=f"user{i}@example.com", username=f"user{i}", firstName=TRICKY if i % 2 else "")
+            for i in range(5)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        access = ClaimsRefreshToken.for_user(self.users[0]).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+
+    def test_same_bytes_as_serializer(self):
+        """Test every page equals the serializer's output over the same rows."""
+        User = get_user_model()
+        url, seen = f"{USERS_URL}?ordering=-username&page_size=2", []
+        while url:
+            res = self.client.get(url)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            rows = res.json()["results"]
+            expected = ListCustomUserSerializer(
+                [User.objects.get(pk=row["id"]) for row in rows], many=True
+            ).data
+            self.assertEqual(
+                res.content,
+                JSONRenderer().render({**res.json(), "results": expected}),
+            )
+            seen.extend(row["username"] for row in rows)
+            url = res.json()["next"]
+
+        self.assertEqual(seen, sorted((user.username for user in self.users), reverse=True))
+
+    def test_filters_apply(self):
+        """Test filtering and search run before the rows are read."""
+        res = self.client.get(USERS_URL, {"username": "user3"})
+
+        self.assertEqual([row["username"] for row in res.json()["results"]], ["user3"])
+
+    def test_reads_only_needed_columns(self):
+        """Test a page is one query over the listed columns."""
+        self.client.force_authenticate(user=self.users[0])
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(USERS_URL)
+
+        reads = [query["sql"] for query in queries if 'FROM "accounts_customuser"' in query["sql"]]
+        self.assertEqual(len(reads), 1)
+        self.assertNotIn('"password"', reads[0])
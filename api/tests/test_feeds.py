@@ -0,0 +1,176 @@
+"""
+Tests for communities, posts and the ranked feeds.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from api import ranking
+from api.models import Comment, Community, Post
+from api.tokens import ClaimsRefreshToken
+
+
+FEED_URL = reverse("api:feed")
+POSTS_URL = reverse("api:posts")
+COMMUNITIES_URL = reverse("api:communities")
+NOW = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def create_user(**params):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(**params)
+
+
+def community_posts_url(name):
+    return reverse("api:community-posts", args=[name])
+
+
+class HotScoreTests(SimpleTestCase):
+    """Test the hot ranking formula."""
+
+    def test_newer_wins_at_equal_score(self):
+        """Test time breaks ties in favour of newer posts."""
+        self.assertGreater(ranking.hot(10, NOW), ranking.hot(10, NOW - timedelta(hours=1)))
+
+    def test_ten_times_the_score_is_worth_half_a_day(self):
+        """Test the log scale of votes against time."""
+        self.assertAlmostEqual(ranking.hot(100, NOW) - ranking.hot(10, NOW + timedelta(seconds=45000)), 0)
+
+    def test_negative_scores_rank_below_zero(self):
+        """Test downvoted posts sink."""
+        self.assertLess(ranking.hot(-10, NOW), ranking.hot(0, NOW))
+
+
+class PostModelTests(TestCase):
+    """Test the stored scores and counters."""
+
+    def setUp(self):
+        self.community = Community.objects.create(name="python", title="Python")
+
+    def test_hot_set_on_create(self):
+        """Test a new post stores its hot score."""
+        post = Post.objects.create(community=self.community, title="Hello", created_at=NOW)
+
+        self.assertEqual(post.hot, ranking.hot(0, NOW))
+
+    def test_apply_votes(self):
+        """Test vote deltas update the score and hot of the touched posts only."""
+        voted = Post.objects.create(community=self.community, title="Voted", created_at=NOW)
+        other = Post.objects.create(community=self.community, title="Other", created_at=NOW)
+
+        self.assertEqual(Post.objects.apply_votes({voted.pk: (12, 2)}), 1)
+
+        voted.refresh_from_db()
+        self.assertEqual((voted.ups, voted.downs, voted.score), (12, 2, 10))
+        self.assertEqual(voted.hot, ranking.hot(10, NOW))
+        self.assertEqual(Post.objects.get(pk=other.pk).hot, ranking.hot(0, NOW))
+
+    def test_comment_counts(self):
+        """Test adding a comment bumps the post's counter."""
+        post = Post.objects.create(community=self.community, title="Hello")
+
+        Comment.objects.add(post.pk, None, "First")
+
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+
+class FeedApiTests(TestCase):
+    """Test the feed endpoints."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user(email="me@example.com", username="me")
+        self.python = Community.objects.create(name="python", title="Python")
+        self.django = Community.objects.create(name="django", title="Django")
+        self.client = APIClient()
+        self.posts = []
+        for i in range(6):
+            post = Post.objects.create(
+                community=self.python if i % 2 else self.django,
+                author=self.user,
+                title=f"Post {i}",
+                created_at=NOW + timedelta(hours=i),
+            )
+            self.posts.append(post)
+        # An old post with many votes outranks the recent ones.
+        Post.objects.apply_votes({self.posts[0].pk: (1000, 0), self.posts[1].pk: (5, 0)})
+
+    def titles(self, res):
+        return [post["title"] for post in res.data["results"]]
+
+    def test_front_page_sorts(self):
+        """Test hot, top and new order the front page."""
+        hot = self.client.get(FEED_URL)
+        top = self.client.get(FEED_URL + "?sort=top")
+        new = self.client.get(FEED_URL + "?sort=new")
+
+        self.assertEqual(hot.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.titles(hot)[0], "Post 0")
+        self.assertEqual(self.titles(top)[:2], ["Post 0", "Post 1"])
+        self.assertEqual(self.titles(new), [f"Post {i}" for i in reversed(range(6))])
+
+    def test_feed_pages(self):
+        """Test the cursor walks the whole feed without repeats."""
+        res = self.client.get(FEED_URL + "?sort=hot&page_size=4")
+        seen = self.titles(res)
+        res = self.client.get(res.data["next"])
+        seen += self.titles(res)
+
+        self.assertEqual(sorted(seen), sorted(f"Post {i}" for i in range(6)))
+        self.assertIsNone(res.data["next"])
+
+    def test_feed_queries(self):
+        """Test a feed page is one query, with the community and author joined."""
+        with self.assertNumQueries(1):
+            res = self.client.get(FEED_URL)
+
+        self.assertEqual(res.data["results"][0]["community"], "django")
+        self.assertEqual(res.data["results"][0]["author"], "me")
+
+    def test_community_feed(self):
+        """Test a community feed only has its posts."""
+        res = self.client.get(community_posts_url("python") + "?sort=new")
+
+        self.assertEqual(self.titles(res), ["Post 5", "Post 3", "Post 1"])
+        self.assertEqual(self.client.get(community_posts_url("nope")).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_create_post(self):
+        """Test signed-in users can post to a community."""
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {ClaimsRefreshToken.for_user(self.user).access_token}"
+        )
+
+        res = self.client.post(POSTS_URL, {"community": "python", "title": "New", "body": "Text"})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        post = Post.objects.get(pk=res.data["id"])
+        self.assertEqual(post.author, self.user)
+        self.assertEqual(res.data["community"], "python")
+        self.assertEqual(self.client.get(reverse("api:post-detail", args=[post.pk])).data["body"], "Text")
+
+    def test_create_post_requires_authentication(self):
+        """Test anonymous users can read but not post."""
+        res = self.client.post(POSTS_URL, {"community": "python", "title": "New"})
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_create_community(self):
+        """Test creating a community normalizes its name."""
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {ClaimsRefreshToken.for_user(self.user).access_token}"
+        )
+
+        res = self.client.post(COMMUNITIES_URL, {"name": "AskReddit", "title": "Ask"})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data["name"], "askreddit")
+        self.assertEqual(res.data["creator"], "me")
+        self.assertEqual(self.client.post(COMMUNITIES_URL, {"name": "a b", "title": "x"}).status_code, 400)
@@ -0,0 +1,181 @@
+"""
+Tests for the follow graph.
+"""
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from api.models import Follow
+from api.tokens import ClaimsRefreshToken
+
+
+def create_user(**params):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(**params)
+
+
+def follow_url(username):
+    return reverse("api:follow", args=[username])
+
+
+def edges_url(name, username):
+    return reverse(f"api:{name}", args=[username])
+
+
+class FollowManagerTests(TestCase):
+    """Test edges and the denormalized counters."""
+
+    def setUp(self):
+        self.alice = create_user(email="alice@example.com", username="alice")
+        self.bob = create_user(email="bob@example.com", username="bob")
+
+    def counts(self, user):
+        user.refresh_from_db()
+        return user.followers_count, user.following_count
+
+    def test_follow_updates_counters(self):
+        """Test following bumps both counters once."""
+        self.assertTrue(Follow.objects.follow(self.alice.pk, self.bob.pk))
+        self.assertFalse(Follow.objects.follow(self.alice.pk, self.bob.pk))
+
+        self.assertEqual(self.counts(self.alice), (0, 1))
+        self.assertEqual(self.counts(self.bob), (1, 0))
+
+    def test_unfollow_updates_counters(self):
+        """Test unfollowing decrements both counters once."""
+        Follow.objects.follow(self.alice.pk, self.bob.pk)
+
+        self.assertTrue(Follow.objects.unfollow(self.alice.pk, self.bob.pk))
+        self.assertFalse(Follow.objects.unfollow(self.alice.pk, self.bob.pk))
+
+        self.assertEqual(self.counts(self.alice), (0, 0))
+        self.assertEqual(self.counts(self.bob), (0, 0))
+
+    def test_follow_queries(self):
+        """Test a follow is one INSERT and one UPDATE."""
+        with CaptureQueriesContext(connection) as queries:
+            Follow.objects.follow(self.alice.pk, self.bob.pk)
+
+        statements = [q["sql"].split()[0] for q in queries.captured_queries]
+        self.assertEqual([s for s in statements if s in ("INSERT", "UPDATE")], ["INSERT", "UPDATE"])
+
+    def test_profile_save_keeps_counters(self):
+        """Test saving a stale user instance does not overwrite the counters."""
+        stale = get_user_model().objects.get(pk=self.bob.pk)
+        Follow.objects.follow(self.alice.pk, self.bob.pk)
+
+        stale.firstName = "Bob"
+        stale.save()
+
+        self.assertEqual(self.counts(self.bob), (1, 0))
+
+    def test_deleting_user_releases_counts(self):
+        """Test counters on the other end of a deleted user's edges are decremented in batches."""
+        carol = create_user(email="carol@example.com", username="carol")
+        Follow.objects.follow(self.alice.pk, self.bob.pk)
+        Follow.objects.follow(carol.pk, self.bob.pk)
+        Follow.objects.follow(self.bob.pk, carol.pk)
+
+        self.bob.delete()
+
+        self.assertEqual(self.counts(self.alice), (0, 0))
+        self.assertEqual(self.counts(carol), (0, 0))
+        self.assertFalse(Follow.objects.exists())
+
+    def test_mutuals(self):
+        """Test mutuals are the followed users who follow back."""
+        carol = create_user(email="carol@example.com", username="carol")
+        Follow.objects.follow(self.alice.pk, self.bob.pk)
+        Follow.objects.follow(self.bob.pk, self.alice.pk)
+        Follow.objects.follow(self.alice.pk, carol.pk)
+
+        mutuals = Follow.objects.mutuals_of(self.alice.pk).values_list("followee_id", flat=True)
+
+        self.assertEqual(list(mutuals), [self.bob.pk])
+
+
+class FollowApiTests(TestCase):
+    """Test the follow endpoints."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user(email="me@example.com", username="me")
+        self.others = [
+            create_user(email=f"user{i}@example.com", username=f"user{i}") for i in range(5)
+        ]
+        self.client = APIClient()
+        access = ClaimsRefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+
+    def test_follow_and_unfollow(self):
+        """Test POST follows and DELETE unfollows, both idempotently."""
+        url = follow_url("user0")
+
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.client.post(url).status_code, status.HTTP_200_OK)
+        detail = self.client.get(reverse("api:user-detail", args=["user0"]))
+        self.assertEqual(detail.data["followers_count"], 1)
+        self.assertNotIn("email", detail.data)
+
+        self.assertEqual(self.client.delete(url).status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.client.delete(url).status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Follow.objects.exists())
+
+    def test_follow_self(self):
+        """Test following yourself is refused."""
+        res = self.client.post(follow_url("me"))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_follow_unknown_user(self):
+        """Test an unknown username is a 404."""
+        self.assertEqual(self.client.post(follow_url("nobody")).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_requires_authentication(self):
+        """Test the graph is not public."""
+        res = APIClient().get(edges_url("followers", "me"))
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_followers_keyset_pages(self):
+        """Test follower pages follow the cursor in follower order."""
+        for other in self.others:
+            Follow.objects.follow(other.pk, self.user.pk)
+
+        res = self.client.get(edges_url("followers", "me") + "?page_size=2")
+        seen = [edge["user"]["username"] for edge in res.data["results"]]
+        while res.data["next"]:
+            res = self.client.get(res.data["next"])
+            seen.extend(edge["user"]["username"] for edge in res.data["results"])
+
+        self.assertEqual(seen, [f"user{i}" for i in range(5)])
+
+    def test_following_and_mutuals(self):
+        """Test the following and mutual listings."""
+        for other in self.others[:3]:
+            Follow.objects.follow(self.user.pk, other.pk)
+        Follow.objects.follow(self.others[1].pk, self.user.pk)
+
+        following = self.client.get(edges_url("following", "me"))
+        mutuals = self.client.get(edges_url("mutuals", "me"))
+
+        self.assertEqual([e["user"]["username"] for e in following.data["results"]], ["user0", "user1", "user2"])
+        self.assertEqual([e["user"]["username"] for e in mutuals.data["results"]], ["user1"])
+
+    def test_listing_queries(self):
+        """Test a page costs the username lookup and one page query."""
+        for other in self.others:
+            Follow.objects.follow(other.pk, self.user.pk)
+        self.client.get(edges_url("followers", "me"))
+
+        with self.assertNumQueries(2):
+            res = self.client.get(edges_url("followers", "me"))
+
+        self.assertEqual(len(res.data["results"]), 5)
@@ -0,0 +1,216 @@
+"""
+Tests for the full-text search index and the search endpoint.
+
+They run against whichever database the suite uses: Postgres full-text
+search, or the in-process inverted index elsewhere.
+"""
+
+from importlib import import_module
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchQuery
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.loader import MigrationLoader
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from api import search
+from api.models import Community, Post, SearchDocument
+from api.tokens import ClaimsRefreshToken
+
+
+SEARCH_URL = reverse("api:search")
+
+
+def create_user(**params):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(**params)
+
+
+def hits(res):
+    return [(hit["kind"], hit["id"]) for hit in res.data["results"]]
+
+
+class SearchIndexTests(TestCase):
+    """Test documents follow the objects they index."""
+
+    def setUp(self):
+        self.community = Community.objects.create(name="python", title="Python", description="All about snakes")
+
+    def find(self, text, kinds=search.KINDS):
+        return [(hit["kind"], hit["id"]) for hit in search.search(text, kinds)]
+
+    def test_saving_indexes(self):
+        """Test creating and editing a post updates its document."""
+        post = Post.objects.create(community=self.community, title="Walrus operator", body="Assignment expressions")
+
+        self.assertEqual(self.find("walrus"), [("post", post.pk)])
+        post.title = "Pattern matching"
+        post.save()
+        self.assertEqual(self.find("walrus"), [])
+        self.assertEqual(self.find("pattern"), [("post", post.pk)])
+
+    def test_deleting_removes(self):
+        """Test deleted objects leave the index."""
+        post = Post.objects.create(community=self.community, title="Walrus operator")
+
+        post.delete()
+
+        self.assertFalse(SearchDocument.objects.filter(kind="post").exists())
+
+    def test_unrelated_saves_skip_indexing(self):
+        """Test saves of fields outside the document leave it alone."""
+        user = create_user(email="guido@example.com", username="guido")
+        indexed_at = SearchDocument.objects.get(kind="user").updated_at
+
+        user.save(update_fields=["last_login"])
+
+        self.assertEqual(SearchDocument.objects.get(kind="user").updated_at, indexed_at)
+
+    def test_inactive_users_are_hidden(self):
+        """Test deactivating a user removes their document."""
+        user = create_user(email="guido@example.com", username="guido", firstName="Guido")
+        self.assertEqual(self.find("guido"), [("user", user.pk)])
+
+        user.is_active = False
+        user.save()
+
+        self.assertEqual(self.find("guido"), [])
+
+    def test_title_outranks_body(self):
+        """Test a match in the title ranks above one in the body."""
+        in_body = Post.objects.create(community=self.community, title="Release notes", body="New asyncio features")
+        in_title = Post.objects.create(community=self.community, title="Asyncio tips", body="Event loops")
+
+        self.assertEqual(self.find("asyncio", ["post"]), [("post", in_title.pk), ("post", in_body.pk)])
+
+    def test_every_word_must_match(self):
+        """Test words are combined with AND and -word excludes."""
+        both = Post.objects.create(community=self.community, title="Django models", body="Querysets")
+        Post.objects.create(community=self.community, title="Django views")
+
+        self.assertEqual(self.find("django querysets"), [("post", both.pk)])
+        self.assertEqual(len(self.find("django -querysets")), 1)
+
+    def test_highlights_are_escaped(self):
+        """Test matches are marked and the rest of the text escaped."""
+        Post.objects.create(community=self.community, title="<b>Walrus</b> & co")
+
+        title = search.search("walrus", ["post"])[0]["title"]
+
+        self.assertIn("<mark>Walrus</mark>", title)
+        self.assertNotIn("<b>", title)
+        self.assertIn("&amp;", title)
+
+    def test_fallback_index_matches(self):
+        """Test the inverted index finds and marks the same documents."""
+        post = Post.objects.create(community=self.community, title="Walrus operator", body="Assignment expressions")
+
+        rows = search.fallback_index.search("walrus", ["post"], None, 10, "default")
+
+        self.assertEqual([row["object_id"] for row in rows], [post.pk])
+        self.assertEqual(search.highlight(rows[0]["title_headline"]), "<mark>Walrus</mark> operator")
+
+    def test_rebuild_command(self):
+        """Test the command indexes rows written without signals and drops orphans."""
+        Post.objects.bulk_create([Post(community=self.community, title="Bulk loaded walrus")])
+        SearchDocument.objects.create(kind="post", object_id=10_000, title="Orphan walrus")
+
+        call_command("rebuild_search_index", stdout=StringIO())
+
+        post = Post.objects.get(title="Bulk loaded walrus")
+        self.assertEqual(self.find("walrus"), [("post", post.pk)])
+        self.assertEqual(self.find("snakes"), [("community", self.community.pk)])
+
+    def test_backfill_migration(self):
+        """Test the migration indexes rows that predate the search documents, through the historical models."""
+        Post.objects.bulk_create([Post(community=self.community, title="Migrated walrus")])
+        migration = import_module("api.migrations.0007_backfill_search_documents")
+
+        state = MigrationLoader(connection).project_state(("api", "0007_backfill_search_documents"))
+
+        migration.backfill_search_documents(state.apps, mock.Mock(connection=connection))
+
+        post = Post.objects.get(title="Migrated walrus")
+        self.assertEqual(self.find("walrus"), [("post", post.pk)])
+
+
+class SearchApiTests(TestCase):
+    """Test the search endpoint."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user(email="me@example.com", username="pythonista")
+        self.community = Community.objects.create(name="python", title="Python")
+        self.posts = [
+            Post.objects.create(community=self.community, title=f"Python tip {i}") for i in range(5)
+        ]
+        self.client = APIClient()
+
+    def authenticate(self):
+        access = ClaimsRefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+
+    def test_pages_follow_the_cursor(self):
+        """Test the cursor walks every hit once, in rank order."""
+        res = self.client.get(SEARCH_URL, {"q": "tip", "page_size": 2})
+        seen = hits(res)
+        while res.data["next"]:
+            res = self.client.get(res.data["next"])
+            seen.extend(hits(res))
+
+        self.assertEqual(sorted(seen), sorted(("post", post.pk) for post in self.posts))
+
+    def test_cursor_belongs_to_its_query(self):
+        """Test a cursor can't be reused for another query."""
+        res = self.client.get(SEARCH_URL, {"q": "tip", "page_size": 2})
+        cursor = res.data["next"].split("cursor=")[1]
+
+        other = self.client.get(SEARCH_URL, {"q": "python", "cursor": cursor})
+
+        self.assertEqual(other.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_filter_by_type(self):
+        """Test ``type`` limits the kinds searched."""
+        res = self.client.get(SEARCH_URL, {"q": "python", "type": "community"})
+
+        self.assertEqual(hits(res), [("community", self.community.pk)])
+        self.assertIn("<mark>", res.data["results"][0]["title"])
+
+    def test_users_need_authentication(self):
+        """Test anonymous callers don't search users."""
+        anonymous = self.client.get(SEARCH_URL, {"q": "pythonista"})
+        users_only = self.client.get(SEARCH_URL, {"q": "pythonista", "type": "user"})
+        self.authenticate()
+        signed_in = self.client.get(SEARCH_URL, {"q": "pythonista"})
+
+        self.assertEqual(hits(anonymous), [])
+        self.assertEqual(users_only.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(hits(signed_in), [("user", self.user.pk)])
+
+    def test_query_required(self):
+        """Test ``q`` is required."""
+        res = self.client.get(SEARCH_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@skipUnless(connection.vendor == "postgresql", "The vector index is Postgres-only.")
+class SearchQueryPlanTests(TestCase):
+    """Test matching is served by the GIN index."""
+
+    def test_match_uses_vector_index(self):
+        query = SearchQuery("walrus", search_type="websearch", config="english")
+        with connection.cursor() as cursor:
+            # Tiny test tables would otherwise always be scanned sequentially.
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        plan = SearchDocument.objects.filter(vector=query).explain()
+
+        self.assertIn("api_searchdocument_vector_gin", plan)
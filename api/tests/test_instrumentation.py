@@ -0,0 +1,168 @@
+"""
+Tests for request instrumentation and slow-request profiling.
+"""
+
+import os
+import pstats
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import serializers, status
+from rest_framework.test import APIClient
+
+from reddit_clone.instrumentation import current_stats, registry, serializer_timer, timed_serializer
+
+
+METRICS_URL = reverse("api:metrics")
+
+
+def create_user(**params):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(**params)
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"], PASSWORD_HASHING_WORKERS=0)
+class RequestInstrumentationTests(TestCase):
+    """Test per-route timing, Server-Timing headers and the metrics endpoint."""
+
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        self.client = APIClient()
+
+    @override_settings(SERVER_TIMING_HEADER=True)
+    def test_server_timing_header(self):
+        """Test responses report DB, serializer and total time."""
+        user = create_user(email="timing@example.com", password="testpass123")
+        self.client.force_authenticate(user=user)
+
+        res = self.client.get(reverse("api:users"))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        timing = res["Server-Timing"]
+        self.assertIn("db;dur=", timing)
+        self.assertIn("serializer;dur=", timing)
+        self.assertIn("total;dur=", timing)
+        self.assertNotIn('desc="0 queries"', timing)
+
+    @override_settings(SERVER_TIMING_HEADER=False)
+    def test_server_timing_header_disabled(self):
+        """Test the header can be switched off, as it is by default without DEBUG."""
+        res = self.client.get(reverse("api:users"))
+
+        self.assertNotIn("Server-Timing", res)
+
+    def test_metrics_keyed_by_url_name(self):
+        """Test requests are aggregated per resolved URL name."""
+        payload = {"email": "route@example.com", "password": "testpass123", "username": "route"}
+        self.client.post(reverse("api:signup"), payload)
+        self.client.post(reverse("api:signin"), {"email": "route@example.com", "password": "testpass123"})
+
+        routes = registry.snapshot()
+        signup = routes["api:signup"]
+        self.assertEqual(signup["requests"], 1)
+        self.assertEqual(signup["statuses"], {"201": 1})
+        self.assertGreater(signup["queries"]["sum"], 0)
+        self.assertGreater(signup["serializer_seconds"]["sum"], 0)
+        self.assertEqual(routes["api:signin"]["statuses"], {"200": 1})
+
+    def test_metrics_endpoint_admin_only(self):
+        """Test only staff users can read the metrics."""
+        user = create_user(email="plain@example.com", password="testpass123")
+        self.client.force_authenticate(user=user)
+
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_metrics_endpoint(self):
+        """Test the metrics endpoint returns route histograms."""
+        admin = create_user(email="admin@example.com", password="testpass123", is_staff=True)
+        self.client.force_authenticate(user=admin)
+        self.client.get(reverse("api:users"))
+
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        users = res.data["routes"]["api:users"]
+        self.assertEqual(users["requests"], 1)
+        self.assertIn("+Inf", users["total_seconds"]["buckets"])
+        self.assertIn("db_connections", res.data)
+        self.assertIn("password_hashing", res.data)
+
+
+class SampleSerializer(serializers.Serializer):
+    name = serializers.CharField()
+
+
+class TimedSerializerTests(TestCase):
+    """Test serializer time is measured without changing the output."""
+
+    def test_single_and_many(self):
+        """Test both single and list serializers are timed."""
+        timed = timed_serializer(SampleSerializer)
+
+        self.assertIs(timed_serializer(SampleSerializer), timed)
+        self.assertEqual(timed({"name": "a"}).data, {"name": "a"})
+        many = timed([{"name": "a"}, {"name": "b"}], many=True)
+        self.assertEqual(many.__class__.__name__, "TimedListSerializer")
+        self.assertEqual(many.data, [{"name": "a"}, {"name": "b"}])
+
+    def test_no_request_context(self):
+        """Test timing outside a request is a no-op."""
+        self.assertIsNone(current_stats())
+        with serializer_timer():
+            pass
+
+
+class SlowRequestProfilingTests(TestCase):
+    """Test slow requests are written out for flame graphs."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def profiles(self):
+        return sorted(os.listdir(self.directory))
+
+    def test_sampler_writes_collapsed_stacks(self):
+        """Test the stack sampler writes frame;frame count lines."""
+        with self.settings(
+            PROFILE_SAMPLE_RATE=1, PROFILE_SLOW_REQUEST_MS=0, PROFILE_DIR=self.directory,
+            PROFILE_MODE="sampler", PROFILE_SAMPLER_INTERVAL_MS=0.1,
+        ):
+            self.client.get(reverse("api:users"))
+
+        [name] = self.profiles()
+        self.assertIn("api_users", name)
+        self.assertTrue(name.endswith(".folded"))
+        with open(os.path.join(self.directory, name)) as f:
+            for line in f:
+                stack, count = line.rsplit(" ", 1)
+                self.assertTrue(int(count) > 0)
+
+    def test_cprofile_writes_stats(self):
+        """Test cProfile mode writes pstats-loadable output."""
+        with self.settings(
+            PROFILE_SAMPLE_RATE=1, PROFILE_SLOW_REQUEST_MS=0, PROFILE_DIR=self.directory,
+            PROFILE_MODE="cprofile",
+        ):
+            self.client.get(reverse("api:users"))
+
+        [name] = self.profiles()
+        self.assertTrue(name.endswith(".prof"))
+        pstats.Stats(os.path.join(self.directory, name))
+
+    def test_fast_requests_are_not_written(self):
+        """Test requests under the threshold leave nothing behind."""
+        with self.settings(
+            PROFILE_SAMPLE_RATE=1, PROFILE_SLOW_REQUEST_MS=60_000, PROFILE_DIR=self.directory,
+        ):
+            self.client.get(reverse("api:users"))
+
+        self.assertEqual(self.profiles(), [])
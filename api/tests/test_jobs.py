@@ -0,0 +1,294 @@
+"""
+Tests for the background job queue and the run_workers command.
+"""
+
+import io
+import threading
+from datetime import timedelta
+from unittest import mock, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from api import jobs, search
+from api.models import Job, SearchDocument
+
+
+CALLS = []
+
+
+@jobs.task("tests.record")
+def record(value):
+    CALLS.append(value)
+
+
+@jobs.task("tests.flaky")
+def flaky():
+    raise RuntimeError("Try again")
+
+
+@jobs.task("tests.tick", every=30)
+def tick():
+    CALLS.append("tick")
+
+
+def create_user(**params):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(**params)
+
+
+def work():
+    # The connection holds the test's transaction; the check for broken or
+    # outdated connections between polls would close it.
+    with mock.patch("api.jobs.close_old_connections"):
+        return jobs.work(threading.Event(), burst=True)
+
+
+@override_settings(JOBS_EAGER=False, JOBS_RETRY_BASE_DELAY=10, JOBS_RETRY_MAX_DELAY=60)
+class JobQueueTests(TestCase):
+    """Test jobs are queued, claimed, retried and deduplicated."""
+
+    def setUp(self):
+        CALLS.clear()
+
+    def test_enqueue_only_inserts(self):
+        """Test a queued job waits for a worker."""
+        jobs.enqueue("tests.record", {"value": 1})
+
+        job = Job.objects.get()
+        self.assertEqual((job.task, job.kwargs, job.status), ("tests.record", {"value": 1}, Job.QUEUED))
+        self.assertEqual(CALLS, [])
+
+    def test_eager_runs_at_once(self):
+        """Test JOBS_EAGER runs the task instead of queueing it."""
+        with self.settings(JOBS_EAGER=True):
+            jobs.enqueue("tests.record", {"value": 1})
+
+        self.assertEqual(CALLS, [1])
+        self.assertFalse(Job.objects.exists())
+
+    def test_unknown_task_refused(self):
+        """Test only registered tasks can be queued."""
+        with self.assertRaises(ValueError):
+            jobs.enqueue("tests.missing")
+
+    def test_runs_by_priority_then_age(self):
+        """Test higher priorities run first, then older jobs."""
+        jobs.enqueue("tests.record", {"value": "low"})
+        jobs.enqueue("tests.record", {"value": "high"}, priority=10)
+        jobs.enqueue("tests.record", {"value": "later"})
+
+        self.assertEqual(work(), 3)
+        self.assertEqual(CALLS, ["high", "low", "later"])
+        self.assertFalse(Job.objects.exists())
+
+    def test_delayed_job_waits(self):
+        """Test a delayed job isn't claimed before its time."""
+        jobs.enqueue("tests.record", {"value": 1}, delay=60)
+
+        self.assertEqual(work(), 0)
+        self.assertEqual(Job.objects.get().status, Job.QUEUED)
+
+    def test_dedup_key_folds_queued_jobs(self):
+        """Test a key queues one job until a worker takes it."""
+        jobs.enqueue("tests.record", {"value": 1}, dedup_key="k")
+        jobs.enqueue("tests.record", {"value": 2}, dedup_key="k")
+        self.assertEqual(Job.objects.count(), 1)
+
+        jobs.claim(10)
+        jobs.enqueue("tests.record", {"value": 3}, dedup_key="k")
+
+        self.assertEqual(
+            sorted(Job.objects.values_list("status", flat=True)), [Job.QUEUED, Job.RUNNING]
+        )
+
+    def test_failure_retried_with_backoff(self):
+        """Test a failed job is queued again after a growing delay."""
+        jobs.enqueue("tests.flaky")
+
+        before = timezone.now()
+        with self.assertLogs("api.jobs", "ERROR"):
+            work()
+
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts), (Job.QUEUED, 1))
+        self.assertEqual(job.last_error, "RuntimeError: Try again")
+        self.assertGreaterEqual(job.run_at, before + timedelta(seconds=5))
+        self.assertLessEqual(job.run_at, timezone.now() + timedelta(seconds=10))
+
+        self.assertEqual(work(), 0)
+
+    def test_backoff_doubles_up_to_the_limit(self):
+        """Test the delay doubles per attempt and is capped."""
+        with mock.patch("api.jobs.random.uniform", return_value=1.0):
+            self.assertEqual([jobs.retry_delay(n) for n in (1, 2, 3, 4)], [10, 20, 40, 60])
+
+    def test_failed_after_max_attempts(self):
+        """Test a job out of attempts is kept as failed."""
+        jobs.enqueue("tests.flaky", max_attempts=1)
+
+        with self.assertLogs("api.jobs", "ERROR"):
+            work()
+
+        self.assertEqual(Job.objects.get().status, Job.FAILED)
+
+    @override_settings(JOBS_FAILED_RETENTION_DAYS=7)
+    def test_prune_failed(self):
+        """Test failed jobs are deleted once past the retention period."""
+        for value in (8, 6):
+            jobs.enqueue("tests.record", {"value": value}, delay=-value * 86400)
+        jobs.enqueue("tests.record", {"value": 9}, delay=-9 * 86400)
+        Job.objects.exclude(kwargs={"value": 9}).update(status=Job.FAILED)
+
+        self.assertEqual(jobs.prune_failed(), 1)
+        self.assertEqual(
+            sorted(Job.objects.values_list("kwargs__value", flat=True)), [6, 9]
+        )
+
+    def test_retry_yields_to_queued_duplicate(self):
+        """Test a failed job is dropped when its key was queued again meanwhile."""
+        jobs.enqueue("tests.flaky", dedup_key="k")
+        [job] = jobs.claim(10)
+        jobs.enqueue("tests.flaky", dedup_key="k")
+
+        with self.assertLogs("api.jobs", "ERROR"):
+            jobs.run(job)
+
+        self.assertEqual(list(Job.objects.values_list("attempts", flat=True)), [0])
+
+    def test_expired_lease_runs_again(self):
+        """Test a job whose worker vanished is queued again."""
+        jobs.enqueue("tests.record", {"value": 1})
+        jobs.claim(10)
+        Job.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+
+        with self.assertLogs("api.jobs", "WARNING"):
+            self.assertEqual(jobs.release_expired(), 1)
+        self.assertEqual(Job.objects.get().last_error, "Lease expired")
+
+    def test_only_the_claim_holder_finishes(self):
+        """Test a worker whose job was claimed again can't delete it."""
+        jobs.enqueue("tests.record", {"value": 1})
+        [job] = jobs.claim(10)
+        Job.objects.update(claim="other")
+
+        jobs.run(job)
+
+        self.assertEqual(CALLS, [1])
+        self.assertTrue(Job.objects.exists())
+
+    def test_periodic_task_queues_its_next_run(self):
+        """Test a periodic task is queued once and queues itself again after running."""
+        jobs.schedule_periodic()
+        jobs.schedule_periodic()
+        self.assertEqual(Job.objects.filter(task="tests.tick").count(), 1)
+
+        work()
+
+        self.assertEqual(CALLS, ["tick"])
+        job = Job.objects.get(task="tests.tick")
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=25))
+
+    def test_metrics(self):
+        """Test throughput, latency and queue depth are reported."""
+        completed = jobs.metrics.completed.value
+        jobs.enqueue("tests.record", {"value": 1})
+        jobs.enqueue("tests.record", {"value": 2}, delay=60)
+        self.assertEqual(jobs.queue_stats()["queued"], 2)
+
+        work()
+
+        self.assertEqual(jobs.metrics.completed.value, completed + 1)
+        self.assertEqual(jobs.queue_stats(), {"queued": 1, "running": 0, "failed": 0, "oldest_ready_age": 0.0})
+
+
+@override_settings(JOBS_EAGER=False)
+class SearchIndexJobTests(TestCase):
+    """Test saves queue their search document instead of writing it."""
+
+    def test_saves_share_one_job(self):
+        """Test repeated saves are indexed once by a worker."""
+        user = create_user(email="alice@example.com", username="alice")
+        user.firstName = "Alice"
+        user.save()
+
+        job = Job.objects.get()
+        self.assertEqual(job.dedup_key, f"search.index:user:{user.pk}")
+        self.assertFalse(SearchDocument.objects.exists())
+
+        work()
+
+        self.assertEqual(SearchDocument.objects.get(kind="user", object_id=user.pk).body, "Alice")
+
+    def test_deleted_object_removed(self):
+        """Test a job for an object deleted since leaves no document."""
+        SearchDocument.objects.create(kind="user", object_id=123456, title="gone")
+
+        search.index_document("user", 123456)
+
+        self.assertFalse(SearchDocument.objects.exists())
+
+
+@override_settings(JOBS_EAGER=False)
+class RunWorkersCommandTests(TransactionTestCase):
+    """Test the run_workers command drains the queue."""
+
+    def setUp(self):
+        CALLS.clear()
+
+    def run_workers(self, *args):
+        out = io.StringIO()
+        call_command("run_workers", "--burst", *args, stdout=out)
+        return out.getvalue()
+
+    def test_burst(self):
+        """Test every ready job runs before the command exits."""
+        for value in range(5):
+            jobs.enqueue("tests.record", {"value": value})
+
+        out = self.run_workers("--batch-size", "2")
+
+        self.assertEqual(sorted(CALLS), list(range(5)))
+        self.assertIn("Ran 5 jobs", out)
+        self.assertIn("Jobs: ", out)
+
+    @skipUnless(connection.vendor == "postgresql", "SKIP LOCKED needs Postgres.")
+    def test_threads_share_the_queue(self):
+        """Test concurrent workers run every job once."""
+        for value in range(40):
+            jobs.enqueue("tests.record", {"value": value})
+
+        self.run_workers("--threads", "4", "--batch-size", "3")
+
+        self.assertEqual(sorted(CALLS), list(range(40)))
+        self.assertFalse(Job.objects.exists())
+
+    @skipUnless(connection.vendor == "postgresql", "SKIP LOCKED needs Postgres.")
+    def test_claim_skips_locked_jobs(self):
+        """Test a worker passes over rows another one has locked."""
+        jobs.enqueue("tests.record", {"value": 1})
+        jobs.enqueue("tests.record", {"value": 2})
+        first = Job.objects.order_by("pk").first()
+        locked, release = threading.Event(), threading.Event()
+
+        def hold():
+            with transaction.atomic():
+                Job.objects.select_for_update().get(pk=first.pk)
+                locked.set()
+                release.wait(5)
+            connection.close()
+
+        holder = threading.Thread(target=hold)
+        holder.start()
+        locked.wait(5)
+        try:
+            claimed = jobs.claim(10)
+        finally:
+            release.set()
+            holder.join()
+
+        self.assertEqual([job.kwargs for job in claimed], [{"value": 2}])
@@ -0,0 +1,279 @@
+"""
+Query and CPU budgets for every API and accounts endpoint.
+
+See ``api/tests/budgets.py``. The CPU budgets leave roughly 2x headroom
+over a 1-core CI runner; scale them with ``BUDGET_CPU_SCALE`` elsewhere.
+"""
+
+import tempfile
+from urllib.parse import urlsplit
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from accounts import urls as accounts_urls
+from accounts.factories import DEFAULT_PASSWORD
+from api import urls as api_urls
+from api.models import Comment, Community, Follow, Post
+from api.tokens import ClaimsRefreshToken
+
+from .budgets import Budget, BudgetTestCase, with_budget_tests
+
+
+def create_user(**params):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(**params)
+
+
+def bearer(user):
+    return {"Authorization": f"Bearer {ClaimsRefreshToken.for_user(user).access_token}"}
+
+
+def fresh_user(test, run, **params):
+    """Create a user only this run touches."""
+    return create_user(
+        email=f"{test._testMethodName}-{run}@example.com",
+        username=f"{test._testMethodName[-20:]}-{run}",
+        password=DEFAULT_PASSWORD,
+        **params,
+    )
+
+
+def as_user(test, run):
+    return {"headers": bearer(test.user)}
+
+
+def as_admin(test, run):
+    return {"headers": bearer(test.admin)}
+
+
+def as_fresh_user(test, run):
+    return {"headers": bearer(fresh_user(test, run))}
+
+
+def signup(test, run):
+    return {
+        "data": {"email": f"new{run}@example.com", "password": "testpass123", "username": f"new{run}"},
+        "format": "json",
+    }
+
+
+def signin(test, run):
+    return {"data": {"email": test.user.email, "password": DEFAULT_PASSWORD}, "format": "json"}
+
+
+def refresh(test, run):
+    return {"data": {"refresh": str(ClaimsRefreshToken.for_user(test.user))}, "format": "json"}
+
+
+def logout(test, run):
+    user = fresh_user(test, run)
+    return {"data": {"refresh": str(ClaimsRefreshToken.for_user(user))}, "format": "json", "headers": bearer(user)}
+
+
+def change_password(test, run):
+    user = fresh_user(test, run)
+    return {
+        "data": {"old_password": DEFAULT_PASSWORD, "new_password": "changed-pass-123"},
+        "format": "json",
+        "headers": bearer(user),
+    }
+
+
+def follow(test, run):
+    return {"args": [fresh_user(test, run).username], **as_user(test, run)}
+
+
+def unfollow(test, run):
+    followee = fresh_user(test, run)
+    Follow.objects.follow(test.user.pk, followee.pk)
+    return {"args": [followee.username], **as_user(test, run)}
+
+
+def own_graph(test, run):
+    return {"args": [test.user.username], **as_user(test, run)}
+
+
+def community(test, run):
+    return {"args": [test.community.name]}
+
+
+def create_community(test, run):
+    return {"data": {"name": f"budget_{run}", "title": "Budget"}, "format": "json", **as_user(test, run)}
+
+
+def create_post(test, run):
+    return {"data": {"community": test.community.name, "title": f"Post {run}"}, "format": "json", **as_user(test, run)}
+
+
+def post_detail(test, run):
+    return {"args": [test.post.pk]}
+
+
+def comment_thread(test, run):
+    return {"args": [test.post.pk], "query": "?sort=score"}
+
+
+def reply(test, run):
+    data = {"body": "Reply", "parent": test.comment.pk}
+    return {"args": [test.post.pk], "data": data, "format": "json", **as_user(test, run)}
+
+
+def search_content(test, run):
+    return {"query": "?q=budget", **as_user(test, run)}
+
+
+def vote_post(test, run):
+    return {"args": [test.post.pk], "data": {"value": 1}, "format": "json", **as_fresh_user(test, run)}
+
+
+def vote_comment(test, run):
+    return {"args": [test.comment.pk], "data": {"value": -1}, "format": "json", **as_fresh_user(test, run)}
+
+
+def top_feed(test, run):
+    return {"query": "?sort=top"}
+
+
+def patch_profile(test, run):
+    return {"data": {"firstName": f"Run{run}"}, "format": "json", **as_user(test, run)}
+
+
+def search_users(test, run):
+    return {"query": "?search=seed00421&search_mode=prefix", **as_user(test, run)}
+
+
+def next_page(test, run):
+    """Follow the first page's cursor, as a client scrolling would."""
+    headers = bearer(test.user)
+    first = test.client.get(reverse("api:users") + "?ordering=username", headers=headers)
+    return {"query": "?" + urlsplit(first.data["next"]).query, "headers": headers}
+
+
+def form_login(test, run):
+    return {"data": {"username": test.user.email, "password": DEFAULT_PASSWORD}}
+
+
+def form_logout(test, run):
+    test.client.force_login(fresh_user(test, run))
+    return {}
+
+
+def form_register(test, run):
+    return {
+        "data": {
+            "email": f"form{run}@example.com",
+            "username": f"form{run}",
+            "password1": "testpass123",
+            "password2": "testpass123",
+            "profile_image": SimpleUploadedFile("avatar.png", b"\x89PNG\r\n\x1a\n", content_type="image/png"),
+        },
+    }
+
+
+BUDGETS = [
+    # Every write to a user, community or post also queues a job to
+    # reindex its search document (api/search.py).
+    Budget("api:signup", "post", max_queries=4, max_cpu_ms=15, status=201, request=signup),
+    Budget("api:signin", "post", max_queries=1, max_cpu_ms=15, request=signin),
+    # The user's is_active flag and token generation, when not cached.
+    Budget("api:refresh", "post", max_queries=1, max_cpu_ms=10, request=refresh),
+    Budget("api:logout", "post", max_queries=1, max_cpu_ms=10, status=204, request=logout),
+    Budget("api:change-password", "post", max_queries=2, max_cpu_ms=15, request=change_password),
+    Budget("api:profile", max_queries=1, max_cpu_ms=10, request=as_user),
+    Budget("api:profile", "patch", max_queries=3, max_cpu_ms=15, request=patch_profile),
+    # Releasing follow counts reads both edge ranges before the cascade;
+    # the user's communities, posts, comments and votes are kept, unattributed.
+    Budget("api:profile", "delete", max_queries=14, max_cpu_ms=15, status=204, request=as_fresh_user),
+    # Listings include the pg_class row estimate on Postgres.
+    Budget("api:users", max_queries=3, max_cpu_ms=15, request=as_user),
+    Budget("api:users", max_queries=2, max_cpu_ms=30, label="api_users_search", request=search_users),
+    Budget("api:users", max_queries=3, max_cpu_ms=15, label="api_users_next_page", request=next_page),
+    Budget("api:user-detail", max_queries=2, max_cpu_ms=10, request=own_graph),
+    Budget("api:follow", "post", max_queries=4, max_cpu_ms=10, status=201, request=follow),
+    Budget("api:follow", "delete", max_queries=4, max_cpu_ms=10, status=204, request=unfollow),
+    Budget("api:followers", max_queries=3, max_cpu_ms=15, request=own_graph),
+    Budget("api:following", max_queries=3, max_cpu_ms=15, request=own_graph),
+    Budget("api:mutuals", max_queries=3, max_cpu_ms=15, request=own_graph),
+    Budget("api:communities", max_queries=1, max_cpu_ms=10),
+    # The response reads the creator/author back by id.
+    Budget("api:communities", "post", max_queries=5, max_cpu_ms=10, status=201, request=create_community),
+    Budget("api:community-detail", max_queries=1, max_cpu_ms=10, request=community),
+    Budget("api:community-posts", max_queries=2, max_cpu_ms=20, request=community),
+    Budget("api:feed", max_queries=1, max_cpu_ms=20),
+    Budget("api:feed", max_queries=1, max_cpu_ms=20, label="api_feed_top", request=top_feed),
+    Budget("api:posts", "post", max_queries=5, max_cpu_ms=15, status=201, request=create_post),
+    Budget("api:post-detail", max_queries=1, max_cpu_ms=10, request=post_detail),
+    # The post's existence and one range scan for the whole thread.
+    Budget("api:post-comments", max_queries=2, max_cpu_ms=20, request=comment_thread),
+    # The parent's path, both counters and the path once the id is known.
+    Budget("api:post-comments", "post", max_queries=8, max_cpu_ms=15, status=201, request=reply),
+    # The target's existence and the voter's row only; counters are batched.
+    Budget("api:post-vote", "post", max_queries=6, max_cpu_ms=10, request=vote_post),
+    Budget("api:comment-vote", "post", max_queries=6, max_cpu_ms=10, request=vote_comment),
+    # The user's state and one ranked query on Postgres; elsewhere the
+    # index's staleness check, and a rebuild of it on the first run.
+    Budget("api:search", max_queries=3, max_cpu_ms=20, request=search_content),
+    # The user's state, the live jobs and the failed ones, each through its index.
+    Budget("api:metrics", max_queries=3, max_cpu_ms=15, request=as_admin),
+    Budget("api:async-signup", "post", max_queries=4, max_cpu_ms=15, status=201, request=signup),
+    Budget("api:async-signin", "post", max_queries=1, max_cpu_ms=15, request=signin),
+    Budget("api:async-refresh", "post", max_queries=1, max_cpu_ms=10, request=refresh),
+    Budget("api:async-profile", max_queries=2, max_cpu_ms=15, request=as_user),
+    Budget("accounts:login", "post", max_queries=5, max_cpu_ms=15, status=302, request=form_login),
+    Budget("accounts:logout", "post", max_queries=4, max_cpu_ms=10, status=302, request=form_logout),
+    Budget("accounts:register", "post", max_queries=4, max_cpu_ms=20, status=302, request=form_register),
+]
+
+
+@with_budget_tests
+class EndpointBudgetTests(BudgetTestCase):
+    """Test every endpoint stays within its query and CPU budget."""
+    budgets = BUDGETS
+
+    @classmethod
+    def setUpClass(cls):
+        media = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(media.cleanup)
+        cls.enterClassContext(override_settings(MEDIA_ROOT=media.name))
+        super().setUpClass()
+        # Requests are measured as in production, where their jobs are
+        # queued, not run; the data from setUpTestData is indexed already.
+        cls.enterClassContext(override_settings(JOBS_EAGER=False))
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user = create_user(email="budget@example.com", username="budget", password=DEFAULT_PASSWORD)
+        cls.admin = create_user(
+            email="budget-admin@example.com", username="budget-admin", password=DEFAULT_PASSWORD, is_staff=True
+        )
+        cls.community = Community.objects.create(name="budget", title="Budget", creator=cls.user)
+        Post.objects.bulk_create(
+            Post(community=cls.community, author_id=pk, title=f"Seeded post {pk}", hot=pk)
+            for pk in get_user_model().objects.values_list("pk", flat=True)[:200]
+        )
+        cls.post = Post.objects.filter(community=cls.community).first()
+        cls.comment = Comment.objects.add(cls.post.pk, cls.user.pk, "Budget")
+        for i in range(50):
+            Comment.objects.add(cls.post.pk, cls.user.pk, f"Reply {i}", parent_id=cls.comment.pk if i % 2 else None)
+        # A page of follow edges either way among the seeded users.
+        seeded = get_user_model().objects.filter(username__startswith="seed").values_list("pk", flat=True)[:100]
+        for i, pk in enumerate(seeded):
+            Follow.objects.follow(pk, cls.user.pk)
+            if i % 2:
+                Follow.objects.follow(cls.user.pk, pk)
+
+
+class BudgetCoverageTests(SimpleTestCase):
+    """Test no endpoint is left without a budget."""
+
+    def test_every_named_url_has_a_budget(self):
+        """Test each named URL in the api and accounts apps is budgeted."""
+        budgeted = {budget.url_name for budget in BUDGETS}
+        for namespace, module in (("api", api_urls), ("accounts", accounts_urls)):
+            for pattern in module.urlpatterns:
+                if pattern.name:
+                    self.assertIn(f"{namespace}:{pattern.name}", budgeted)
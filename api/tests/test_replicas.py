@@ -0,0 +1,182 @@
+"""
+Tests for read replica routing.
+
+``standby`` (see reddit_clone/test_runner.py) is a separate database that
+stands in for a replica: rows written to the primary only are the writes it
+has not replayed yet.
+"""
+
+import time
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, router
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from api.tokens import ClaimsRefreshToken
+from reddit_clone import replicas
+from reddit_clone.db import replica_databases
+
+
+USERS_URL = reverse("api:users")
+PROFILE_URL = reverse("api:profile")
+
+
+def create_user(**params):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(**params)
+
+
+def access_token(user, signed_in_at):
+    refresh = ClaimsRefreshToken.for_user(user)
+    refresh[replicas.PIN_CLAIM] = signed_in_at
+    return str(refresh.access_token)
+
+
+class ReplicaSettingsTests(SimpleTestCase):
+    """Test replica aliases are built from the environment."""
+
+    def test_replica_hosts(self):
+        """Test each host becomes a test mirror of the primary."""
+        primary = {"NAME": "reddit", "HOST": "primary", "PORT": "5432", "OPTIONS": {"pool": {"max_size": 4}}}
+
+        databases = replica_databases(primary, {"DB_REPLICA_HOSTS": "replica-a, replica-b:5433"})
+
+        self.assertEqual(list(databases), ["replica1", "replica2"])
+        self.assertEqual((databases["replica1"]["HOST"], databases["replica1"]["PORT"]), ("replica-a", "5432"))
+        self.assertEqual((databases["replica2"]["HOST"], databases["replica2"]["PORT"]), ("replica-b", "5433"))
+        self.assertEqual(databases["replica2"]["NAME"], "reddit")
+        self.assertEqual(databases["replica1"]["TEST"], {"MIRROR": "default"})
+        self.assertIsNot(databases["replica1"]["OPTIONS"], primary["OPTIONS"])
+
+    def test_no_replicas(self):
+        """Test there are no replicas unless hosts are given."""
+        self.assertEqual(replica_databases({"HOST": "primary"}, {}), {})
+
+
+@override_settings(DATABASE_REPLICAS=["standby"])
+class ReplicaRouterTests(SimpleTestCase):
+    """Test the router outside requests."""
+
+    def test_outside_requests_reads_use_primary(self):
+        """Test commands and workers read from the primary."""
+        self.assertEqual(router.db_for_read(get_user_model()), "default")
+        self.assertEqual(router.db_for_write(get_user_model()), "default")
+
+    def test_replicas_are_not_migrated(self):
+        """Test migrations only run on the primary."""
+        self.assertFalse(router.allow_migrate("standby", "api"))
+        self.assertTrue(router.allow_migrate("default", "api"))
+
+    def test_relations_across_replicas(self):
+        """Test rows read from a replica can be related to primary rows."""
+        user, other = get_user_model()(), get_user_model()()
+        user._state.db, other._state.db = "standby", "default"
+
+        self.assertTrue(router.allow_relation(user, other))
+
+
+@override_settings(DATABASE_REPLICAS=["standby"], REPLICA_LAG_CHECK_INTERVAL=60)
+class ReadReplicaMiddlewareTests(TestCase):
+    """Test requests read from the replica unless the client just wrote."""
+
+    databases = {"default", "standby"}
+
+    def setUp(self):
+        cache.clear()
+        replicas.monitor.reset()
+        # A second behind: within the allowed lag, but short of any write
+        # made during the test.
+        replicas.monitor.record("standby", 1.0)
+        self.user = create_user(email="me@example.com", password="testpass123", username="me", firstName="Fresh")
+        # The replica has the user from before the last change.
+        User = get_user_model()
+        User.objects.using("standby").bulk_create(
+            [User(pk=self.user.pk, email="me@example.com", username="me", firstName="Stale")]
+        )
+        self.client = APIClient()
+        self.signed_in(time.time() - 3600)
+
+    def signed_in(self, at):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access_token(self.user, at)}")
+
+    def first_names(self):
+        res = self.client.get(USERS_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [row["firstName"] for row in res.data["results"]]
+
+    def test_safe_requests_read_from_replica(self):
+        """Test a listing is served from the replica."""
+        self.assertEqual(self.first_names(), ["Stale"])
+
+    def test_write_pins_client_to_primary(self):
+        """Test a client reads its own write right after it."""
+        res = self.client.patch(PROFILE_URL, {"firstName": "Patched"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn(settings.REPLICA_PIN_COOKIE, res.cookies)
+        self.assertEqual(self.first_names(), ["Patched"])
+
+    def test_pin_expires(self):
+        """Test the client goes back to the replica after the pin window."""
+        self.client.patch(PROFILE_URL, {"firstName": "Patched"})
+
+        with override_settings(REPLICA_PIN_SECONDS=0):
+            self.assertEqual(self.first_names(), ["Stale"])
+
+    def test_failed_write_does_not_pin(self):
+        """Test a rejected write leaves the client on the replica."""
+        res = self.client.patch(PROFILE_URL, {"email": "not an email"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE, res.cookies)
+
+    def test_caught_up_replica_keeps_pin(self):
+        """Test a replica measured as current doesn't end the pin early."""
+        # No lag measured says nothing of WAL the replica hasn't received.
+        self.client.patch(PROFILE_URL, {"firstName": "Patched"})
+        replicas.monitor.record("standby", 0.0, checked_at=time.time() + 1)
+
+        self.assertEqual(self.first_names(), ["Patched"])
+
+    def test_sign_in_claim_pins_client(self):
+        """Test a fresh token pins a client that keeps no cookies."""
+        self.signed_in(time.time())
+
+        self.assertEqual(self.first_names(), ["Fresh"])
+
+    def test_lagging_replica_falls_back_to_primary(self):
+        """Test a replica further behind than allowed is skipped."""
+        replicas.monitor.record("standby", 60.0)
+        fallbacks = replicas.metrics.fallback_reads.value
+
+        self.assertEqual(self.first_names(), ["Fresh"])
+        self.assertEqual(replicas.metrics.fallback_reads.value, fallbacks + 1)
+
+    def test_unreachable_replica_falls_back_to_primary(self):
+        """Test a replica that can't be measured is skipped."""
+        replicas.monitor.reset()
+        with mock.patch("reddit_clone.replicas.probe_lag", return_value=None):
+            self.assertEqual(self.first_names(), ["Fresh"])
+
+    @skipUnless(connection.vendor == "postgresql", "Replication lag is only measured on Postgres.")
+    def test_primary_server_measures_current(self):
+        """Test a server not in recovery is measured as not lagging."""
+        replicas.monitor.reset()
+
+        checked_at, lag = replicas.monitor.check("standby")
+
+        self.assertEqual(lag, 0.0)
+
+    def test_cache_kept_briefly_for_replica_reads(self):
+        """Test responses read from a replica are cached for at most the allowed lag."""
+        with mock.patch("api.cache.cache.set") as cache_set, override_settings(REPLICA_MAX_LAG_SECONDS=2):
+            self.first_names()
+
+        self.assertIn(mock.call(mock.ANY, mock.ANY, 2), cache_set.call_args_list)
@@ -0,0 +1,243 @@
+"""
+Tests for refresh token rotation and revocation.
+"""
+
+import time
+import uuid
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from api.revocation import BloomFilter, UsedTokenStore, used_tokens
+from api.tokens import ClaimsRefreshToken
+
+
+REFRESH_URL = reverse("api:refresh")
+ASYNC_REFRESH_URL = reverse("api:async-refresh")
+LOGOUT_URL = reverse("api:logout")
+CHANGE_PASSWORD_URL = reverse("api:change-password")
+PROFILE_URL = reverse("api:profile")
+USERS_URL = reverse("api:users")
+
+
+def create_user(**params):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(**params)
+
+
+def digest(n):
+    return uuid.UUID(int=n).bytes + bytes(4)
+
+
+class BloomFilterTests(SimpleTestCase):
+    """Test the Bloom filter and the used token store."""
+
+    def test_add_and_contains(self):
+        """Test added items are found and reported once."""
+        bloom = BloomFilter(*BloomFilter.sizing(100, 1e-6))
+        self.assertTrue(bloom.add(digest(1)))
+
+        self.assertFalse(bloom.add(digest(1)))
+        self.assertIn(digest(1), bloom)
+        self.assertNotIn(digest(2), bloom)
+
+    def test_false_positive_rate(self):
+        """Test a full filter stays near the configured error rate."""
+        size, hash_count = BloomFilter.sizing(2000, 0.01)
+        bloom = BloomFilter(size, hash_count)
+        for _ in range(2000):
+            bloom.add(uuid.uuid4().bytes + bytes(4))
+
+        false_positives = sum(uuid.uuid4().bytes + bytes(4) in bloom for _ in range(10_000))
+
+        self.assertLess(false_positives / 10_000, 0.02)
+
+    def test_store_marks_once(self):
+        """Test a token id is accepted once per store."""
+        cache.clear()
+        store = UsedTokenStore(bucket_seconds=3600, capacity=1000, error_rate=1e-6, shards=4)
+        exp = time.time() + 3600
+
+        self.assertTrue(store.mark_used("a", exp))
+        self.assertFalse(store.mark_used("a", exp))
+        self.assertTrue(store.is_used("a", exp))
+        self.assertFalse(store.is_used("b", exp))
+
+    def test_store_buckets_by_expiry(self):
+        """Test tokens expiring in different buckets use separate keys."""
+        store = UsedTokenStore(bucket_seconds=3600, capacity=1000, error_rate=1e-6, shards=4)
+
+        first, timeout, _ = store.locate("a", 3600 * 10)
+        second, _, _ = store.locate("a", 3600 * 11)
+
+        self.assertNotEqual(first, second)
+        self.assertLessEqual(timeout, 60)
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"], PASSWORD_HASHING_WORKERS=0)
+class TokenRevocationTests(TestCase):
+    """Test rotation, reuse detection, logout and password changes."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user(email="test@example.com", password="testpass123", username="test")
+        self.client = APIClient()
+
+    def refresh(self, token, url=REFRESH_URL):
+        return self.client.post(url, {"refresh": str(token)}, format="json")
+
+    def get(self, url, access):
+        return self.client.get(url, headers={"Authorization": f"Bearer {access}"})
+
+    def test_refresh_rotates(self):
+        """Test a refresh returns a new refresh token, which works in turn."""
+        res = self.refresh(ClaimsRefreshToken.for_user(self.user))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(AccessToken(res.data["access"])["gen"], 0)
+        self.assertEqual(self.refresh(res.data["refresh"]).status_code, status.HTTP_200_OK)
+
+    def test_refresh_reissues_current_claims(self):
+        """Test rotated tokens carry the user's fields as they are now."""
+        refresh = ClaimsRefreshToken.for_user(self.user)
+        self.user.username = "renamed"
+        self.user.is_staff = True
+        self.user.save()
+
+        res = self.refresh(refresh)
+
+        access = AccessToken(res.data["access"])
+        self.assertEqual((access["username"], access["is_staff"]), ("renamed", True))
+        self.assertEqual(ClaimsRefreshToken(res.data["refresh"])["pin"], refresh["pin"])
+
+    def test_reuse_revokes_all_tokens(self):
+        """Test presenting a consumed refresh token signs out every session."""
+        stolen = ClaimsRefreshToken.for_user(self.user)
+        other_session = ClaimsRefreshToken.for_user(self.user)
+        rotated = self.refresh(stolen).data
+
+        res = self.refresh(stolen)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.refresh(rotated["refresh"]).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.refresh(other_session).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.get(PROFILE_URL, rotated["access"]).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.get(USERS_URL, rotated["access"]).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_async_refresh_rotates(self):
+        """Test the async refresh view shares the store."""
+        token = str(ClaimsRefreshToken.for_user(self.user))
+        payload = {"refresh": token}
+
+        res = await self.async_client.post(ASYNC_REFRESH_URL, payload, content_type="application/json")
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn("refresh", res.json())
+
+        res = await self.async_client.post(ASYNC_REFRESH_URL, payload, content_type="application/json")
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_logout(self):
+        """Test logging out consumes the refresh token only."""
+        refresh = ClaimsRefreshToken.for_user(self.user)
+        other_session = ClaimsRefreshToken.for_user(self.user)
+
+        res = self.client.post(
+            LOGOUT_URL,
+            {"refresh": str(refresh)},
+            format="json",
+            headers={"Authorization": f"Bearer {refresh.access_token}"},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.refresh(other_session).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.refresh(refresh).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_logout_all(self):
+        """Test logging out everywhere revokes every token with one update."""
+        refresh = ClaimsRefreshToken.for_user(self.user)
+        other_session = ClaimsRefreshToken.for_user(self.user)
+
+        res = self.client.post(
+            LOGOUT_URL,
+            {"refresh": str(refresh), "all": True},
+            format="json",
+            headers={"Authorization": f"Bearer {refresh.access_token}"},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.refresh(other_session).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(
+            self.get(USERS_URL, other_session.access_token).status_code, status.HTTP_401_UNAUTHORIZED
+        )
+
+    def test_logout_other_users_token(self):
+        """Test a user cannot revoke someone else's refresh token."""
+        other = create_user(email="other@example.com", password="testpass123", username="other")
+        refresh = ClaimsRefreshToken.for_user(other)
+
+        res = self.client.post(
+            LOGOUT_URL,
+            {"refresh": str(refresh)},
+            format="json",
+            headers={"Authorization": f"Bearer {ClaimsRefreshToken.for_user(self.user).access_token}"},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(used_tokens.is_used(refresh["jti"], refresh["exp"]))
+
+    def test_change_password(self):
+        """Test a password change revokes old tokens and returns a working pair."""
+        old = ClaimsRefreshToken.for_user(self.user)
+
+        res = self.client.post(
+            CHANGE_PASSWORD_URL,
+            {"old_password": "testpass123", "new_password": "newpass123"},
+            format="json",
+            headers={"Authorization": f"Bearer {old.access_token}"},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password("newpass123"))
+        self.assertEqual(self.get(PROFILE_URL, old.access_token).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.refresh(old).status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.get(PROFILE_URL, res.data["access"]).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.refresh(res.data["refresh"]).status_code, status.HTTP_200_OK)
+
+    def test_change_password_wrong_old_password(self):
+        """Test the current password is required."""
+        access = ClaimsRefreshToken.for_user(self.user).access_token
+
+        res = self.client.post(
+            CHANGE_PASSWORD_URL,
+            {"old_password": "wrong-pass", "new_password": "newpass123"},
+            format="json",
+            headers={"Authorization": f"Bearer {access}"},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.get(PROFILE_URL, access).status_code, status.HTTP_200_OK)
+
+    def test_hash_upgrade_keeps_tokens(self):
+        """Test rehashing the same password on login does not sign anyone out."""
+        with mock.patch("accounts.hashing.verify_password", return_value=(True, True)):
+            self.assertTrue(self.user.check_password("testpass123"))
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.token_generation, 0)
+
+    def test_tokens_without_generation(self):
+        """Test tokens issued before generations existed stay valid until a revocation."""
+        legacy = RefreshToken.for_user(self.user)
+
+        self.assertEqual(self.refresh(legacy).status_code, status.HTTP_200_OK)
+        self.user.set_password("newpass123")
+        self.user.save()
+        self.assertEqual(self.get(PROFILE_URL, legacy.access_token).status_code, status.HTTP_401_UNAUTHORIZED)
@@ -0,0 +1,101 @@
+"""
+Tests for serving the precomputed OpenAPI schema.
+"""
+
+import io
+import json
+import tempfile
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+
+from api.schema import load_schema
+
+
+SCHEMA_URL = reverse("schema")
+
+
+class PrecomputedSchemaTests(TestCase):
+    """Test /api-schema/ serves the generated files."""
+
+    def setUp(self):
+        schema_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(schema_dir.cleanup)
+        settings_override = override_settings(API_SCHEMA_DIR=schema_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        load_schema.cache_clear()
+        self.addCleanup(load_schema.cache_clear)
+
+    def generate(self):
+        call_command("generate_schema", stdout=io.StringIO())
+        load_schema.cache_clear()
+
+    def test_serves_generated_json_with_etag(self):
+        """Test the JSON schema comes from the file with a strong ETag."""
+        self.generate()
+
+        res = self.client.get(SCHEMA_URL, {"format": "json"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn("/api/register", json.loads(res.content)["paths"])
+        self.assertTrue(res["ETag"].startswith('"'))
+
+    def test_if_none_match_returns_not_modified(self):
+        """Test a matching ETag is answered with 304."""
+        self.generate()
+        etag = self.client.get(SCHEMA_URL)["ETag"]
+
+        res = self.client.get(SCHEMA_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res.content, b"")
+
+    def test_yaml_and_json_have_different_etags(self):
+        """Test each format is cached under its own validator."""
+        self.generate()
+
+        yaml_res = self.client.get(SCHEMA_URL, HTTP_ACCEPT="application/vnd.oai.openapi")
+        json_res = self.client.get(SCHEMA_URL, HTTP_ACCEPT="application/vnd.oai.openapi+json")
+
+        self.assertTrue(yaml_res.content.startswith(b"openapi:"))
+        self.assertNotEqual(yaml_res["ETag"], json_res["ETag"])
+
+    def test_missing_schema_generated_live(self):
+        """Test a missing file falls back to live generation."""
+        with self.assertLogs("api.schema", "WARNING"):
+            res = self.client.get(SCHEMA_URL, {"format": "json"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn("/api/register", json.loads(res.content)["paths"])
+        self.assertNotIn("ETag", res)
+
+    def test_schema_generated_later_is_served(self):
+        """Test a missing file isn't remembered once it has been generated."""
+        with self.assertLogs("api.schema", "WARNING"):
+            self.client.get(SCHEMA_URL)
+        call_command("generate_schema", stdout=io.StringIO())
+
+        res = self.client.get(SCHEMA_URL)
+
+        self.assertIn("ETag", res)
+
+    @override_settings(DEBUG=True)
+    def test_debug_generates_live(self):
+        """Test DEBUG always builds the current schema."""
+        res = self.client.get(SCHEMA_URL, {"format": "json"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn("ETag", res)
+
+    @override_settings(DEBUG=True)
+    def test_view_mixins_do_not_describe_endpoints(self):
+        """Test the shared view mixins' docstrings stay out of the schema."""
+        paths = json.loads(self.client.get(SCHEMA_URL, {"format": "json"}).content)["paths"]
+
+        self.assertNotIn("description", paths["/api/users"]["get"])
+        self.assertNotIn("description", paths["/api/profile"]["get"])
+        self.assertIn("refresh", paths["/api/refresh"]["post"]["description"])
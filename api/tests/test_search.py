@@ -0,0 +1,94 @@
+"""
+Tests for searching the user listing.
+"""
+
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from api.filters import UserSearchFilter
+
+
+USERS_URL = reverse("api:users")
+
+
+class UserSearchTests(TestCase):
+    """Test the search modes of the user listing."""
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        User.objects.bulk_create(
+            [
+                User(email="alice@example.com", username="Alice"),
+                User(email="malice@example.com", username="Malice"),
+                User(email="bob@alice.org", username="Bob"),
+            ]
+        )
+        cls.user = User.objects.get(username="Bob")
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def search(self, term, mode=None):
+        params = {"search": term}
+        if mode:
+            params["search_mode"] = mode
+        res = self.client.get(USERS_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return sorted(row["username"] for row in res.data["results"])
+
+    def test_substring_is_default(self):
+        """Test substring matching across username and email."""
+        self.assertEqual(self.search("alice"), ["Alice", "Bob", "Malice"])
+
+    def test_prefix_mode(self):
+        """Test prefix matching is case-insensitive and anchored."""
+        self.assertEqual(self.search("ali", "prefix"), ["Alice"])
+
+    def test_exact_mode(self):
+        """Test exact matching ignores case."""
+        self.assertEqual(self.search("MALICE", "exact"), ["Malice"])
+
+    def test_invalid_mode_rejected(self):
+        """Test an unknown search mode is a client error."""
+        res = self.client.get(USERS_URL, {"search": "a", "search_mode": "fuzzy"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@skipUnless(connection.vendor == "postgresql", "Search indexes are Postgres-only.")
+class UserSearchQueryPlanTests(TestCase):
+    """Test the search lookups are served by the search indexes."""
+
+    def plan(self, mode, term):
+        search = UserSearchFilter()
+        search.search_mode = mode
+        lookup = search.construct_search("username", get_user_model().objects.all())
+        queryset = get_user_model().objects.filter(**{lookup: term})
+        with connection.cursor() as cursor:
+            # Tiny test tables would otherwise always be scanned sequentially.
+            cursor.execute("SET LOCAL enable_seqscan = off")
+        return queryset.explain()
+
+    def test_substring_uses_trigram_index(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            if cursor.fetchone() is None:
+                self.skipTest("pg_trgm is not installed on this server.")
+        self.assertIn("accounts_customuser_username_trgm", self.plan("substring", "lic"))
+
+    def test_prefix_uses_pattern_index(self):
+        self.assertIn("accounts_customuser_username_prefix", self.plan("prefix", "ali"))
+
+    def test_exact_uses_pattern_index(self):
+        self.assertIn("accounts_customuser_username_prefix", self.plan("exact", "alice"))
@@ -0,0 +1,138 @@
+"""
+Tests for the static asset pipeline and the Vite manifest tags.
+"""
+
+import json
+import os
+import tempfile
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.template import Context, Template
+from django.templatetags.static import static
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+
+MANIFEST = {
+    "index.html": {
+        "file": "assets/index-abc12345.js",
+        "isEntry": True,
+        "imports": ["_vendor-def67890.js"],
+        "css": ["assets/index-11112222.css"],
+    },
+    "_vendor-def67890.js": {"file": "assets/vendor-def67890.js", "css": ["assets/vendor-33334444.css"]},
+    "src/views/Login.vue": {"file": "assets/Login-55556666.js", "isDynamicEntry": True},
+}
+
+
+def write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+
+
+class ViteAssetsTagTests(SimpleTestCase):
+    """Test the entry point tags rendered from the Vite manifest."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.manifest_path = os.path.join(directory.name, "manifest.json")
+
+    def render(self):
+        with self.settings(VITE_MANIFEST_PATH=self.manifest_path):
+            return Template("{% load vite %}{% vite_assets 'index.html' %}").render(Context())
+
+    def test_entry_tags(self):
+        """Test stylesheets of the entry and its imports, preloads and the script."""
+        write(self.manifest_path, json.dumps(MANIFEST))
+
+        html = self.render()
+
+        self.assertInHTML('<link rel="stylesheet" crossorigin href="/static/spa/assets/vendor-33334444.css">', html)
+        self.assertInHTML('<link rel="stylesheet" crossorigin href="/static/spa/assets/index-11112222.css">', html)
+        self.assertInHTML('<link rel="modulepreload" crossorigin href="/static/spa/assets/vendor-def67890.js">', html)
+        self.assertInHTML(
+            '<script type="module" crossorigin src="/static/spa/assets/index-abc12345.js"></script>', html
+        )
+        self.assertNotIn("Login", html)
+
+    def test_no_build(self):
+        """Test nothing is rendered before the client is built."""
+        self.assertEqual(self.render(), "")
+
+    def test_manifest_reloaded_on_change(self):
+        """Test a rebuild is picked up without a restart."""
+        write(self.manifest_path, json.dumps({"index.html": {"file": "assets/old.js"}}))
+        self.assertIn("old.js", self.render())
+        write(self.manifest_path, json.dumps({"index.html": {"file": "assets/new.js"}}))
+        os.utime(self.manifest_path, (0, 1))
+
+        self.assertIn("new.js", self.render())
+
+
+class HomePageViteTests(TestCase):
+    """Test the home page loads the SPA through the manifest."""
+
+    def test_home_page_includes_spa(self):
+        """Test the built entry is referenced from templates/index.html."""
+        cache.clear()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "manifest.json")
+            write(path, json.dumps(MANIFEST))
+            with self.settings(VITE_MANIFEST_PATH=path):
+                res = self.client.get(reverse("home"))
+
+        self.assertContains(res, '<div id="app"></div>', html=True)
+        self.assertContains(res, "/static/spa/assets/index-abc12345.js")
+
+
+class StaticPipelineTests(SimpleTestCase):
+    """Test collectstatic output and the headers it is served with."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        directory = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(directory.cleanup)
+        source = os.path.join(directory.name, "source")
+        dist = os.path.join(directory.name, "dist")
+        write(os.path.join(source, "css", "site.css"), "body { color: #333; }\n" * 200)
+        write(os.path.join(dist, "assets", "index-abc12345.js"), "console.log('spa');\n" * 200)
+        cls.enterClassContext(override_settings(
+            STATIC_ROOT=os.path.join(directory.name, "collected"),
+            STATICFILES_DIRS=[source, ("spa", dist)],
+            STATICFILES_FINDERS=["django.contrib.staticfiles.finders.FileSystemFinder"],
+            STORAGES={
+                "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+                "staticfiles": {"BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage"},
+            },
+        ))
+        call_command("collectstatic", interactive=False, verbosity=0)
+
+    def test_hashed_names_are_immutable_and_precompressed(self):
+        """Test manifest URLs are served compressed and cached forever."""
+        url = static("css/site.css")
+        self.assertRegex(url, r"^/static/css/site\.[0-9a-f]{12}\.css$")
+
+        res = self.client.get(url, HTTP_ACCEPT_ENCODING="br, gzip")
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res["Content-Encoding"], "br")
+        self.assertIn("immutable", res["Cache-Control"])
+
+    def test_vite_assets_are_immutable(self):
+        """Test Vite's own hashed names keep far-future caching."""
+        res = self.client.get("/static/spa/assets/index-abc12345.js", HTTP_ACCEPT_ENCODING="gzip")
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res["Content-Encoding"], "gzip")
+        self.assertIn("immutable", res["Cache-Control"])
+
+    def test_unhashed_names_are_revalidated(self):
+        """Test original names are only cached briefly."""
+        res = self.client.get("/static/css/site.css")
+
+        self.assertEqual(res.status_code, 200)
+        self.assertNotIn("immutable", res["Cache-Control"])
@@ -0,0 +1,236 @@
+"""
+Tests for comment paths and thread loading.
+"""
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from api import threads
+from api.models import Comment, Community, Post
+from api.tokens import ClaimsRefreshToken
+
+
+def create_user(**params):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(**params)
+
+
+def thread_url(post):
+    return reverse("api:post-comments", args=[post.pk])
+
+
+def bodies(nodes):
+    """Comment bodies nested as ``[(body, [replies...]), ...]``."""
+    return [(node["body"], bodies(node["replies"])) for node in nodes]
+
+
+class PathTests(SimpleTestCase):
+    """Test the path encoding."""
+
+    def test_subtree_bounds(self):
+        """Test a subtree lies between its path and the successor."""
+        path = threads.encode(7) + threads.encode(42)
+
+        self.assertEqual(threads.successor(path), threads.encode(7) + threads.encode(43))
+        self.assertLess(path, threads.first_reply(path))
+        self.assertLess(threads.first_reply(path) + threads.encode(99), threads.successor(path))
+        self.assertEqual(threads.depth_of(path), 1)
+
+    def test_cursor_validation(self):
+        """Test only whole segments of digits are cursors."""
+        self.assertTrue(threads.is_cursor(threads.encode(1)))
+        for value in ("", "123", "x" * threads.SEGMENT, "１" * threads.SEGMENT, "0" * 10 * (threads.MAX_DEPTH + 1)):
+            self.assertFalse(threads.is_cursor(value))
+
+
+class CommentTreeTests(TestCase):
+    """Test storing comments and loading slices of a thread."""
+
+    def setUp(self):
+        community = Community.objects.create(name="python", title="Python")
+        self.post = Post.objects.create(community=community, title="Hello")
+
+    def add(self, body, parent=None):
+        return Comment.objects.add(self.post.pk, None, body, parent_id=parent and parent.pk)
+
+    def load(self, cursor=None, depth=None, limit=100, min_score=None):
+        rows = list(Comment.objects.thread(self.post.pk, cursor, depth, min_score)[:limit + 1])
+        return threads.build(rows[:limit], threads.depth_of(cursor) if cursor else 0, len(rows) > limit)
+
+    def test_paths_and_counters(self):
+        """Test a reply extends its parent's path and bumps the counters."""
+        root = self.add("root")
+        reply = self.add("reply", root)
+
+        root.refresh_from_db()
+        self.post.refresh_from_db()
+        self.assertEqual(reply.path, threads.encode(root.pk) + threads.encode(reply.pk))
+        self.assertEqual((reply.depth, root.replies_count, self.post.comments_count), (1, 1, 2))
+
+    def test_reply_to_other_post(self):
+        """Test the parent must be on the same post."""
+        other = Post.objects.create(community=self.post.community, title="Other")
+        parent = Comment.objects.add(other.pk, None, "elsewhere")
+
+        with self.assertRaises(Comment.DoesNotExist):
+            self.add("reply", parent)
+
+    def test_whole_thread_is_one_query(self):
+        """Test a thread loads and nests in one query, depth first."""
+        a = self.add("a")
+        b = self.add("b")
+        a1 = self.add("a1", a)
+        self.add("b1", b)
+        self.add("a1x", a1)
+        self.add("a2", a)
+
+        with self.assertNumQueries(1):
+            top, cursor = self.load()
+
+        self.assertEqual(
+            bodies(top),
+            [("a", [("a1", [("a1x", [])]), ("a2", [])]), ("b", [("b1", [])])],
+        )
+        self.assertIsNone(cursor)
+
+    def test_depth_limit_leaves_more_cursors(self):
+        """Test replies below the depth limit are left for a continuation."""
+        a = self.add("a")
+        a1 = self.add("a1", a)
+        self.add("a1x", a1)
+        self.add("a1y", a1)
+
+        top, _ = self.load(depth=1)
+        more = top[0]["replies"][0]["more"]
+
+        self.assertEqual(more["count"], 2)
+        replies, cursor = self.load(cursor=more["cursor"], depth=1)
+        self.assertEqual(bodies(replies), [("a1x", []), ("a1y", [])])
+        self.assertIsNone(cursor)
+
+    def test_limit_continues_after_last_reply(self):
+        """Test a cut-off thread continues where it stopped, at every level."""
+        a = self.add("a")
+        for i in range(3):
+            self.add(f"a{i}", a)
+        self.add("b")
+
+        top, cursor = self.load(limit=3)
+        self.assertEqual(bodies(top), [("a", [("a0", []), ("a1", [])])])
+        more = top[0]["more"]
+        self.assertEqual(more["count"], 1)
+
+        replies, _ = self.load(cursor=more["cursor"])
+        rest, end = self.load(cursor=cursor)
+        self.assertEqual(bodies(replies), [("a2", [])])
+        self.assertEqual(bodies(rest), [("b", [])])
+        self.assertIsNone(end)
+
+    def test_min_score_drops_subtrees(self):
+        """Test low-scored comments are left out with their replies."""
+        a = self.add("a")
+        low = self.add("low", a)
+        self.add("under low", low)
+        Comment.objects.filter(pk=low.pk).update(score=-5)
+
+        top, _ = self.load(min_score=0)
+
+        self.assertEqual(bodies(top), [("a", [])])
+        self.assertEqual(top[0]["more"]["count"], 1)
+
+
+class CommentThreadApiTests(TestCase):
+    """Test the thread endpoint."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = create_user(email="me@example.com", username="me")
+        community = Community.objects.create(name="python", title="Python")
+        self.post = Post.objects.create(community=community, title="Hello")
+        self.client = APIClient()
+
+    def authenticate(self):
+        access = ClaimsRefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+
+    def test_comment_and_reply(self):
+        """Test posting a comment and a reply to it."""
+        self.authenticate()
+
+        root = self.client.post(thread_url(self.post), {"body": "First"})
+        reply = self.client.post(thread_url(self.post), {"body": "Reply", "parent": root.data["id"]})
+
+        self.assertEqual(root.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((reply.data["author"], reply.data["parent"], reply.data["depth"]), ("me", root.data["id"], 1))
+        self.assertNotIn("path", reply.data)
+
+    def test_reply_to_unknown_parent(self):
+        """Test a parent from another post is refused."""
+        self.authenticate()
+
+        res = self.client.post(thread_url(self.post), {"body": "Reply", "parent": 999})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_comment_requires_authentication(self):
+        """Test anonymous users can read but not comment."""
+        res = self.client.post(thread_url(self.post), {"body": "First"})
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_thread_sorted_by_score(self):
+        """Test the score sort orders loaded siblings by score."""
+        old = Comment.objects.add(self.post.pk, self.user.pk, "old")
+        best = Comment.objects.add(self.post.pk, None, "best")
+        Comment.objects.add(self.post.pk, None, "reply", parent_id=old.pk)
+        Comment.objects.filter(pk=best.pk).update(score=10)
+
+        top = self.client.get(thread_url(self.post))
+        old_first = self.client.get(thread_url(self.post) + "?sort=old")
+
+        self.assertEqual(top.status_code, status.HTTP_200_OK)
+        self.assertEqual(bodies(top.data["results"]), [("best", []), ("old", [("reply", [])])])
+        self.assertEqual([node["body"] for node in old_first.data["results"]], ["old", "best"])
+        self.assertEqual(top.data["results"][1]["author"], "me")
+
+    def test_score_sort_pages_in_thread_order(self):
+        """Test the score sort ranks the siblings of a page, not the whole thread."""
+        for i in range(3):
+            Comment.objects.add(self.post.pk, None, f"c{i}")
+        Comment.objects.filter(body="c2").update(score=10)
+        Comment.objects.filter(body="c1").update(score=5)
+
+        res = self.client.get(thread_url(self.post), {"sort": "score", "limit": 2})
+        top = self.client.get(thread_url(self.post), {"sort": "top"})
+
+        self.assertEqual([node["body"] for node in res.data["results"]], ["c1", "c0"])
+        self.assertEqual(top.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_next_cursor(self):
+        """Test the top level pages with the next cursor."""
+        for i in range(3):
+            Comment.objects.add(self.post.pk, None, f"c{i}")
+
+        first = self.client.get(thread_url(self.post) + "?sort=old&limit=2")
+        rest = self.client.get(thread_url(self.post), {"cursor": first.data["next"]})
+
+        self.assertEqual([node["body"] for node in first.data["results"]], ["c0", "c1"])
+        self.assertEqual([node["body"] for node in rest.data["results"]], ["c2"])
+        self.assertIsNone(rest.data["next"])
+
+    def test_invalid_cursor(self):
+        """Test a malformed cursor is a 400."""
+        res = self.client.get(thread_url(self.post), {"cursor": "abc"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_unknown_post(self):
+        """Test a missing post is a 404."""
+        res = self.client.get(reverse("api:post-comments", args=[self.post.pk + 1]))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
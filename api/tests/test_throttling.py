@@ -0,0 +1,229 @@
+"""
+Tests for login and refresh throttling.
+"""
+
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from api.tokens import ClaimsRefreshToken
+from reddit_clone import throttling
+from reddit_clone.throttling import LocalBuckets, sliding_wait
+
+
+TOKEN_URL = reverse("api:signin")
+REFRESH_URL = reverse("api:refresh")
+
+
+def create_user(**params):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(**params)
+
+
+def rates(**overrides):
+    """REST_FRAMEWORK settings with only the given throttle rates."""
+    return {**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": overrides}
+
+
+class SlidingWindowTests(SimpleTestCase):
+    """Test the weighted two-window count."""
+
+    def test_within_limit(self):
+        """Test requests up to the limit are allowed."""
+        self.assertIsNone(sliding_wait(previous=0, current=5, limit=5, window=60, elapsed=30))
+
+    def test_previous_window_counts_by_weight(self):
+        """Test half of last window's requests count halfway through this one."""
+        self.assertIsNone(sliding_wait(previous=4, current=3, limit=5, window=60, elapsed=30))
+        wait = sliding_wait(previous=4, current=4, limit=5, window=60, elapsed=30)
+
+        # The next request fits once 4 * (1 - t/60) + 5 <= 5, i.e. at the window's end.
+        self.assertAlmostEqual(wait, 30)
+
+    def test_over_limit_waits_for_next_window(self):
+        """Test a full current window waits past its end."""
+        wait = sliding_wait(previous=0, current=6, limit=5, window=60, elapsed=10)
+
+        self.assertGreater(wait, 50)
+
+
+class LocalBucketTests(SimpleTestCase):
+    """Test the in-process token bucket."""
+
+    def test_take_until_empty(self):
+        """Test the bucket allows the limit, then reports the refill wait."""
+        buckets = LocalBuckets()
+        for _ in range(3):
+            self.assertIsNone(buckets.take("k", 3, 60, now=0))
+
+        self.assertAlmostEqual(buckets.take("k", 3, 60, now=0), 20)
+        self.assertIsNone(buckets.take("k", 3, 60, now=20))
+
+    def test_block(self):
+        """Test a blocked key is refused until the given time."""
+        buckets = LocalBuckets()
+        buckets.take("k", 3, 60, now=0)
+        buckets.block("k", until=100)
+
+        self.assertAlmostEqual(buckets.take("k", 3, 60, now=90), 10)
+
+    def test_evicts_least_recently_used(self):
+        """Test the number of tracked keys is bounded."""
+        buckets = LocalBuckets(max_keys=2)
+        for key in ("a", "b", "c"):
+            buckets.take(key, 3, 60, now=0)
+
+        self.assertEqual(list(buckets.buckets), ["b", "c"])
+
+
+@override_settings(
+    PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"],
+    PASSWORD_HASHING_WORKERS=0,
+    THROTTLING_ENABLED=True,
+)
+class LoginThrottlingTests(TestCase):
+    """Test the login and refresh endpoints turn away bursts."""
+
+    def setUp(self):
+        cache.clear()
+        throttling.local_buckets.clear()
+        self.client = APIClient()
+        self.user = create_user(email="victim@example.com", password="testpass123")
+
+    def login(self, email="victim@example.com", password="wrong-pass", ip="10.0.0.1", **extra):
+        return self.client.post(TOKEN_URL, {"email": email, "password": password}, REMOTE_ADDR=ip, **extra)
+
+    @override_settings(REST_FRAMEWORK=rates(login_email="3/min"))
+    def test_email_throttle_across_ips(self):
+        """Test attempts on one email are limited whichever IP they come from."""
+        for i in range(3):
+            self.assertEqual(self.login(ip=f"10.0.0.{i}").status_code, status.HTTP_401_UNAUTHORIZED)
+
+        res = self.login(ip="10.0.0.99")
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertGreaterEqual(int(res["Retry-After"]), 1)
+        self.assertEqual(self.login(email="other@example.com").status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(REST_FRAMEWORK=rates(login_email="1/min"))
+    def test_email_is_normalized(self):
+        """Test case and whitespace do not give an attacker fresh counters."""
+        self.login()
+
+        res = self.login(email="  VICTIM@example.com ")
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @override_settings(REST_FRAMEWORK=rates(login_ip="2/min"))
+    def test_ip_throttle(self):
+        """Test one IP cannot spray many emails."""
+        self.login(email="a@example.com")
+        self.login(email="b@example.com")
+
+        self.assertEqual(self.login(email="c@example.com").status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(self.login(email="c@example.com", ip="10.0.0.2").status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(REST_FRAMEWORK=rates(login_ip="2/min"))
+    def test_spoofed_forwarded_for_ignored(self):
+        """Test made-up X-Forwarded-For entries don't give a client fresh counters."""
+        for i in range(2):
+            self.login(email=f"{i}@example.com", HTTP_X_FORWARDED_FOR=f"192.0.2.{i}, 203.0.113.7")
+
+        res = self.login(email="c@example.com", HTTP_X_FORWARDED_FOR="192.0.2.99, 203.0.113.7")
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(
+            self.login(email="c@example.com", HTTP_X_FORWARDED_FOR="192.0.2.99, 203.0.113.8").status_code,
+            status.HTTP_401_UNAUTHORIZED,
+        )
+
+    @override_settings(REST_FRAMEWORK=rates(login_global="2/min"))
+    def test_global_throttle(self):
+        """Test the global limit applies to everyone together."""
+        self.login(email="a@example.com", ip="10.0.0.1")
+        self.login(email="b@example.com", ip="10.0.0.2")
+
+        self.assertEqual(
+            self.login(email="c@example.com", ip="10.0.0.3").status_code, status.HTTP_429_TOO_MANY_REQUESTS
+        )
+
+    @override_settings(REST_FRAMEWORK=rates(login_email="1/min"))
+    def test_rejected_before_db_and_hashing(self):
+        """Test a throttled request neither queries the database nor hashes."""
+        self.login()
+
+        with mock.patch("accounts.hashing.verify_password") as verify, self.assertNumQueries(0):
+            res = self.login(password="testpass123")
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        verify.assert_not_called()
+
+    @override_settings(REST_FRAMEWORK=rates(login_email="1/min"))
+    def test_local_rejection_skips_shared_cache(self):
+        """Test a key the process already blocked is refused without a cache round trip."""
+        self.login()
+        self.login()
+
+        with mock.patch.object(throttling, "cache") as shared:
+            res = self.login()
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        shared.get.assert_not_called()
+        shared.incr.assert_not_called()
+
+    @override_settings(REST_FRAMEWORK=rates(login_email="2/min"))
+    def test_shared_counter_spans_processes(self):
+        """Test the shared counter rejects when another process used the allowance."""
+        self.login()
+        self.login()
+        # A different worker process has empty local buckets.
+        throttling.local_buckets.clear()
+
+        self.assertEqual(self.login().status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @override_settings(REST_FRAMEWORK=rates(refresh_ip="1/min"))
+    def test_refresh_throttle(self):
+        """Test token refresh is throttled per IP."""
+        payload = {"refresh": str(ClaimsRefreshToken.for_user(self.user))}
+        self.assertEqual(self.client.post(REFRESH_URL, payload).status_code, status.HTTP_200_OK)
+
+        res = self.client.post(REFRESH_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @override_settings(REST_FRAMEWORK=rates(login_email="1/min"))
+    def test_form_login_shares_counters(self):
+        """Test the template login view counts against the same email."""
+        self.login()
+
+        res = self.client.post(
+            reverse("accounts:login"), {"username": "victim@example.com", "password": "testpass123"}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn("Retry-After", res)
+
+    @override_settings(REST_FRAMEWORK=rates(login_email="1/min"))
+    async def test_async_login_throttle(self):
+        """Test the async login view uses the same throttles."""
+        url = reverse("api:async-signin")
+        payload = {"email": "victim@example.com", "password": "wrong-pass"}
+        await self.async_client.post(url, payload, content_type="application/json")
+
+        res = await self.async_client.post(url, payload, content_type="application/json")
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn("Retry-After", res)
+
+    @override_settings(REST_FRAMEWORK=rates(login_email="3/min"), THROTTLING_ENABLED=False)
+    def test_disabled(self):
+        """Test THROTTLING_ENABLED switches every throttle off."""
+        for _ in range(5):
+            self.assertEqual(self.login().status_code, status.HTTP_401_UNAUTHORIZED)
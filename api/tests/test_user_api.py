@@ -2,12 +2,17 @@
 Tests for the user API.
 """
 
+from unittest import mock
+
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 
 from rest_framework.test import APIClient
 from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from api.tokens import ClaimsRefreshToken
 
 
 CREATE_USER_URL = reverse("api:signup")
@@ -55,6 +60,27 @@ class PublicUserApiTests(TestCase):
         self.assertTrue(user.check_password(payload["password"]))
         self.assertNotIn("password", res.data)
 
+    def test_create_user_signs_one_token_pair(self):
+        """Test registering mints a single refresh/access pair."""
+        payload = {
+            "email": "test@example.com",
+            "password": "testpass123",
+            "username": "Test Name",
+        }
+        with mock.patch(
+            "api.serializers.ClaimsRefreshToken.for_user",
+            wraps=ClaimsRefreshToken.for_user,
+        ) as for_user:
+            res = self.client.post(CREATE_USER_URL, payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(for_user.call_count, 1)
+        self.assertIsInstance(res.data["access"], str)
+        refresh = RefreshToken(res.data["refresh"])
+        access = AccessToken(res.data["access"])
+        self.assertEqual(access["user_id"], refresh["user_id"])
+        self.assertEqual(access["exp"], refresh.access_token["exp"])
+
     def test_user_with_email_exists_error(self):
         """Test error returned if user with email exists."""
         payload = {
@@ -151,3 +177,23 @@ class PrivateUserApiTests(TestCase):
         res = self.client.get(user_profile_url())
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_get_profile_does_not_issue_tokens(self):
+        """Test reading the profile returns no fresh credentials."""
+        with mock.patch("api.serializers.ClaimsRefreshToken.for_user") as for_user:
+            res = self.client.get(user_profile_url())
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        for_user.assert_not_called()
+        self.assertEqual(res.data["email"], self.user.email)
+        self.assertNotIn("access", res.data)
+        self.assertNotIn("refresh", res.data)
+
+    def test_update_profile_success(self):
+        """Test updating the profile for the authenticated user."""
+        res = self.client.patch(user_profile_url(), {"firstName": "Updated"})
+
+        self.user.refresh_from_db()
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.user.firstName, "Updated")
+        self.assertNotIn("access", res.data)
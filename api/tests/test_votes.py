@@ -0,0 +1,240 @@
+"""
+Tests for vote recording and the batched counter updates.
+"""
+
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from api import ranking, votes
+from api.models import Comment, CommentVote, Community, Post, PostVote
+from api.tokens import ClaimsRefreshToken
+
+
+def create_user(**params):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(**params)
+
+
+def counts(post):
+    post.refresh_from_db()
+    return post.ups, post.downs, post.score
+
+
+# Large enough that only an explicit flush applies votes.
+@override_settings(VOTE_FLUSH_SIZE=10_000, VOTE_FLUSH_INTERVAL=3600)
+class VotePipelineTests(TestCase):
+    """Test recording votes and folding them into the counters."""
+
+    def setUp(self):
+        votes.buffer.clear()
+        self.addCleanup(votes.buffer.clear)
+        self.users = [create_user(email=f"user{i}@example.com", username=f"user{i}") for i in range(4)]
+        community = Community.objects.create(name="python", title="Python")
+        self.post = Post.objects.create(community=community, title="Hello")
+        self.other = Post.objects.create(community=community, title="Other")
+
+    def vote(self, user, value, post=None, model=PostVote):
+        target = post or self.post
+        with self.captureOnCommitCallbacks(execute=True):
+            return votes.record_vote(model, user.pk, target.pk, value)
+
+    def test_recording_leaves_the_counters(self):
+        """Test a vote only writes the voter's row until the buffer flushes."""
+        self.assertTrue(self.vote(self.users[0], 1))
+
+        self.assertEqual(counts(self.post), (0, 0, 0))
+        self.assertEqual(len(votes.buffer), 1)
+        self.assertTrue(PostVote.objects.get().pending)
+
+    def test_repeated_vote_is_a_no_op(self):
+        """Test recording the same vote twice changes nothing."""
+        self.vote(self.users[0], 1)
+        votes.buffer.flush()
+
+        self.assertFalse(self.vote(self.users[0], 1))
+        self.assertFalse(self.vote(self.users[1], 0))
+        self.assertEqual(len(votes.buffer), 0)
+        self.assertEqual(counts(self.post), (1, 0, 1))
+
+    def test_flush_coalesces_per_post(self):
+        """Test a flush updates each voted post once, whatever the number of votes."""
+        for user in self.users:
+            self.vote(user, 1)
+        self.vote(self.users[0], -1, post=self.other)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(votes.buffer.flush(), 5)
+
+        post_updates = [q for q in queries.captured_queries if q["sql"].startswith('UPDATE "api_post"')]
+        self.assertEqual(len(post_updates), 1)
+        self.assertEqual(counts(self.post), (4, 0, 4))
+        self.assertEqual(counts(self.other), (0, 1, -1))
+        self.assertEqual(self.post.hot, ranking.hot(4, self.post.created_at))
+        self.assertFalse(PostVote.objects.filter(pending=True).exists())
+
+    def test_changed_and_withdrawn_votes(self):
+        """Test the counters follow a vote from up to down to withdrawn."""
+        self.vote(self.users[0], 1)
+        votes.buffer.flush()
+        self.vote(self.users[0], -1)
+        votes.buffer.flush()
+        self.assertEqual(counts(self.post), (0, 1, -1))
+
+        self.vote(self.users[0], 0)
+        self.vote(self.users[0], 1)
+        votes.buffer.flush()
+        self.assertEqual(counts(self.post), (1, 0, 1))
+
+    def test_flush_is_idempotent(self):
+        """Test flushing a vote twice counts it once."""
+        self.vote(self.users[0], 1)
+        pks = list(PostVote.objects.values_list("pk", flat=True))
+
+        votes.apply_pending(PostVote, pks)
+        votes.apply_pending(PostVote, pks)
+
+        self.assertEqual(counts(self.post), (1, 0, 1))
+
+    def test_buffer_flushes_at_size(self):
+        """Test the buffer applies its votes once it holds VOTE_FLUSH_SIZE."""
+        with self.settings(VOTE_FLUSH_SIZE=3):
+            for user in self.users[:3]:
+                self.vote(user, 1)
+
+        self.assertEqual(len(votes.buffer), 0)
+        self.assertEqual(counts(self.post), (3, 0, 3))
+
+    def test_buffer_flushes_at_interval(self):
+        """Test the buffer applies its votes once the oldest is VOTE_FLUSH_INTERVAL old."""
+        self.vote(self.users[0], 1)
+        pk = PostVote.objects.get().pk
+
+        votes.buffer.add(PostVote, pk, now=votes.buffer.oldest + 3601)
+
+        self.assertEqual(counts(self.post), (1, 0, 1))
+
+    def test_timer_flushes_idle_buffer(self):
+        """Test a buffer that no later vote finds due is flushed by its timer."""
+        with mock.patch("api.votes.threading.Timer") as timer:
+            self.vote(self.users[0], 1)
+        interval, callback = timer.call_args.args
+        self.assertEqual(interval, 3600)
+
+        # The timer's own thread closes its connection, not the test's.
+        with mock.patch("api.votes.connections.close_all"):
+            callback()
+
+        self.assertEqual(counts(self.post), (1, 0, 1))
+        timer.return_value.cancel.assert_called_once()
+
+    def test_flush_votes_job(self):
+        """Test the periodic job applies votes any process left pending."""
+        self.vote(self.users[0], 1)
+        votes.buffer.clear()
+
+        votes.flush_pending()
+
+        self.assertEqual(counts(self.post), (1, 0, 1))
+
+    def test_failed_flush_keeps_votes_pending(self):
+        """Test a database error leaves the votes for flush_votes."""
+        self.vote(self.users[0], 1)
+
+        with mock.patch.object(Post.objects, "apply_votes", side_effect=DatabaseError):
+            with self.assertLogs("api.votes", "ERROR"):
+                self.assertEqual(votes.buffer.flush(), 0)
+
+        self.assertTrue(PostVote.objects.get().pending)
+        self.assertEqual(counts(self.post), (0, 0, 0))
+
+    def test_flush_votes_command(self):
+        """Test the command applies votes a crashed process never flushed."""
+        self.vote(self.users[0], 1)
+        self.vote(self.users[1], -1)
+        votes.buffer.clear()
+        comment = Comment.objects.add(self.post.pk, None, "First")
+        self.vote(self.users[0], 1, post=comment, model=CommentVote)
+        votes.buffer.clear()
+
+        out = StringIO()
+        call_command("flush_votes", stdout=out)
+
+        self.assertIn("Applied 2 pending post votes", out.getvalue())
+        self.assertEqual(counts(self.post), (1, 1, 0))
+        comment.refresh_from_db()
+        self.assertEqual(comment.score, 1)
+
+    def test_rebuild_vote_counts_command(self):
+        """Test the command repairs counters from the vote tables."""
+        for user in self.users[:3]:
+            self.vote(user, 1)
+        votes.buffer.flush()
+        Post.objects.filter(pk=self.post.pk).update(ups=100, score=100)
+        Post.objects.filter(pk=self.other.pk).update(downs=5, score=-5)
+
+        call_command("rebuild_vote_counts", stdout=StringIO())
+
+        self.assertEqual(counts(self.post), (3, 0, 3))
+        self.assertEqual(counts(self.other), (0, 0, 0))
+
+
+class VoteApiTests(TestCase):
+    """Test the vote endpoints."""
+
+    def setUp(self):
+        cache.clear()
+        votes.buffer.clear()
+        self.addCleanup(votes.buffer.clear)
+        self.user = create_user(email="me@example.com", username="me")
+        community = Community.objects.create(name="python", title="Python")
+        self.post = Post.objects.create(community=community, title="Hello")
+        self.comment = Comment.objects.add(self.post.pk, None, "First")
+        self.client = APIClient()
+        access = ClaimsRefreshToken.for_user(self.user).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {access}")
+
+    def test_vote_on_post(self):
+        """Test upvoting a post records the vote."""
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(reverse("api:post-vote", args=[self.post.pk]), {"value": 1})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["value"], 1)
+        self.assertEqual(PostVote.objects.get().value, 1)
+        self.assertEqual(len(votes.buffer), 1)
+
+    def test_vote_on_comment(self):
+        """Test downvoting a comment records the vote."""
+        res = self.client.post(reverse("api:comment-vote", args=[self.comment.pk]), {"value": -1})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(CommentVote.objects.get().value, -1)
+
+    def test_invalid_vote(self):
+        """Test only 1, 0 and -1 are accepted."""
+        res = self.client.post(reverse("api:post-vote", args=[self.post.pk]), {"value": 2})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_unknown_target(self):
+        """Test voting on a missing post is a 404."""
+        res = self.client.post(reverse("api:post-vote", args=[self.post.pk + 100]), {"value": 1})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_requires_authentication(self):
+        """Test anonymous users cannot vote."""
+        res = APIClient().post(reverse("api:post-vote", args=[self.post.pk]), {"value": 1})
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
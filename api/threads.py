@@ -0,0 +1,90 @@
+"""
+Comment threads stored as materialized paths.
+
+Every comment stores its ``path``: the ids of its ancestors and its own,
+each zero-padded to ``SEGMENT`` digits. In path order a thread reads depth
+first, each comment followed by its replies in the order they were posted,
+and a comment's replies are exactly the paths from its own up to the next
+sibling's (``successor``). Loading a thread, a subtree or the replies left
+after a given one is therefore one range scan of the ``(post, path)``
+index, with the depth and score limits as filters on the same scan. Paths
+are digits only, so they compare the same under every collation.
+
+A slice comes back in path order, so ``build`` assembles the tree in one
+pass: each comment's parent has already been seen. Comments whose replies
+were not all loaded get a ``more`` cursor that continues after the last
+reply loaded. Sorting by score reorders the siblings of a slice only: a
+reply beyond it is not ranked above them, however high its score.
+"""
+
+SEGMENT = 10
+MAX_DEPTH = 100
+
+
+def encode(pk):
+    return f'{pk:0{SEGMENT}d}'
+
+
+def depth_of(path):
+    return len(path) // SEGMENT - 1
+
+
+def successor(path):
+    """The first path after the subtree of ``path``."""
+    return path[:-SEGMENT] + encode(int(path[-SEGMENT:]) + 1)
+
+
+def first_reply(path):
+    """The lowest path a reply to ``path`` can have."""
+    return path + encode(0)
+
+
+def is_cursor(value):
+    return (
+        0 < len(value) <= SEGMENT * MAX_DEPTH
+        and len(value) % SEGMENT == 0
+        and value.isascii()
+        and value.isdigit()
+    )
+
+
+def build(rows, depth, truncated, represent=dict, sort=None):
+    """
+    Nest ``rows`` (comment dicts in path order) under their parents.
+
+    ``depth`` is the depth of the top level of the slice. Comments whose
+    parent is missing from the slice, filtered out by score, are dropped
+    along with their replies. Each comment is output as ``represent(row)``
+    plus its ``replies`` and ``more``. Returns the top level comments and
+    the cursor continuing after them, if the slice was ``truncated``. With
+    ``sort``, the siblings in the slice are ordered by that key, descending;
+    the slice itself stays in path order.
+    """
+    nodes, top = {}, []
+    for row in rows:
+        node = {**represent(row), 'replies': [], 'more': None}
+        parent = nodes.get(row['parent_id'])
+        if parent is not None:
+            parent[0]['replies'].append(node)
+            parent[2] = row['path']
+        elif row['depth'] == depth:
+            top.append(node)
+        else:
+            continue
+        # The node, its row and the path of its last loaded reply.
+        nodes[row['id']] = [node, row, None]
+    for node, row, after in nodes.values():
+        hidden = row['replies_count'] - len(node['replies'])
+        if hidden > 0:
+            node['more'] = {
+                'count': hidden,
+                'cursor': successor(after) if after else first_reply(row['path']),
+            }
+        if sort and len(node['replies']) > 1:
+            node['replies'].sort(key=lambda reply: reply[sort], reverse=True)
+    if sort:
+        top.sort(key=lambda node: node[sort], reverse=True)
+    cursor = None
+    if truncated and rows:
+        cursor = successor(rows[-1]['path'][:SEGMENT * (depth + 1)])
+    return top, cursor
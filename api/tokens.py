@@ -0,0 +1,27 @@
+import time
+
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from reddit_clone.replicas import PIN_CLAIM
+
+
+class ClaimsRefreshToken(RefreshToken):
+    """Refresh token carrying the public user fields as signed claims.
+
+    Access tokens derived from it (including on /api/refresh) copy these
+    claims, which lets ``StatelessJWTAuthentication`` build a user without
+    reading the database. ``gen`` is the user's token generation at sign-in;
+    tokens from an older generation are revoked (see ``api.revocation``).
+    ``pin`` is the sign-in time, which keeps the client reading from the
+    primary right after it (see ``reddit_clone.replicas``).
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super(ClaimsRefreshToken, cls).for_user(user)
+        token["email"] = user.email
+        token["username"] = user.username
+        token["is_staff"] = user.is_staff
+        token["gen"] = user.token_generation
+        token[PIN_CLAIM] = round(time.time(), 3)
+        return token
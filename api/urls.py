@@ -1,16 +1,63 @@
 from django.urls import path
 from .views import (
     CreateCustomUserApiView,
+    CustomTokenObtainPairView,
+    CustomTokenRefreshView,
+    ChangePasswordApiView,
+    CommunityDetailApiView,
+    CommunityListApiView,
+    CommunityPostsApiView,
+    CreatePostApiView,
+    FrontPageApiView,
+    PostDetailApiView,
+    PostVoteApiView,
+    CommentThreadApiView,
+    CommentVoteApiView,
+    FollowApiView,
+    FollowerListApiView,
+    FollowingListApiView,
+    MutualListApiView,
+    UserDetailApiView,
+    LogoutApiView,
+    ListCustomUsersApiView,
+    MetricsApiView,
+    SearchApiView,
     UserProfileApiView
 )
-from rest_framework_simplejwt.views import (
-    TokenObtainPairView,
-    TokenRefreshView,
+from .async_views import (
+    AsyncCreateCustomUserView,
+    AsyncTokenObtainPairView,
+    AsyncTokenRefreshView,
+    AsyncUserProfileView,
 )
 
 urlpatterns = [
     path("register", CreateCustomUserApiView.as_view(), name="signup"),
-    path("login", TokenObtainPairView.as_view(), name="signin"),
-    path("refresh", TokenRefreshView.as_view(), name="refresh"),
+    path("login", CustomTokenObtainPairView.as_view(), name="signin"),
+    path("refresh", CustomTokenRefreshView.as_view(), name="refresh"),
+    path("logout", LogoutApiView.as_view(), name="logout"),
+    path("change-password", ChangePasswordApiView.as_view(), name="change-password"),
     path("profile", UserProfileApiView.as_view(), name="profile"),
+    path("users", ListCustomUsersApiView.as_view(), name="users"),
+    path("users/<str:username>", UserDetailApiView.as_view(), name="user-detail"),
+    path("users/<str:username>/follow", FollowApiView.as_view(), name="follow"),
+    path("users/<str:username>/followers", FollowerListApiView.as_view(), name="followers"),
+    path("users/<str:username>/following", FollowingListApiView.as_view(), name="following"),
+    path("users/<str:username>/mutuals", MutualListApiView.as_view(), name="mutuals"),
+    path("communities", CommunityListApiView.as_view(), name="communities"),
+    path("communities/<str:name>", CommunityDetailApiView.as_view(), name="community-detail"),
+    path("communities/<str:name>/posts", CommunityPostsApiView.as_view(), name="community-posts"),
+    path("feed", FrontPageApiView.as_view(), name="feed"),
+    path("posts", CreatePostApiView.as_view(), name="posts"),
+    path("posts/<int:pk>", PostDetailApiView.as_view(), name="post-detail"),
+    path("posts/<int:pk>/comments", CommentThreadApiView.as_view(), name="post-comments"),
+    path("posts/<int:pk>/vote", PostVoteApiView.as_view(), name="post-vote"),
+    path("comments/<int:pk>/vote", CommentVoteApiView.as_view(), name="comment-vote"),
+    path("search", SearchApiView.as_view(), name="search"),
+    path("metrics", MetricsApiView.as_view(), name="metrics"),
+    # Async variants, for the ASGI deployment profile
+    path("async/register", AsyncCreateCustomUserView.as_view(), name="async-signup"),
+    path("async/login", AsyncTokenObtainPairView.as_view(), name="async-signin"),
+    path("async/refresh", AsyncTokenRefreshView.as_view(), name="async-refresh"),
+    path("async/profile", AsyncUserProfileView.as_view(), name="async-profile"),
 ]
@@ -1,46 +1,387 @@
-from rest_framework.generics import ListCreateAPIView, ListAPIView, CreateAPIView, RetrieveUpdateDestroyAPIView, RetrieveAPIView
+import os
+from rest_framework.generics import ListCreateAPIView, ListAPIView, CreateAPIView, RetrieveUpdateDestroyAPIView, RetrieveAPIView, GenericAPIView
 from .serializers import (
     ListCustomUserSerializer,
     CustomUserSerializer,
     CustomTokenObtainPairSerializer,
-
+    RotatingTokenRefreshSerializer,
+    LogoutSerializer,
+    ChangePasswordSerializer,
+    UserProfileSerializer,
+    PublicUserSerializer,
+    FollowerSerializer,
+    FollowingSerializer,
+    CommunitySerializer,
+    PostListSerializer,
+    PostSerializer,
+    VoteSerializer,
+    CommentSerializer,
+    CommentNodeSerializer,
+    CommentThreadSerializer,
+    CommentThreadQuerySerializer,
+    SearchQuerySerializer,
+    SearchResultSerializer,
 )
 from rest_framework.permissions import IsAuthenticated
-from rest_framework_simplejwt.views import TokenObtainPairView
-from rest_framework import filters
-from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from rest_framework import filters, status
+from rest_framework.exceptions import NotAuthenticated, ValidationError
+from django.shortcuts import get_object_or_404
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.permissions import IsAdminUser, IsAuthenticated, IsAuthenticatedOrReadOnly
+from rest_framework.views import APIView
 from django_filters.rest_framework import DjangoFilterBackend
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema
+from accounts import hashing
 from accounts.models import CustomUser
+from reddit_clone import instrumentation, replicas, throttling
+from reddit_clone.instrumentation import InstrumentedViewMixin
+from reddit_clone.middleware import metrics as connection_metrics
+from reddit_clone.throttling import LOGIN_THROTTLES, REFRESH_THROTTLES
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
-from . pagination import CustomPagination
+from . pagination import CustomPagination, KeysetPagination, SearchPagination
+from .authentication import JWTAuthentication, StatelessJWTAuthentication
+from .models import Comment, CommentVote, Community, Follow, Post, PostVote
+from .revocation import revoke_user_tokens
+from . import jobs, search, threads, votes
+from .filters import UserSearchFilter
+from .cache import CachedResponseMixin, user_namespace
+from .mappers import ValuesListMixin
+from .renderers import FastJSONRenderer
 
 
-class CreateCustomUserApiView(CreateAPIView):
+class CreateCustomUserApiView(InstrumentedViewMixin, CreateAPIView):
     serializer_class = CustomUserSerializer
     queryset = CustomUser.objects.all()
     permission_classes = []
 
 
-class CustomTokenObtainPairView(TokenObtainPairView):
+class CustomTokenObtainPairView(InstrumentedViewMixin, TokenObtainPairView):
     # Replace the serializer with your custom
     serializer_class = CustomTokenObtainPairSerializer
     permission_classes = []
+    throttle_classes = LOGIN_THROTTLES
+    throttle_scope = "login"
+
+
+class CustomTokenRefreshView(InstrumentedViewMixin, TokenRefreshView):
+    serializer_class = RotatingTokenRefreshSerializer
+    throttle_classes = REFRESH_THROTTLES
+    throttle_scope = "refresh"
 
 
-class ListCustomUsersApiView(ListAPIView):
+class ListCustomUsersApiView(InstrumentedViewMixin, CachedResponseMixin, ValuesListMixin, ListAPIView):
     serializer_class = ListCustomUserSerializer
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
     queryset = CustomUser.objects.all()
+    authentication_classes = [StatelessJWTAuthentication]
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, filters.SearchFilter]
+    pagination_class = KeysetPagination
+    keyset_count_mode = 'estimate'
+    filter_backends = [DjangoFilterBackend, filters.OrderingFilter, UserSearchFilter]
     filterset_fields = ['username', 'email']
     ordering_fields = ['username', 'email']
     search_fields = ['username', 'email']
+    cache_namespaces = ('users',)
 
 
-class UserProfileApiView(RetrieveUpdateDestroyAPIView):
-    serializer_class = CustomUserSerializer
+class UserProfileApiView(InstrumentedViewMixin, CachedResponseMixin, RetrieveUpdateDestroyAPIView):
+    serializer_class = UserProfileSerializer
     queryset = CustomUser.objects.all()
     permission_classes = [IsAuthenticated]
 
+    def get_cache_namespaces(self):
+        return (user_namespace(self.request.user.pk),)
+
     def get_object(self):
-        return self.request.user
\ No newline at end of file
+        return self.request.user
+
+
+class UserDetailApiView(InstrumentedViewMixin, RetrieveAPIView):
+    serializer_class = PublicUserSerializer
+    queryset = CustomUser.objects.filter(is_active=True)
+    authentication_classes = [StatelessJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    lookup_field = "username"
+
+
+# Resolves the ``username`` URL argument to an active user's id, without
+# loading the row.
+class UsernameLookupMixin:
+
+    def get_user_id(self):
+        users = CustomUser.objects.filter(is_active=True).values_list("pk", flat=True)
+        return get_object_or_404(users, username=self.kwargs["username"])
+
+
+class FollowApiView(InstrumentedViewMixin, UsernameLookupMixin, GenericAPIView):
+    """Follow (POST) or unfollow (DELETE) the user; both are idempotent."""
+    authentication_classes = [StatelessJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(request=None, responses={201: None, 200: None})
+    def post(self, request, username):
+        followee_id = self.get_user_id()
+        if followee_id == request.user.pk:
+            raise ValidationError({"detail": "You cannot follow yourself."})
+        created = Follow.objects.follow(request.user.pk, followee_id)
+        return Response(status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+    @extend_schema(responses={204: None})
+    def delete(self, request, username):
+        Follow.objects.unfollow(request.user.pk, self.get_user_id())
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+# Keyset-paginated follow edges of the user in the URL, ordered by the id
+# of the user on the other end; the edge table's composite indexes serve
+# every page as one range scan.
+class FollowEdgeListMixin(InstrumentedViewMixin, UsernameLookupMixin):
+    authentication_classes = [StatelessJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    filter_backends = []
+
+
+class FollowerListApiView(FollowEdgeListMixin, ListAPIView):
+    """Users following the user."""
+    serializer_class = FollowerSerializer
+    keyset_default_ordering = "follower_id"
+
+    def get_queryset(self):
+        return Follow.objects.followers_of(self.get_user_id()).select_related("follower")
+
+
+class FollowingListApiView(FollowEdgeListMixin, ListAPIView):
+    """Users the user follows."""
+    serializer_class = FollowingSerializer
+    keyset_default_ordering = "followee_id"
+
+    def get_queryset(self):
+        return Follow.objects.following_of(self.get_user_id()).select_related("followee")
+
+
+class MutualListApiView(FollowEdgeListMixin, ListAPIView):
+    """Users the user follows who follow back."""
+    serializer_class = FollowingSerializer
+    keyset_default_ordering = "followee_id"
+
+    def get_queryset(self):
+        return Follow.objects.mutuals_of(self.get_user_id()).select_related("followee")
+
+
+class CommunityListApiView(InstrumentedViewMixin, ListCreateAPIView):
+    """Communities by name, or create one."""
+    serializer_class = CommunitySerializer
+    queryset = Community.objects.select_related("creator")
+    authentication_classes = [StatelessJWTAuthentication]
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = KeysetPagination
+    keyset_default_ordering = "name"
+    filter_backends = []
+
+    def perform_create(self, serializer):
+        serializer.save(creator_id=self.request.user.pk)
+
+
+class CommunityDetailApiView(InstrumentedViewMixin, RetrieveAPIView):
+    serializer_class = CommunitySerializer
+    queryset = Community.objects.select_related("creator")
+    authentication_classes = [StatelessJWTAuthentication]
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    lookup_field = "name"
+
+
+FEED_SORTS = {"hot": "-hot", "top": "-score", "new": "-created_at"}
+
+
+# Post feeds, keyset-paginated on a stored and indexed column (see
+# api/ranking.py) and reading only the columns PostListSerializer needs.
+class PostFeedMixin(InstrumentedViewMixin):
+    serializer_class = PostListSerializer
+    authentication_classes = [StatelessJWTAuthentication]
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = KeysetPagination
+    filter_backends = []
+    keyset_sorts = FEED_SORTS
+    keyset_default_ordering = FEED_SORTS["hot"]
+
+
+class FrontPageApiView(PostFeedMixin, ListAPIView):
+    """Posts from every community."""
+
+    def get_queryset(self):
+        return Post.objects.feed()
+
+
+class CommunityPostsApiView(PostFeedMixin, ListAPIView):
+    """Posts in the community."""
+
+    def get_queryset(self):
+        communities = Community.objects.values_list("pk", flat=True)
+        community_id = get_object_or_404(communities, name=self.kwargs["name"])
+        return Post.objects.feed().filter(community_id=community_id)
+
+
+class CreatePostApiView(InstrumentedViewMixin, CreateAPIView):
+    serializer_class = PostSerializer
+    authentication_classes = [StatelessJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def perform_create(self, serializer):
+        serializer.save(author_id=self.request.user.pk)
+
+
+class PostDetailApiView(InstrumentedViewMixin, RetrieveAPIView):
+    serializer_class = PostSerializer
+    queryset = Post.objects.select_related("community", "author")
+    authentication_classes = [StatelessJWTAuthentication]
+    permission_classes = [IsAuthenticatedOrReadOnly]
+
+
+class CommentThreadApiView(InstrumentedViewMixin, GenericAPIView):
+    """
+    The post's comment thread, nested, or with ``cursor`` the continuation
+    a ``next`` or ``more`` cursor points to. Pages follow the thread order;
+    ``sort=score`` orders the siblings within a page by score. POST adds a
+    comment or reply.
+    """
+    serializer_class = CommentSerializer
+    authentication_classes = [StatelessJWTAuthentication]
+    permission_classes = [IsAuthenticatedOrReadOnly]
+
+    @extend_schema(parameters=[CommentThreadQuerySerializer], responses=CommentThreadSerializer)
+    def get(self, request, pk):
+        params = CommentThreadQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        cursor, limit = params.validated_data.get("cursor"), params.validated_data["limit"]
+        get_object_or_404(Post.objects.only("pk"), pk=pk)
+        # One range scan, one row past the limit to tell whether there is more.
+        rows = list(Comment.objects.thread(
+            pk, cursor, params.validated_data["depth"], params.validated_data.get("min_score")
+        )[:limit + 1])
+        results, next_cursor = threads.build(
+            rows[:limit],
+            threads.depth_of(cursor) if cursor else 0,
+            truncated=len(rows) > limit,
+            represent=CommentNodeSerializer().to_representation,
+            sort="score" if params.validated_data["sort"] == "score" else None,
+        )
+        return Response({"results": results, "next": next_cursor})
+
+    def post(self, request, pk):
+        get_object_or_404(Post.objects.only("pk"), pk=pk)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            comment = Comment.objects.add(
+                pk, request.user.pk, serializer.validated_data["body"], serializer.validated_data.get("parent_id")
+            )
+        except Comment.DoesNotExist:
+            raise ValidationError({"parent": ["No such comment on this post."]})
+        except ValueError as e:
+            raise ValidationError({"parent": [str(e)]})
+        return Response(self.get_serializer(comment).data, status=status.HTTP_201_CREATED)
+
+
+# Records the user's vote; the target's counters are updated by the next
+# batched flush (api.votes), not on the request path.
+class VoteMixin(InstrumentedViewMixin):
+    serializer_class = VoteSerializer
+    authentication_classes = [StatelessJWTAuthentication]
+    permission_classes = [IsAuthenticated]
+    vote_model = None
+
+    def post(self, request, pk):
+        get_object_or_404(votes.target_model(self.vote_model).objects.only("pk"), pk=pk)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        votes.record_vote(self.vote_model, request.user.pk, pk, serializer.validated_data["value"])
+        return Response(serializer.data)
+
+
+class PostVoteApiView(VoteMixin, GenericAPIView):
+    """Upvote, downvote or withdraw a vote on the post."""
+    vote_model = PostVote
+
+
+class CommentVoteApiView(VoteMixin, GenericAPIView):
+    """Upvote, downvote or withdraw a vote on the comment."""
+    vote_model = CommentVote
+
+
+class SearchApiView(InstrumentedViewMixin, GenericAPIView):
+    """
+    Users, communities and posts matching ``q``, best match first, with the
+    matches highlighted. Users are only searched for signed-in callers.
+    """
+    serializer_class = SearchResultSerializer
+    authentication_classes = [StatelessJWTAuthentication]
+    permission_classes = [IsAuthenticatedOrReadOnly]
+    pagination_class = SearchPagination
+
+    @extend_schema(parameters=[SearchQuerySerializer])
+    def get(self, request):
+        params = SearchQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        text = params.validated_data["q"]
+        kinds = sorted(params.validated_data.get("type") or search.KINDS)
+        if not request.user.is_authenticated:
+            if kinds == ["user"]:
+                raise NotAuthenticated()
+            kinds = [kind for kind in kinds if kind != "user"]
+        page = self.paginator.paginate_search(
+            lambda after, limit: search.search(text, kinds, after, limit), request, [text, *kinds]
+        )
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+
+class LogoutApiView(InstrumentedViewMixin, GenericAPIView):
+    """Revoke the given refresh token, or with ``all`` every token of the user."""
+    serializer_class = LogoutSerializer
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(responses={204: None})
+    def post(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        if serializer.validated_data["all"]:
+            revoke_user_tokens(request.user.pk)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ChangePasswordApiView(InstrumentedViewMixin, GenericAPIView):
+    """Change the password, signing out every session, and return a new token pair."""
+    serializer_class = ChangePasswordSerializer
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = self.get_serializer(request.user, data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data)
+
+
+class MetricsApiView(APIView):
+    """
+    Per-process request, connection, replica, password hashing, throttling,
+    vote and job metrics, and the depth of the job queue.
+    """
+    authentication_classes = [JWTAuthentication, SessionAuthentication]
+    permission_classes = [IsAdminUser]
+
+    @extend_schema(responses=OpenApiTypes.OBJECT)
+    def get(self, request):
+        return Response({
+            "pid": os.getpid(),
+            "routes": instrumentation.registry.snapshot(),
+            "db_connections": connection_metrics.snapshot(),
+            "db_replicas": replicas.metrics.snapshot(),
+            "password_hashing": hashing.metrics.snapshot(),
+            "throttling": throttling.metrics.snapshot(),
+            "votes": votes.metrics.snapshot(),
+            "jobs": {**jobs.metrics.snapshot(), "queue": jobs.queue_stats()},
+        })
@@ -0,0 +1,246 @@
+"""
+Vote ingestion with coalesced counter updates.
+
+Recording a vote writes only the voter's own row (``PostVote`` or
+``CommentVote``, unique per user and target) and marks it ``pending``. The
+target's counters, the hottest rows in the database, are not touched on
+the request path. Instead the ids of changed votes collect in a per-process
+``VoteBuffer``, which is flushed once it holds ``VOTE_FLUSH_SIZE`` votes or
+its oldest vote is ``VOTE_FLUSH_INTERVAL`` seconds old: the votes' deltas
+are summed per target and each target is updated once per flush.
+
+A flush locks the pending votes it folds in, adds ``value - applied`` to
+the counters and sets ``applied = value`` in the same transaction, so the
+counters always equal the sum of ``applied``. Any process may flush any
+vote at any time and a vote is counted exactly once. Votes left pending by
+a crash are picked up by the ``votes.flush_pending`` job, which the job
+workers run every ``VOTE_SWEEP_INTERVAL`` seconds, or by
+``manage.py flush_votes``.
+``manage.py rebuild_vote_counts`` recomputes every counter from the vote
+tables.
+"""
+
+import logging
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, connections, router, transaction
+from django.db.models import Count, Q
+
+from reddit_clone.metrics import Counter
+from . import jobs
+from .models import CommentVote, PostVote
+
+
+VOTE_MODELS = (PostVote, CommentVote)
+
+logger = logging.getLogger(__name__)
+
+
+def vote_deltas(value, applied):
+    """``(ups, downs)`` to add when a vote goes from ``applied`` to ``value``."""
+    return (value == 1) - (applied == 1), (value == -1) - (applied == -1)
+
+
+def target_model(vote_model):
+    return vote_model._meta.get_field('target').related_model
+
+
+def record_vote(vote_model, user_id, target_id, value):
+    """
+    Set the user's vote on the target to ``value`` (1, -1 or 0); return
+    False if it already was. The counters follow on a later flush.
+    """
+    if value not in vote_model.VALUES:
+        raise ValueError(f'Invalid vote {value!r}')
+    votes = vote_model.objects.select_for_update()
+    with transaction.atomic():
+        vote = votes.filter(user_id=user_id, target_id=target_id).first()
+        if vote is None and value != 0:
+            try:
+                with transaction.atomic():
+                    vote = vote_model.objects.create(
+                        user_id=user_id, target_id=target_id, value=value, pending=True
+                    )
+            except IntegrityError:
+                # Lost a race with the same user's first vote.
+                vote = votes.get(user_id=user_id, target_id=target_id)
+        elif vote is None or vote.value == value:
+            return False
+        if vote.value != value:
+            vote.value = value
+            vote.pending = True
+            vote.save(update_fields=['value', 'pending', 'updated_at'])
+        pk = vote.pk
+        transaction.on_commit(lambda: buffer.add(vote_model, pk))
+    return True
+
+
+def apply_pending(vote_model, pks=None, batch_size=1000):
+    """
+    Fold pending votes (those in ``pks``, or all of them) into their
+    targets' counters, ``batch_size`` votes per transaction. Return the
+    number of votes applied.
+    """
+    pending = vote_model.objects.filter(pending=True)
+    applied = 0
+    if pks is not None:
+        pks = sorted(pks)
+        for start in range(0, len(pks), batch_size):
+            applied += apply_batch(vote_model, pending.filter(pk__in=pks[start:start + batch_size]))
+        return applied
+    last = 0
+    while True:
+        batch = list(pending.filter(pk__gt=last).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not batch:
+            return applied
+        applied += apply_batch(vote_model, pending.filter(pk__in=batch))
+        last = batch[-1]
+
+
+def apply_batch(vote_model, queryset):
+    # Votes another flush or a vote being recorded holds are skipped; they
+    # are applied by whoever holds them, or stay pending for the next run.
+    features = connections[router.db_for_write(vote_model)].features
+    with transaction.atomic():
+        votes = list(
+            queryset.select_for_update(skip_locked=features.has_select_for_update_skip_locked)
+            .order_by('pk')
+            .only('target_id', 'value', 'applied')
+        )
+        deltas = defaultdict(lambda: (0, 0))
+        for vote in votes:
+            ups, downs = vote_deltas(vote.value, vote.applied)
+            deltas[vote.target_id] = (deltas[vote.target_id][0] + ups, deltas[vote.target_id][1] + downs)
+            vote.applied = vote.value
+            vote.pending = False
+        target_model(vote_model).objects.apply_votes({k: v for k, v in deltas.items() if any(v)})
+        vote_model.objects.bulk_update(votes, ['applied', 'pending'])
+    metrics.applied.inc(len(votes))
+    return len(votes)
+
+
+@jobs.task('votes.flush_pending', every=settings.VOTE_SWEEP_INTERVAL)
+def flush_pending():
+    """Apply every pending vote, whichever process recorded it."""
+    for vote_model in VOTE_MODELS:
+        apply_pending(vote_model)
+
+
+def rebuild_counts(vote_model, batch_size=1000):
+    """
+    Recompute every target's counters from the applied votes,
+    ``batch_size`` targets per transaction. Return the number of targets.
+
+    The targets are locked first, which holds off flushes of their votes
+    until the batch commits.
+    """
+    targets = target_model(vote_model).objects
+    rebuilt, last = 0, 0
+    while True:
+        with transaction.atomic():
+            ids = list(
+                targets.select_for_update().filter(pk__gt=last).order_by('pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not ids:
+                return rebuilt
+            counts = dict.fromkeys(ids, (0, 0))
+            rows = (
+                vote_model.objects.filter(target_id__in=ids)
+                .values('target_id')
+                .annotate(ups=Count('pk', filter=Q(applied=1)), downs=Count('pk', filter=Q(applied=-1)))
+                .order_by()
+            )
+            counts.update((row['target_id'], (row['ups'], row['downs'])) for row in rows)
+            targets.apply_votes(counts, absolute=True)
+        rebuilt += len(ids)
+        last = ids[-1]
+
+
+class VoteMetrics:
+    def __init__(self):
+        self.recorded = Counter()
+        self.applied = Counter()
+        self.flushes = Counter()
+        self.failed_flushes = Counter()
+
+    def snapshot(self):
+        return {
+            'recorded': self.recorded.value,
+            'applied': self.applied.value,
+            'flushes': self.flushes.value,
+            'failed_flushes': self.failed_flushes.value,
+            'buffered': len(buffer),
+        }
+
+
+metrics = VoteMetrics()
+
+
+class VoteBuffer:
+    """
+    Ids of this process's changed votes, per vote model, awaiting a flush.
+
+    A timer flushes the buffer ``VOTE_FLUSH_INTERVAL`` seconds after its
+    first vote, in case no later vote arrives to find it due.
+    """
+
+    def __init__(self):
+        self.pending = defaultdict(set)
+        self.oldest = None
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return sum(len(pks) for pks in self.pending.values())
+
+    def add(self, vote_model, pk, now=None):
+        now = time.monotonic() if now is None else now
+        metrics.recorded.inc()
+        with self._lock:
+            self.pending[vote_model].add(pk)
+            if self.oldest is None:
+                self.oldest = now
+                self._timer = threading.Timer(settings.VOTE_FLUSH_INTERVAL, self.flush_on_timer)
+                self._timer.daemon = True
+                self._timer.start()
+            due = len(self) >= settings.VOTE_FLUSH_SIZE or now - self.oldest >= settings.VOTE_FLUSH_INTERVAL
+        if due:
+            self.flush()
+
+    def flush_on_timer(self):
+        try:
+            self.flush()
+        finally:
+            # The timer's thread ends here; so must its connection.
+            connections.close_all()
+
+    def take(self):
+        with self._lock:
+            pending, self.pending, self.oldest = self.pending, defaultdict(set), None
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        return pending
+
+    def flush(self):
+        """Apply the buffered votes; return how many were applied."""
+        pending = self.take()
+        if not pending:
+            return 0
+        metrics.flushes.inc()
+        try:
+            return sum(apply_pending(vote_model, pks) for vote_model, pks in pending.items())
+        except DatabaseError:
+            # The votes stay pending in the database for flush_votes.
+            metrics.failed_flushes.inc()
+            logger.exception('Vote flush failed')
+            return 0
+
+    def clear(self):
+        self.take()
+
+
+buffer = VoteBuffer()
@@ -0,0 +1,5 @@
+"""
+Load-testing harness for the API.
+
+Run against real gunicorn processes, never the test client; see README.md.
+"""
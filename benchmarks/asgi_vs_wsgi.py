@@ -0,0 +1,155 @@
+"""
+Compare the WSGI and ASGI stacks on the auth and profile endpoints.
+
+    python -m benchmarks.asgi_vs_wsgi --cores 2 --duration 20 --output asgi.json
+
+Both stacks get the same number of cores: WSGI runs ``--cores`` gthread
+workers with ``--threads`` threads each (the production Procfile shape),
+ASGI runs ``--cores`` uvicorn workers. WSGI is driven through the DRF
+views and ASGI through their async versions under /api/async/. Each
+scenario (register, login, refresh, profile, or a mix of all four) runs
+against a fresh server; results are printed and optionally written as
+JSON.
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import platform
+import tempfile
+import uuid
+
+from .loadgen import Client, Recorder, run_load
+from .server import Server, manage, sqlite_env
+
+
+SCENARIOS = ('register', 'login', 'refresh', 'profile', 'mixed')
+PATHS = {
+    'wsgi': {
+        'register': '/api/register', 'login': '/api/login',
+        'refresh': '/api/refresh', 'profile': '/api/profile',
+    },
+    'asgi': {
+        'register': '/api/async/register', 'login': '/api/async/login',
+        'refresh': '/api/async/refresh', 'profile': '/api/async/profile',
+    },
+}
+PASSWORD = 'bench-password-123'
+
+
+def seed_users(env, count):
+    """Create ``count`` users with a known password through import_users."""
+    with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['email', 'username', 'password'])
+        for i in range(count):
+            writer.writerow([f'bench{i}@example.com', f'bench{i}', PASSWORD])
+    try:
+        manage(env, 'import_users', f.name)
+    finally:
+        os.unlink(f.name)
+
+
+def login_tokens(base_url, paths, count, users):
+    """Return a (access, refresh) pair per session, one session per client."""
+    client = Client(base_url, Recorder())
+    tokens = []
+    for n in range(count):
+        i = n % users
+        status, body = client.request(
+            'login', 'POST', paths['login'], {'email': f'bench{i}@example.com', 'password': PASSWORD}
+        )
+        if status != 200:
+            raise RuntimeError(f'Could not log in the seeded user bench{i}: {status} {body}')
+        tokens.append((body['access'], body['refresh']))
+    return tokens
+
+
+def make_step(scenario, paths, tokens, users):
+    run_id = uuid.uuid4().hex[:8]
+    mix = itertools.cycle(('profile', 'profile', 'login', 'refresh', 'register'))
+
+    def step(client, worker, iteration):
+        name = next(mix) if scenario == 'mixed' else scenario
+        access = tokens[(worker + iteration) % len(tokens)][0]
+        if name == 'register':
+            username = f'r{run_id}w{worker}i{iteration}'
+            client.request(name, 'POST', paths[name], {
+                'email': f'{username}@example.com', 'username': username, 'password': PASSWORD,
+            })
+        elif name == 'login':
+            i = (worker + iteration) % users
+            client.request(name, 'POST', paths[name], {'email': f'bench{i}@example.com', 'password': PASSWORD})
+        elif name == 'refresh':
+            # Refresh tokens rotate and may be used once; a token presented
+            # again signs out the user. Each client refreshes its own session.
+            status, body = client.request(name, 'POST', paths[name], {'refresh': tokens[worker][1]})
+            if status == 200:
+                tokens[worker] = (body['access'], body['refresh'])
+        else:
+            client.request(name, 'GET', paths[name], token=access)
+
+    return step
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cores', type=int, default=2, help='Worker processes for each stack.')
+    parser.add_argument('--threads', type=int, default=2, help='Threads per WSGI worker.')
+    parser.add_argument('--concurrency', type=int, default=32, help='Concurrent client connections.')
+    parser.add_argument('--duration', type=float, default=15, help='Measured seconds per scenario.')
+    parser.add_argument('--warmup', type=float, default=3, help='Unmeasured seconds before each run.')
+    parser.add_argument('--users', type=int, default=200, help='Seeded users to log in as.')
+    parser.add_argument('--scenario', choices=SCENARIOS, action='append', help='Repeatable; default all.')
+    parser.add_argument('--stack', choices=('wsgi', 'asgi'), action='append', help='Repeatable; default both.')
+    parser.add_argument(
+        '--sqlite', action='store_true',
+        help='Use a throwaway SQLite database instead of the DB_* environment.',
+    )
+    parser.add_argument('--output', help='Write the results as JSON to this file.')
+    args = parser.parse_args(argv)
+
+    env = sqlite_env() if args.sqlite else {}
+    manage(env, 'migrate', '--noinput')
+    seed_users(env, args.users)
+
+    results = {}
+    for stack in args.stack or ('wsgi', 'asgi'):
+        paths = PATHS[stack]
+        results[stack] = {}
+        for scenario in args.scenario or SCENARIOS:
+            with Server(stack, workers=args.cores, threads=args.threads, env=env) as base_url:
+                tokens = login_tokens(base_url, paths, args.concurrency, args.users)
+                step = make_step(scenario, paths, tokens, args.users)
+                summary = run_load(base_url, step, args.concurrency, args.duration, args.warmup)
+            results[stack][scenario] = summary
+            total = summary['total']
+            print(
+                f"{stack:>4} {scenario:<9} {total['throughput_rps']:9.1f} req/s"
+                f"   p50 {total['p50_ms'] or 0:8.1f} ms   p99 {total['p99_ms'] or 0:8.1f} ms"
+                f"   errors {total['errors']}",
+                flush=True,
+            )
+
+    report = {
+        'meta': {
+            'cores': args.cores,
+            'wsgi_threads': args.threads,
+            'concurrency': args.concurrency,
+            'duration_s': args.duration,
+            'database': env.get('DB_ENGINE') or os.getenv('DB_ENGINE', 'django.db.backends.postgresql'),
+            'password_hasher': os.getenv('PASSWORD_HASHER', 'pbkdf2'),
+            'python': platform.python_version(),
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Diff two benchmark reports written by ``benchmarks.sweep``.
+
+    python -m benchmarks.compare before.json after.json
+
+Prints throughput and p50/p99 latency per configuration and endpoint with
+the relative change, and a warning when the two runs were not taken with
+the same settings (mix, users, concurrency, hasher...).
+"""
+
+import argparse
+import json
+
+
+COMPARED_META = (
+    'concurrency', 'duration_s', 'users', 'mix', 'seed', 'database',
+    'password_hasher', 'password_hashing_workers', 'cpu_count',
+)
+
+
+def change(before, after):
+    if not before or after is None:
+        return ''
+    return f'{(after - before) / before * 100:+6.1f}%'
+
+
+def compare(before, after):
+    """Yield ``(config, endpoint, metric, before, after)`` for shared entries."""
+    for config, old in before['results'].items():
+        new = after['results'].get(config)
+        if new is None:
+            continue
+        for endpoint, old_summary in old['endpoints'].items():
+            new_summary = new['endpoints'].get(endpoint)
+            if new_summary is None:
+                continue
+            for metric in ('throughput_rps', 'p50_ms', 'p99_ms', 'errors'):
+                yield config, endpoint, metric, old_summary[metric], new_summary[metric]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('before')
+    parser.add_argument('after')
+    args = parser.parse_args(argv)
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+
+    for key in COMPARED_META:
+        if before['meta'].get(key) != after['meta'].get(key):
+            print(f'warning: {key} differs: {before["meta"].get(key)!r} -> {after["meta"].get(key)!r}')
+
+    print(f'{"config":<8} {"endpoint":<10} {"metric":<15} {"before":>10} {"after":>10} {"change":>8}')
+    for config, endpoint, metric, old, new in compare(before, after):
+        print(
+            f'{config:<8} {endpoint:<10} {metric:<15} {old if old is not None else "-":>10} '
+            f'{new if new is not None else "-":>10} {change(old, new):>8}'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""
+Closed-loop HTTP load generator.
+
+``concurrency`` threads each hold one keep-alive connection and send the
+next request as soon as the previous one completes, for ``duration``
+seconds. Latencies are kept per endpoint name and summarized as
+throughput, mean, p50/p95/p99 and error counts.
+"""
+
+import http.client
+import json
+import math
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+
+def percentile(ordered, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return None
+    rank = max(math.ceil(p / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def summarize(latencies, errors, elapsed):
+    ordered = sorted(latencies)
+    ms = lambda value: None if value is None else round(value * 1000, 3)  # noqa: E731
+    return {
+        'requests': len(ordered),
+        'errors': errors,
+        'throughput_rps': round(len(ordered) / elapsed, 2) if elapsed else 0.0,
+        'mean_ms': ms(sum(ordered) / len(ordered)) if ordered else None,
+        'p50_ms': ms(percentile(ordered, 50)),
+        'p95_ms': ms(percentile(ordered, 95)),
+        'p99_ms': ms(percentile(ordered, 99)),
+        'max_ms': ms(ordered[-1]) if ordered else None,
+    }
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.recording = False
+        self._lock = threading.Lock()
+
+    def record(self, name, latency, status):
+        if not self.recording:
+            return
+        with self._lock:
+            self.statuses[name][status] += 1
+            if status is None or status >= 400:
+                self.errors[name] += 1
+            else:
+                self.latencies[name].append(latency)
+
+    def summary(self, elapsed):
+        names = sorted(set(self.latencies) | set(self.errors))
+        results = {name: summarize(self.latencies[name], self.errors[name], elapsed) for name in names}
+        for name in names:
+            results[name]['statuses'] = {str(k): v for k, v in sorted(
+                self.statuses[name].items(), key=lambda item: str(item[0])
+            )}
+        every = [latency for name in names for latency in self.latencies[name]]
+        results['total'] = summarize(every, sum(self.errors.values()), elapsed)
+        return results
+
+
+class Client:
+    """One keep-alive connection; ``request`` times and records a call."""
+
+    def __init__(self, base_url, recorder, timeout=30):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.recorder = recorder
+        self.timeout = timeout
+        self.connection = None
+
+    def connect(self):
+        self.connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def request(self, name, method, path, data=None, token=None):
+        """Send a JSON request; return ``(status, parsed body)``."""
+        headers = {'Accept': 'application/json'}
+        body = None
+        if data is not None:
+            body = json.dumps(data)
+            headers['Content-Type'] = 'application/json'
+        if token:
+            headers['Authorization'] = f'Bearer {token}'
+        if self.connection is None:
+            self.connect()
+
+        started = time.perf_counter()
+        try:
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            payload = response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            self.connection = None
+            self.recorder.record(name, time.perf_counter() - started, None)
+            return None, None
+        self.recorder.record(name, time.perf_counter() - started, status)
+        try:
+            return status, json.loads(payload) if payload else None
+        except ValueError:
+            return status, None
+
+
+def run_load(base_url, step, concurrency, duration, warmup=0):
+    """
+    Drive ``step(client, worker_index, iteration)`` from ``concurrency``
+    threads and return the per-endpoint summary of the measured window.
+    """
+    recorder = Recorder()
+    deadline = time.perf_counter() + warmup + duration
+    stop = threading.Event()
+
+    def worker(index):
+        client = Client(base_url, recorder)
+        iteration = 0
+        while not stop.is_set() and time.perf_counter() < deadline:
+            step(client, index, iteration)
+            iteration += 1
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    time.sleep(warmup)
+    recorder.recording = True
+    started = time.perf_counter()
+    time.sleep(max(deadline - time.perf_counter(), 0))
+    recorder.recording = False
+    elapsed = time.perf_counter() - started
+    stop.set()
+    for thread in threads:
+        thread.join(timeout=60)
+    return recorder.summary(elapsed)
@@ -0,0 +1,107 @@
+"""
+Start the app under gunicorn for a benchmark run.
+
+The database comes from the usual DB_* variables; ``sqlite_env`` builds a
+throwaway SQLite stand-in for machines without Postgres.
+"""
+
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def sqlite_env(directory=None):
+    directory = directory or tempfile.mkdtemp(prefix='reddit-clone-bench-')
+    return {
+        'DB_ENGINE': 'django.db.backends.sqlite3',
+        'DB_NAME': os.path.join(directory, 'bench.sqlite3'),
+    }
+
+
+def manage(env, *args):
+    subprocess.run(
+        [sys.executable, 'manage.py', *args],
+        cwd=ROOT, env={**os.environ, **env}, check=True,
+        stdout=subprocess.DEVNULL,
+    )
+
+
+def seed_users(env, count):
+    """
+    Bulk-insert ``count`` users through ``accounts.factories``; they log in
+    as ``seed{n}@example.com`` with ``factories.DEFAULT_PASSWORD``.
+    """
+    manage(env, 'shell', '-c', f'from accounts.factories import seed_users; seed_users({int(count)})')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Server:
+    """
+    ``with Server('asgi', workers=2) as base_url:`` runs gunicorn until the
+    block exits. ``stack`` is 'wsgi' (gthread workers) or 'asgi' (uvicorn
+    workers, see reddit_clone/gunicorn_asgi.py).
+    """
+
+    def __init__(self, stack, workers, threads=1, env=None, port=None, startup_timeout=60):
+        self.stack = stack
+        self.workers = workers
+        self.threads = threads
+        self.env = env or {}
+        self.port = port or free_port()
+        self.startup_timeout = startup_timeout
+        self.process = None
+
+    def command(self):
+        bind = f'127.0.0.1:{self.port}'
+        if self.stack == 'asgi':
+            return [
+                sys.executable, '-m', 'gunicorn', 'reddit_clone.asgi:application',
+                '-c', 'reddit_clone/gunicorn_asgi.py', '--bind', bind, '--workers', str(self.workers),
+            ]
+        return [
+            sys.executable, '-m', 'gunicorn', 'reddit_clone.wsgi:application',
+            '--bind', bind, '--workers', str(self.workers), '--threads', str(self.threads),
+            '--worker-class', 'gthread',
+        ]
+
+    def __enter__(self):
+        # GUNICORN_THREADS sizes the password hashing queue like the Procfile
+        # does. Every request comes from the load generator's one IP, which
+        # the login and refresh throttles would turn away with 429s.
+        env = {**os.environ, 'GUNICORN_THREADS': str(self.threads), 'THROTTLING_ENABLED': 'false', **self.env}
+        self.process = subprocess.Popen(
+            self.command(), cwd=ROOT, env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f'{self.stack} server exited with {self.process.returncode}')
+            try:
+                socket.create_connection(('127.0.0.1', self.port), timeout=1).close()
+                # ALLOWED_HOSTS has localhost but not 127.0.0.1.
+                return f'http://localhost:{self.port}'
+            except OSError:
+                time.sleep(0.2)
+        self.__exit__(None, None, None)
+        raise RuntimeError(f'{self.stack} server did not start within {self.startup_timeout}s')
+
+    def __exit__(self, *exc_info):
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
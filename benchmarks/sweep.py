@@ -0,0 +1,177 @@
+"""
+Drive mixed API traffic against a sweep of gunicorn worker/thread counts.
+
+    python -m benchmarks.sweep --workers 1,2,3 --threads 1,2,4 --output sweep.json
+
+For every ``--workers`` x ``--threads`` pair, a fresh WSGI server (gthread
+workers, the Procfile shape) gets a weighted mix of register, login,
+refresh, profile reads, user listings and user searches from
+``--concurrency`` keep-alive clients. The users table is seeded with
+``--users`` rows so searches and listings run against a realistic table.
+
+The mix is a fixed, seeded shuffle of ``--mix``, so two runs with the same
+arguments send the same request sequence. Results (throughput, p50/p95/p99
+and errors per endpoint) are written as JSON; compare two runs with
+``python -m benchmarks.compare``.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import uuid
+
+from .loadgen import Client, Recorder, run_load
+from .server import ROOT, Server, manage, seed_users, sqlite_env
+
+
+DEFAULT_MIX = 'profile=4,users=2,search=2,login=1,refresh=1,register=1'
+ENDPOINTS = ('register', 'login', 'refresh', 'profile', 'users', 'search')
+# Must match accounts.factories.DEFAULT_PASSWORD.
+PASSWORD = 'seed-password-123'
+
+
+def int_list(value):
+    return [int(item) for item in value.split(',') if item]
+
+
+def parse_mix(value):
+    """``'profile=4,login=1'`` -> ``{'profile': 4, 'login': 1}``."""
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f'Unknown endpoint {name!r}; choose from {", ".join(ENDPOINTS)}.')
+        mix[name] = int(weight or 1)
+    return mix
+
+
+def schedule(mix, seed):
+    """The weighted request sequence every client cycles through."""
+    sequence = [name for name, weight in mix.items() for _ in range(weight)]
+    random.Random(seed).shuffle(sequence)
+    return sequence
+
+
+def login_tokens(base_url, count, users):
+    """Return an ``(access, refresh)`` pair per session, one session per client."""
+    client = Client(base_url, Recorder())
+    tokens = []
+    for n in range(count):
+        i = n % users
+        status, body = client.request(
+            'login', 'POST', '/api/login', {'email': f'seed{i}@example.com', 'password': PASSWORD}
+        )
+        if status != 200:
+            raise RuntimeError(f'Could not log in the seeded user seed{i}: {status} {body}')
+        tokens.append((body['access'], body['refresh']))
+    return tokens
+
+
+def make_step(sequence, tokens, users, seed):
+    run_id = uuid.uuid4().hex[:8]
+
+    def step(client, worker, iteration):
+        name = sequence[(worker + iteration) % len(sequence)]
+        n = (worker * 7919 + iteration * 104729 + seed) % users
+        access = tokens[n % len(tokens)][0]
+        if name == 'register':
+            username = f'r{run_id}w{worker}i{iteration}'
+            client.request(name, 'POST', '/api/register', {
+                'email': f'{username}@example.com', 'username': username, 'password': PASSWORD,
+            })
+        elif name == 'login':
+            client.request(name, 'POST', '/api/login', {'email': f'seed{n}@example.com', 'password': PASSWORD})
+        elif name == 'refresh':
+            # Refresh tokens rotate and may be used once; a token presented
+            # again signs out the user. Each client refreshes its own session.
+            status, body = client.request(name, 'POST', '/api/refresh', {'refresh': tokens[worker][1]})
+            if status == 200:
+                tokens[worker] = (body['access'], body['refresh'])
+        elif name == 'users':
+            client.request(name, 'GET', '/api/users', token=access)
+        elif name == 'search':
+            # Dropping the last two digits matches up to 100 seeded users.
+            prefix = f'seed{n:07d}'[:-2]
+            client.request(name, 'GET', f'/api/users?search={prefix}&search_mode=prefix', token=access)
+        else:
+            client.request(name, 'GET', '/api/profile', token=access)
+
+    return step
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int_list, default=[1, 2, 3], help='Comma-separated worker counts.')
+    parser.add_argument('--threads', type=int_list, default=[1, 2, 4], help='Comma-separated threads per worker.')
+    parser.add_argument('--concurrency', type=int, default=32, help='Concurrent client connections.')
+    parser.add_argument('--duration', type=float, default=20, help='Measured seconds per configuration.')
+    parser.add_argument('--warmup', type=float, default=3, help='Unmeasured seconds before each run.')
+    parser.add_argument('--users', type=int, default=100_000, help='Users to seed.')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX), help=f'Default {DEFAULT_MIX}.')
+    parser.add_argument('--seed', type=int, default=0, help='Seed for the request sequence.')
+    parser.add_argument(
+        '--sqlite', action='store_true',
+        help='Use a throwaway SQLite database instead of the DB_* environment.',
+    )
+    parser.add_argument('--skip-seed', action='store_true', help='The database is already migrated and seeded.')
+    parser.add_argument('--output', help='Write the results as JSON to this file.')
+    args = parser.parse_args(argv)
+
+    env = sqlite_env() if args.sqlite else {}
+    if not args.skip_seed:
+        manage(env, 'migrate', '--noinput')
+        seed_users(env, args.users)
+    sequence = schedule(args.mix, args.seed)
+
+    results = {}
+    for workers in args.workers:
+        for threads in args.threads:
+            with Server('wsgi', workers=workers, threads=threads, env=env) as base_url:
+                tokens = login_tokens(base_url, args.concurrency, args.users)
+                step = make_step(sequence, tokens, args.users, args.seed)
+                summary = run_load(base_url, step, args.concurrency, args.duration, args.warmup)
+            results[f'{workers}x{threads}'] = {'workers': workers, 'threads': threads, 'endpoints': summary}
+            total = summary['total']
+            print(
+                f'workers {workers:>2} threads {threads:>2}  {total["throughput_rps"]:9.1f} req/s'
+                f'   p50 {total["p50_ms"] or 0:8.1f} ms   p95 {total["p95_ms"] or 0:8.1f} ms'
+                f'   p99 {total["p99_ms"] or 0:8.1f} ms   errors {total["errors"]}',
+                flush=True,
+            )
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'cpu_count': os.cpu_count(),
+            'concurrency': args.concurrency,
+            'duration_s': args.duration,
+            'users': args.users,
+            'mix': args.mix,
+            'seed': args.seed,
+            'database': env.get('DB_ENGINE') or os.getenv('DB_ENGINE', 'django.db.backends.postgresql'),
+            'password_hasher': os.getenv('PASSWORD_HASHER', 'pbkdf2'),
+            'password_hashing_workers': os.getenv('PASSWORD_HASHING_WORKERS', 'default'),
+            'python': platform.python_version(),
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+    return report
+
+
+if __name__ == '__main__':
+    main()
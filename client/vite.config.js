@@ -4,6 +4,12 @@ import vue from '@vitejs/plugin-vue'
 // https://vitejs.dev/config/
 export default defineConfig({
   plugins: [vue()],
+  // Django serves the build from STATIC_URL + 'spa/' and reads manifest.json
+  // through {% vite_assets %} (reddit_clone/vite.py).
+  base: '/static/spa/',
+  build: {
+    manifest: 'manifest.json',
+  },
   server: {
       port: 8080,
   }
@@ -0,0 +1,56 @@
+"""
+Page caching helpers shared by the project's plain Django views.
+"""
+
+from functools import wraps
+
+from django.conf import settings
+from django.utils.cache import get_cache_key, learn_cache_key, patch_response_headers
+from django.core.cache import caches
+
+
+def cache_anonymous_page(timeout=None, cache_alias='default'):
+    """
+    Cache a page for visitors that are signed out and have no pending
+    flash messages.
+
+    Authenticated pages render the user's email and a CSRF token, and
+    ``messages`` are one-shot, so those requests always reach the view.
+    Pages that render a CSRF token (a form) are not stored either: the
+    token belongs to the visitor's ``csrftoken`` cookie.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            cacheable = (
+                request.method in ('GET', 'HEAD')
+                and not request.user.is_authenticated
+                and 'messages' not in request.COOKIES
+            )
+            if not cacheable:
+                return view_func(request, *args, **kwargs)
+
+            cache = caches[cache_alias]
+            page_timeout = settings.PAGE_CACHE_TIMEOUT if timeout is None else timeout
+            key = get_cache_key(request, 'anonymous-page', 'GET', cache)
+            if key is not None:
+                response = cache.get(key)
+                if response is not None:
+                    return response
+
+            def store(response):
+                # get_token() flags the request once a token is rendered.
+                if not request.META.get('CSRF_COOKIE_NEEDS_UPDATE'):
+                    cache.set(key, response, page_timeout)
+
+            response = view_func(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming:
+                patch_response_headers(response, page_timeout)
+                key = learn_cache_key(request, response, page_timeout, 'anonymous-page', cache)
+                if hasattr(response, 'render') and callable(response.render):
+                    response.add_post_render_callback(store)
+                else:
+                    store(response)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,94 @@
+import importlib.util
+import os
+
+from django.conf import settings
+from django.core.checks import Error, Tags, Warning, register
+from django.db import DatabaseError, connections
+
+from reddit_clone.db import connections_per_process
+
+
+@register(Tags.database)
+def check_database_connections(app_configs, databases=None, **kwargs):
+    """
+    Startup self-check for the connection settings in reddit_clone/db.py.
+
+    Runs with ``manage.py check --database default`` (the release phase)
+    and before ``migrate``.
+    """
+    errors = []
+    for alias in databases or ():
+        settings_dict = settings.DATABASES[alias]
+        pool = settings_dict.get('OPTIONS', {}).get('pool')
+        if pool and not importlib.util.find_spec('psycopg_pool'):
+            errors.append(Error(
+                f"Database '{alias}' is configured with a connection pool but psycopg_pool is not installed.",
+                hint="pip install 'psycopg[pool]' or set DB_POOL=false.",
+                id='reddit_clone.E001',
+            ))
+            continue
+        if settings.DB_CONNECTION_PROFILE == 'asgi' and not pool and settings_dict['CONN_MAX_AGE']:
+            errors.append(Warning(
+                f"Database '{alias}' uses persistent connections under ASGI; Django closes them after "
+                "every async request, so they are never reused.",
+                hint='Set DB_POOL=true (Postgres) or DB_CONN_MAX_AGE=0.',
+                id='reddit_clone.W001',
+            ))
+
+        connection = connections[alias]
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+                if connection.vendor == 'postgresql':
+                    cursor.execute(
+                        "SELECT current_setting('max_connections')::int"
+                        " - current_setting('superuser_reserved_connections')::int"
+                    )
+                    available = cursor.fetchone()[0]
+                else:
+                    available = None
+        except DatabaseError as e:
+            errors.append(Error(
+                f"Could not connect to database '{alias}': {e}",
+                id='reddit_clone.E002',
+            ))
+            continue
+
+        # Every web process may hold up to this many connections at once.
+        processes = int(os.getenv('WEB_CONCURRENCY', 3))
+        threads = int(os.getenv('GUNICORN_THREADS', 2))
+        needed = processes * connections_per_process(settings_dict, threads)
+        if available is not None and needed > available:
+            errors.append(Warning(
+                f"{processes} web processes may open {needed} connections to '{alias}', "
+                f"but the server accepts {available}.",
+                hint='Lower WEB_CONCURRENCY/DB_POOL_MAX_SIZE or raise max_connections.',
+                id='reddit_clone.W002',
+            ))
+    return errors
+
+
+# Backends that keep entries in, or away from, each process.
+UNSHARED_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """
+    Outside DEBUG the default cache must be shared by every worker: cache
+    invalidation (api/cache.py), revoked and consumed tokens
+    (api/authentication.py, api/revocation.py) and the throttles
+    (reddit_clone/throttling.py) only reach the process that wrote them
+    otherwise.
+    """
+    if settings.DEBUG or settings.CACHES['default']['BACKEND'] not in UNSHARED_CACHE_BACKENDS:
+        return []
+    return [Error(
+        "The default cache isn't shared between processes, so invalidations, token revocations "
+        "and throttle counts only reach the worker that made them.",
+        hint='Set CACHE_BACKEND=redis (or file, for a single server) and CACHE_LOCATION.',
+        id='reddit_clone.E003',
+    )]
@@ -0,0 +1,131 @@
+"""
+Database connection management, configured from the environment.
+
+``DB_CONNECTION_PROFILE`` names the kind of process being started and
+picks defaults that suit it:
+
+``wsgi``
+    gunicorn gthread workers: each thread keeps its connection open for
+    ``CONN_MAX_AGE`` seconds, checked before reuse.
+``asgi``
+    uvicorn workers: Django closes connections at the end of every async
+    request, so persistent connections would never be reused. A
+    per-process psycopg pool is used instead.
+``worker``
+    management commands and background workers: long-lived processes with
+    a handful of threads, so a small pool.
+
+Any default can be overridden with ``DB_CONN_MAX_AGE``,
+``DB_CONN_HEALTH_CHECKS``, ``DB_POOL``, ``DB_POOL_MIN_SIZE``,
+``DB_POOL_MAX_SIZE`` and ``DB_POOL_TIMEOUT``. The pool needs psycopg 3
+and Postgres; on SQLite the pool settings are ignored.
+
+Read replicas listed in ``DB_REPLICA_HOSTS`` share the primary's
+settings; reddit_clone/replicas.py routes reads to them.
+"""
+
+import copy
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+
+CONNECTION_PROFILES = {
+    'wsgi': {
+        'conn_max_age': 60,
+        'health_checks': True,
+        'pool': False,
+        'pool_min_size': 1,
+        'pool_max_size': 4,
+        'pool_timeout': 10,
+    },
+    'asgi': {
+        'conn_max_age': 0,
+        'health_checks': False,
+        'pool': True,
+        'pool_min_size': 2,
+        'pool_max_size': 10,
+        'pool_timeout': 10,
+    },
+    'worker': {
+        'conn_max_age': 0,
+        'health_checks': False,
+        'pool': True,
+        'pool_min_size': 1,
+        'pool_max_size': 4,
+        'pool_timeout': 30,
+    },
+}
+
+
+def env_bool(environ, name, default):
+    value = environ.get(name)
+    if value is None or value == '':
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def env_int(environ, name, default):
+    value = environ.get(name)
+    return default if value is None or value == '' else int(value)
+
+
+def connection_profile(environ=os.environ):
+    return environ.get('DB_CONNECTION_PROFILE', 'wsgi')
+
+
+def connection_settings(engine, environ=os.environ):
+    """
+    Return the ``CONN_MAX_AGE``, ``CONN_HEALTH_CHECKS`` and ``OPTIONS``
+    entries for a ``DATABASES`` alias.
+    """
+    name = connection_profile(environ)
+    if name not in CONNECTION_PROFILES:
+        raise ImproperlyConfigured(
+            f"DB_CONNECTION_PROFILE must be one of {', '.join(CONNECTION_PROFILES)}, not {name!r}."
+        )
+    profile = CONNECTION_PROFILES[name]
+    use_pool = env_bool(environ, 'DB_POOL', profile['pool']) and engine.endswith('postgresql')
+    options = {}
+    if use_pool:
+        options['pool'] = {
+            'min_size': env_int(environ, 'DB_POOL_MIN_SIZE', profile['pool_min_size']),
+            'max_size': env_int(environ, 'DB_POOL_MAX_SIZE', profile['pool_max_size']),
+            'timeout': env_int(environ, 'DB_POOL_TIMEOUT', profile['pool_timeout']),
+        }
+    return {
+        # Django refuses persistent connections on top of a pool.
+        'CONN_MAX_AGE': 0 if use_pool else env_int(environ, 'DB_CONN_MAX_AGE', profile['conn_max_age']),
+        'CONN_HEALTH_CHECKS': env_bool(environ, 'DB_CONN_HEALTH_CHECKS', profile['health_checks']),
+        'OPTIONS': options,
+    }
+
+
+def connections_per_process(settings_dict, threads=1):
+    """Upper bound of connections one server process holds open."""
+    pool = settings_dict.get('OPTIONS', {}).get('pool')
+    if pool:
+        return pool['max_size'] if isinstance(pool, dict) else 4
+    return threads
+
+
+def replica_databases(primary, environ=os.environ):
+    """
+    ``DATABASES`` entries for the read replicas in ``DB_REPLICA_HOSTS``, a
+    comma-separated list of ``host[:port]``.
+
+    Each is a copy of ``primary`` named ``replica1``, ``replica2``, ... and
+    a test mirror of ``default``, so test runs don't need the replicas.
+    """
+    replicas = {}
+    hosts = [host.strip() for host in environ.get('DB_REPLICA_HOSTS', '').split(',') if host.strip()]
+    for number, address in enumerate(hosts, 1):
+        host, _, port = address.partition(':')
+        replicas[f'replica{number}'] = {
+            **primary,
+            'OPTIONS': copy.deepcopy(primary.get('OPTIONS', {})),
+            'HOST': host,
+            'PORT': port or primary.get('PORT'),
+            'TEST': {'MIRROR': 'default'},
+        }
+    return replicas
@@ -0,0 +1,23 @@
+"""
+Gunicorn settings for the ASGI deployment profile.
+
+    gunicorn reddit_clone.asgi:application -c reddit_clone/gunicorn_asgi.py
+
+Each worker is a single-threaded uvicorn event loop, so the async views
+under /api/async/ overlap their database and hashing waits; sync views
+still run on Django's thread-sensitive executor. At equal cores use one
+worker per core instead of the WSGI profile's ``--workers 3 --threads 2``.
+"""
+
+import multiprocessing
+import os
+
+# Pooled connections instead of per-thread persistent ones; see reddit_clone/db.py
+os.environ.setdefault('DB_CONNECTION_PROFILE', 'asgi')
+
+bind = os.getenv('GUNICORN_BIND', f"0.0.0.0:{os.getenv('PORT', '8000')}")
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = 'uvicorn_worker.UvicornWorker'
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+graceful_timeout = 30
+timeout = 60
@@ -0,0 +1,246 @@
+"""
+Per-request instrumentation.
+
+``RequestInstrumentationMiddleware`` records, for every request, the
+number of SQL queries, time spent in the database, time spent in DRF
+serializers and the total time, keyed by the resolved URL name
+(``api:signup``, ``accounts:login`` and so on). With
+``SERVER_TIMING_HEADER`` (on under DEBUG) each response carries them as a
+``Server-Timing`` header; the per-process aggregates are served by the
+admin-only ``api:metrics`` endpoint.
+
+Serializer time only covers views that use ``InstrumentedViewMixin``. It
+includes queries run by validators, which also count towards DB time.
+"""
+
+import contextvars
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from rest_framework.serializers import ListSerializer
+
+from reddit_clone import profiling
+from reddit_clone.metrics import Histogram
+
+
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class RequestStats:
+    __slots__ = ('started', 'queries', 'db_time', 'serializer_time', 'serializer_depth')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+
+
+_current = contextvars.ContextVar('request_stats', default=None)
+
+
+def current_stats():
+    return _current.get()
+
+
+def record_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.db_time += time.perf_counter() - started
+        stats.queries += 1
+
+
+def install_query_recorder(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def on_connection_created(sender, connection, **kwargs):
+    install_query_recorder(connection)
+
+
+# Covers connections opened in other threads, e.g. by sync_to_async under ASGI.
+connection_created.connect(on_connection_created, dispatch_uid='reddit_clone.instrumentation')
+
+
+@contextmanager
+def serializer_timer():
+    """Add the enclosed time to the current request's serializer time."""
+    stats = _current.get()
+    if stats is None:
+        yield
+        return
+    # Nested serializers are already inside the outer one's time.
+    stats.serializer_depth += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.serializer_depth -= 1
+        if not stats.serializer_depth:
+            stats.serializer_time += time.perf_counter() - started
+
+
+class RouteMetrics:
+    def __init__(self):
+        self.total_seconds = Histogram()
+        self.db_seconds = Histogram()
+        self.serializer_seconds = Histogram()
+        self.queries = Histogram(buckets=QUERY_BUCKETS)
+        self.statuses = defaultdict(int)
+
+    def snapshot(self):
+        return {
+            'requests': self.total_seconds.count,
+            'statuses': dict(self.statuses),
+            'total_seconds': self.total_seconds.snapshot(),
+            'db_seconds': self.db_seconds.snapshot(),
+            'serializer_seconds': self.serializer_seconds.snapshot(),
+            'queries': self.queries.snapshot(),
+        }
+
+
+class Registry:
+    def __init__(self):
+        self.routes = defaultdict(RouteMetrics)
+        self._lock = threading.Lock()
+
+    def record(self, route, status, stats, total):
+        with self._lock:
+            metrics = self.routes[route]
+            metrics.statuses[str(status)] += 1
+        metrics.total_seconds.observe(total)
+        metrics.db_seconds.observe(stats.db_time)
+        metrics.serializer_seconds.observe(stats.serializer_time)
+        metrics.queries.observe(stats.queries)
+
+    def snapshot(self):
+        with self._lock:
+            routes = dict(self.routes)
+        return {route: metrics.snapshot() for route, metrics in sorted(routes.items())}
+
+    def reset(self):
+        with self._lock:
+            self.routes.clear()
+
+
+registry = Registry()
+
+
+def route_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '<unresolved>'
+    return match.view_name or match._func_path
+
+
+def server_timing(stats, total):
+    return ', '.join((
+        f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries"',
+        f'serializer;dur={stats.serializer_time * 1000:.1f}',
+        f'total;dur={total * 1000:.1f}',
+    ))
+
+
+class RequestInstrumentationMiddleware:
+    """
+    Time every request and, when ``PROFILE_SAMPLE_RATE`` is set, profile a
+    sample of them; see ``reddit_clone.profiling``.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection)
+        stats = RequestStats()
+        token = _current.set(stats)
+        try:
+            with profiling.maybe_profile() as profile:
+                response = self.get_response(request)
+            return self.finish(request, response, stats, profile)
+        finally:
+            _current.reset(token)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        try:
+            with profiling.maybe_profile() as profile:
+                response = await self.get_response(request)
+            return self.finish(request, response, stats, profile)
+        finally:
+            _current.reset(token)
+
+    def finish(self, request, response, stats, profile):
+        total = time.perf_counter() - stats.started
+        route = route_name(request)
+        registry.record(route, response.status_code, stats, total)
+        if profile is not None:
+            profile.dump_if_slow(route, total)
+        if settings.SERVER_TIMING_HEADER:
+            response['Server-Timing'] = server_timing(stats, total)
+        return response
+
+
+class TimedSerializerMixin:
+    @property
+    def data(self):
+        with serializer_timer():
+            return super().data
+
+    def is_valid(self, *args, **kwargs):
+        with serializer_timer():
+            return super().is_valid(*args, **kwargs)
+
+
+_timed_classes = {}
+
+
+def timed_serializer(serializer_class):
+    """Return a subclass of ``serializer_class`` whose work is timed."""
+    if serializer_class not in _timed_classes:
+        attrs = {'__module__': serializer_class.__module__}
+        meta = getattr(serializer_class, 'Meta', None)
+        list_class = getattr(meta, 'list_serializer_class', None)
+        if list_class is None:
+            list_class = ListSerializer
+        bases = (meta,) if meta is not None else ()
+        attrs['Meta'] = type('Meta', bases, {
+            'list_serializer_class': type(f'Timed{list_class.__name__}', (TimedSerializerMixin, list_class), {}),
+        })
+        _timed_classes[serializer_class] = type(
+            serializer_class.__name__, (TimedSerializerMixin, serializer_class), attrs
+        )
+    return _timed_classes[serializer_class]
+
+
+class InstrumentedViewMixin:
+    """DRF view mixin: count time in ``is_valid()`` and ``.data`` as serializer time."""
+
+    def get_serializer_class(self):
+        serializer_class = super().get_serializer_class()
+        if getattr(self, 'swagger_fake_view', False):
+            # Schema generation: keep the real class for component names
+            # and drf-spectacular's serializer extensions.
+            return serializer_class
+        return timed_serializer(serializer_class)
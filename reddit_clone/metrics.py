@@ -0,0 +1,58 @@
+"""
+In-process metrics shared by the project's instrumentation.
+
+Each worker process keeps its own counters; they are cheap enough to record
+on every request and are read through the admin-only metrics endpoints.
+"""
+
+import bisect
+import threading
+
+
+# Upper bounds in seconds, roughly doubling from 1ms to 10s.
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+            self.max = max(self.max, value)
+
+    def snapshot(self):
+        with self._lock:
+            cumulative, running = {}, 0
+            for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+                running += count
+                cumulative[str(bound)] = running
+            return {
+                'count': self.count,
+                'sum': round(self.sum, 6),
+                'max': round(self.max, 6),
+                'mean': round(self.sum / self.count, 6) if self.count else 0.0,
+                'buckets': cumulative,
+            }
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
@@ -0,0 +1,96 @@
+import contextvars
+import threading
+import weakref
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.db.backends.signals import connection_created
+
+from reddit_clone.metrics import Counter, Histogram
+
+
+class ConnectionMetrics:
+    def __init__(self):
+        self.requests = Counter()
+        self.opened = Counter()
+        self.opened_in_requests = Counter()
+        self.per_request = Histogram(buckets=(0, 1, 2, 3, 5))
+
+    def snapshot(self):
+        requests = self.requests.value
+        return {
+            'requests': requests,
+            'connections_opened': self.opened.value,
+            'connections_opened_in_requests': self.opened_in_requests.value,
+            'connections_per_request': round(self.opened_in_requests.value / requests, 4) if requests else 0.0,
+            'per_request': self.per_request.snapshot(),
+        }
+
+
+metrics = ConnectionMetrics()
+
+_request_opened = contextvars.ContextVar('db_connections_opened', default=None)
+# Physical connections already counted, so a pooled connection handed out
+# again (which re-sends connection_created) is not counted twice.
+_seen = weakref.WeakSet()
+_seen_lock = threading.Lock()
+
+
+def count_connection(sender, connection, **kwargs):
+    raw = connection.connection
+    try:
+        with _seen_lock:
+            if raw in _seen:
+                return
+            _seen.add(raw)
+    except TypeError:
+        pass
+    metrics.opened.inc()
+    opened = _request_opened.get()
+    if opened is not None:
+        opened.append(connection.alias)
+
+
+connection_created.connect(count_connection, dispatch_uid='reddit_clone.count_connection')
+
+
+class DatabaseConnectionMetricsMiddleware:
+    """
+    Count the database connections each request opens.
+
+    Adds ``X-DB-Connections-Opened`` to every response and aggregates the
+    per-process totals in ``metrics``. With persistent connections or a
+    pool the steady-state value is 0; without them it is 1 per request that
+    touches the database.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _request_opened.set([])
+        try:
+            response = self.get_response(request)
+            return self.record(response, _request_opened.get())
+        finally:
+            _request_opened.reset(token)
+
+    async def __acall__(self, request):
+        token = _request_opened.set([])
+        try:
+            response = await self.get_response(request)
+            return self.record(response, _request_opened.get())
+        finally:
+            _request_opened.reset(token)
+
+    def record(self, response, opened):
+        metrics.requests.inc()
+        metrics.opened_in_requests.inc(len(opened))
+        metrics.per_request.observe(len(opened))
+        response['X-DB-Connections-Opened'] = str(len(opened))
+        return response
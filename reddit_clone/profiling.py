@@ -0,0 +1,123 @@
+"""
+Sampling profiler for slow requests.
+
+A ``PROFILE_SAMPLE_RATE`` fraction of requests run under a profiler; those
+that take longer than ``PROFILE_SLOW_REQUEST_MS`` are written to
+``PROFILE_DIR``:
+
+``PROFILE_MODE = 'sampler'`` (default)
+    A background thread samples the request thread's stack every
+    ``PROFILE_SAMPLER_INTERVAL_MS`` and writes collapsed stacks
+    (``*.folded``), one ``frame;frame;frame count`` line per stack, ready
+    for flamegraph.pl, speedscope or inferno. Overhead is low enough to
+    leave on for a small sample in production.
+``PROFILE_MODE = 'cprofile'``
+    Deterministic ``cProfile`` stats (``*.prof``), for snakeviz or
+    ``flameprof``. Slows the profiled request down noticeably.
+
+Under ASGI the sampled thread is the event loop, so other requests
+interleaved with the slow one show up in its profile.
+"""
+
+import cProfile
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from django.conf import settings
+
+
+class StackSampler:
+    def __init__(self, interval):
+        self.interval = interval
+        self.thread_id = threading.get_ident()
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self.run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+
+
+class Profile:
+    def __init__(self, mode):
+        self.mode = mode
+        if mode == 'cprofile':
+            self.profiler = cProfile.Profile()
+        else:
+            self.profiler = StackSampler(settings.PROFILE_SAMPLER_INTERVAL_MS / 1000)
+
+    def start(self):
+        if self.mode == 'cprofile':
+            self.profiler.enable()
+        else:
+            self.profiler.start()
+
+    def stop(self):
+        if self.mode == 'cprofile':
+            self.profiler.disable()
+        else:
+            self.profiler.stop()
+
+    def dump_if_slow(self, route, seconds):
+        """Write the profile when the request took longer than the threshold."""
+        elapsed_ms = seconds * 1000
+        if elapsed_ms < settings.PROFILE_SLOW_REQUEST_MS:
+            return None
+        os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+        name = re.sub(r'[^\w.-]+', '_', route)
+        extension = 'prof' if self.mode == 'cprofile' else 'folded'
+        path = os.path.join(
+            settings.PROFILE_DIR,
+            f'{time.strftime("%Y%m%dT%H%M%S")}-{os.getpid()}-{name}-{elapsed_ms:.0f}ms.{extension}',
+        )
+        if self.mode == 'cprofile':
+            self.profiler.dump_stats(path)
+        else:
+            self.profiler.dump(path)
+        return path
+
+
+@contextmanager
+def maybe_profile():
+    """Profile the enclosed block for a ``PROFILE_SAMPLE_RATE`` sample of calls."""
+    rate = settings.PROFILE_SAMPLE_RATE
+    if not rate or random.random() >= rate:
+        yield None
+        return
+    profile = Profile(settings.PROFILE_MODE)
+    try:
+        profile.start()
+    except ValueError:
+        # Another cProfile is already active on this thread.
+        yield None
+        return
+    try:
+        yield profile
+    finally:
+        profile.stop()
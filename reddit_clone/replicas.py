@@ -0,0 +1,287 @@
+"""
+Read replica routing with read-your-writes.
+
+``ReplicaRouter`` sends every write to the primary (``default``) and, once
+``ReadReplicaMiddleware`` has picked a replica for a safe request (GET,
+HEAD, OPTIONS), its reads to that replica. Other requests, management
+commands and workers read from the primary, and so does the rest of a
+request after its first write.
+
+A client that has just written is pinned to the primary so that it sees
+its own writes: a successful unsafe request sets a signed cookie with the
+time of the write, and tokens issued at sign-in carry their issue time in
+the ``pin`` claim (see api/tokens.py), for clients that keep no cookies. A
+pin lasts ``REPLICA_PIN_SECONDS``. It isn't cut short when a replica looks
+caught up: the lag measured below doesn't see WAL the replica hasn't
+received yet, so a replica may look current before the write has reached it.
+
+``ReplicaMonitor`` measures each replica's lag at most every
+``REPLICA_LAG_CHECK_INTERVAL`` seconds per process. Replicas further behind
+than ``REPLICA_MAX_LAG_SECONDS``, or that can't be reached, are skipped;
+with none left, reads fall back to the primary.
+"""
+
+import contextvars
+import logging
+import random
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core import signing
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from reddit_clone.metrics import Counter
+
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PIN_CLAIM = 'pin'
+PIN_SALT = 'reddit_clone.replicas'
+
+# A replica with nothing left to replay is current, however long ago the
+# primary last committed; otherwise it is as far behind as the last
+# transaction it replayed. WAL not yet received is not accounted for.
+LAG_QUERY = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+"""
+
+
+class ReplicaMetrics:
+    def __init__(self):
+        self.replica_reads = Counter()
+        self.pinned_reads = Counter()
+        self.fallback_reads = Counter()
+        self.pins = Counter()
+
+    def snapshot(self):
+        return {
+            'replica_reads': self.replica_reads.value,
+            'pinned_reads': self.pinned_reads.value,
+            'fallback_reads': self.fallback_reads.value,
+            'pins': self.pins.value,
+            'replicas': {
+                alias: {'checked_at': checked_at, 'lag': lag}
+                for alias, (checked_at, lag) in sorted(monitor.status.items())
+            },
+        }
+
+
+metrics = ReplicaMetrics()
+
+
+def probe_lag(alias):
+    """Seconds ``alias`` is behind the primary, or None if it can't be reached."""
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        # Replication lag is only measured on Postgres; other replicas are
+        # taken to be current.
+        return 0.0
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(LAG_QUERY)
+            lag = cursor.fetchone()[0]
+    except DatabaseError:
+        logger.warning('Replica %s is unreachable', alias, exc_info=True)
+        return None
+    return None if lag is None else max(0.0, float(lag))
+
+
+class ReplicaMonitor:
+    """
+    What this process last learned of every replica: when it was checked
+    and its lag (None if unreachable).
+    """
+
+    def __init__(self):
+        self.status = {}
+        self._probing = set()
+        self._lock = threading.Lock()
+
+    def record(self, alias, lag, checked_at=None):
+        self.status[alias] = (time.time() if checked_at is None else checked_at, lag)
+
+    def reset(self):
+        self.status = {}
+
+    def check(self, alias):
+        status = self.status.get(alias)
+        if status is not None and time.time() - status[0] < settings.REPLICA_LAG_CHECK_INTERVAL:
+            return status
+        with self._lock:
+            if alias in self._probing:
+                # Another thread is measuring; go by the last result meanwhile.
+                return status or (0.0, None)
+            self._probing.add(alias)
+        try:
+            self.record(alias, probe_lag(alias))
+        finally:
+            with self._lock:
+                self._probing.discard(alias)
+        return self.status[alias]
+
+
+monitor = ReplicaMonitor()
+
+
+def choose_replica():
+    """A replica within ``REPLICA_MAX_LAG_SECONDS`` of the primary; None if there is none."""
+    candidates = []
+    for alias in settings.DATABASE_REPLICAS:
+        checked_at, lag = monitor.check(alias)
+        if lag is not None and lag <= settings.REPLICA_MAX_LAG_SECONDS:
+            candidates.append(alias)
+    return random.choice(candidates) if candidates else None
+
+
+def token_pin(request):
+    parts = request.META.get('HTTP_AUTHORIZATION', '').split()
+    if len(parts) != 2 or parts[0] not in jwt_settings.AUTH_HEADER_TYPES:
+        return None
+    try:
+        return AccessToken(parts[1]).get(PIN_CLAIM)
+    except TokenError:
+        return None
+
+
+def pinned_since(request):
+    """When the client last wrote, if less than ``REPLICA_PIN_SECONDS`` ago."""
+    window = settings.REPLICA_PIN_SECONDS
+    writes = [token_pin(request)]
+    try:
+        writes.append(float(request.get_signed_cookie(
+            settings.REPLICA_PIN_COOKIE, None, salt=PIN_SALT, max_age=window
+        )))
+    except (TypeError, ValueError, signing.BadSignature):
+        pass
+    writes = [written_at for written_at in writes if isinstance(written_at, (int, float))]
+    if not writes or time.time() - max(writes) >= window:
+        return None
+    return max(writes)
+
+
+def pin(response, written_at):
+    response.set_signed_cookie(
+        settings.REPLICA_PIN_COOKIE,
+        f'{written_at:.3f}',
+        salt=PIN_SALT,
+        max_age=settings.REPLICA_PIN_SECONDS,
+        secure=settings.SESSION_COOKIE_SECURE,
+        httponly=True,
+        samesite='Lax',
+    )
+    metrics.pins.inc()
+
+
+class Route:
+    """The database the current request reads from; None is the primary."""
+
+    def __init__(self, alias=None):
+        self.alias = alias
+
+
+_route = contextvars.ContextVar('db_read_route', default=None)
+
+
+def read_alias():
+    """The replica the current request reads from, if any."""
+    route = _route.get()
+    return route.alias if route is not None else None
+
+
+def cache_timeout(timeout):
+    """
+    ``timeout`` capped for a response read from a replica, which may have
+    missed the write that last invalidated the cache.
+    """
+    if read_alias() is None:
+        return timeout
+    lag = settings.REPLICA_MAX_LAG_SECONDS
+    return lag if timeout is None else min(timeout, lag)
+
+
+class ReplicaRouter:
+    """Writes to the primary, reads to the replica the middleware picked."""
+
+    def db_for_read(self, model, **hints):
+        route = _route.get()
+        if route is None:
+            return None
+        return route.alias or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        route = _route.get()
+        if route is not None:
+            # Read this write back for the rest of the request.
+            route.alias = None
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        cluster = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in cluster and obj2._state.db in cluster:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get the schema by replication.
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+class ReadReplicaMiddleware:
+    """
+    Route the reads of safe requests to a replica, and pin clients that
+    write to the primary.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _route.set(self.route(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _route.reset(token)
+        return self.finish(request, response)
+
+    async def __acall__(self, request):
+        token = _route.set(self.route(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _route.reset(token)
+        return self.finish(request, response)
+
+    def route(self, request):
+        if request.method not in SAFE_METHODS or not settings.DATABASE_REPLICAS:
+            return Route()
+        if pinned_since(request) is not None:
+            metrics.pinned_reads.inc()
+            return Route()
+        alias = choose_replica()
+        if alias is not None:
+            metrics.replica_reads.inc()
+        else:
+            metrics.fallback_reads.inc()
+        return Route(alias)
+
+    def finish(self, request, response):
+        if request.method not in SAFE_METHODS and response.status_code < 400 and settings.DATABASE_REPLICAS:
+            pin(response, time.time())
+        return response
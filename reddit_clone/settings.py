@@ -12,12 +12,17 @@ https://docs.djangoproject.com/en/3.1/ref/settings/
 
 from pathlib import Path
 import os
+import re
 from datetime import timedelta
 from dotenv import load_dotenv
 
+from reddit_clone.db import connection_profile, connection_settings, env_bool, replica_databases
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+load_dotenv()
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/3.1/howto/deployment/checklist/
@@ -26,7 +31,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = 't55x2*!cyr@(wu80sc=85mg#p$$z*5r)#ypourwe2ga&$3c+p#'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = env_bool(os.environ, 'DEBUG', True)
 
 ALLOWED_HOSTS = ['206.81.29.244', 'localhost', 'http://softgenie.org', 'softgenie.org', 'www.softgenie.org']
 
@@ -62,14 +67,22 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Outermost, so time and connections spent in any other middleware are counted
+    'reddit_clone.instrumentation.RequestInstrumentationMiddleware',
+    'reddit_clone.middleware.DatabaseConnectionMetricsMiddleware',
+    # Before anything that reads the database; see reddit_clone/replicas.py
+    'reddit_clone.replicas.ReadReplicaMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # Serves STATIC_ROOT when nginx doesn't (see default.conf), with sendfile
+    'whitenoise.middleware.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'accounts.middleware.HashingBackpressureMiddleware',
 ]
 
 ROOT_URLCONF = 'reddit_clone.urls'
@@ -82,6 +95,9 @@ TEMPLATES = [
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
+            'libraries': {
+                'vite': 'reddit_clone.vite',
+            },
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -94,22 +110,87 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'reddit_clone.wsgi.application'
 
+# Turns login throttling off and uses plain static storage for the test suite,
+# see reddit_clone/test_runner.py
+TEST_RUNNER = 'reddit_clone.test_runner.TestRunner'
+
 
 # Database
 # https://docs.djangoproject.com/en/3.1/ref/settings/#databases
 
-load_dotenv()
+# DB_ENGINE=django.db.backends.sqlite3 runs the project and its test suite
+# without Postgres; Postgres-only indexes and queries fall back accordingly.
+DB_ENGINE = os.getenv('DB_ENGINE', 'django.db.backends.postgresql')
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': os.getenv('DB_NAME'),
+        'ENGINE': DB_ENGINE,
+        'NAME': os.getenv('DB_NAME', BASE_DIR / 'db.sqlite3' if DB_ENGINE.endswith('sqlite3') else None),
         'USER': os.getenv('DB_USER'),
         'PASSWORD': os.getenv('DB_PASSWORD'),
         'HOST': os.getenv('DB_HOST'),
         'PORT': os.getenv('DB_PORT'),
+        # Persistent connections, health checks and pooling; see reddit_clone/db.py
+        **connection_settings(DB_ENGINE),
     }
 }
+DB_CONNECTION_PROFILE = connection_profile()
+
+# Read replicas (see reddit_clone/replicas.py): DB_REPLICA_HOSTS adds a
+# replicaN alias per host. Safe requests read from a replica at most
+# REPLICA_MAX_LAG_SECONDS behind, measured every REPLICA_LAG_CHECK_INTERVAL
+# seconds; a client that writes reads from the primary for
+# REPLICA_PIN_SECONDS afterwards
+DATABASES.update(replica_databases(DATABASES['default']))
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['reddit_clone.replicas.ReplicaRouter']
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 10))
+REPLICA_MAX_LAG_SECONDS = float(os.getenv('REPLICA_MAX_LAG_SECONDS', 5.0))
+REPLICA_LAG_CHECK_INTERVAL = float(os.getenv('REPLICA_LAG_CHECK_INTERVAL', 1.0))
+REPLICA_PIN_COOKIE = 'db_pin'
+
+# Cache
+# CACHE_BACKEND picks locmem (default, per process), file or redis. The
+# redis backend needs the redis package and works with any Redis-compatible
+# server; CACHE_LOCATION is the directory or the server URL. Without DEBUG
+# the cache must be shared by all workers (check reddit_clone.E003).
+
+CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'reddit-clone'),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', os.path.join(BASE_DIR, '.cache')),
+    'redis': ('django.core.cache.backends.redis.RedisCache', 'redis://127.0.0.1:6379/1'),
+}
+CACHE_BACKEND, CACHE_DEFAULT_LOCATION = CACHE_BACKENDS[os.getenv('CACHE_BACKEND', 'locmem')]
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.getenv('CACHE_LOCATION', CACHE_DEFAULT_LOCATION),
+        'TIMEOUT': int(os.getenv('CACHE_TIMEOUT', 300)),
+        'KEY_PREFIX': 'reddit_clone',
+    }
+}
+
+# Seconds anonymous pages (reddit_clone.cache.cache_anonymous_page) and the
+# API schema are cached for
+PAGE_CACHE_TIMEOUT = int(os.getenv('PAGE_CACHE_TIMEOUT', 60 * 15))
+
+# Seconds a cached API response (api.cache.CachedResponseMixin) lives if no
+# write invalidates it first
+API_RESPONSE_CACHE_TIMEOUT = int(os.getenv('API_RESPONSE_CACHE_TIMEOUT', 60))
+
+# Request instrumentation (see reddit_clone/instrumentation.py)
+# Add a Server-Timing header with query count, DB, serializer and total time.
+# Every client sees it, so it is off unless DEBUG.
+SERVER_TIMING_HEADER = env_bool(os.environ, 'SERVER_TIMING_HEADER', DEBUG)
+# Fraction of requests run under a profiler (0 disables), see reddit_clone/profiling.py
+PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+# Profiled requests slower than this are written to PROFILE_DIR
+PROFILE_SLOW_REQUEST_MS = float(os.getenv('PROFILE_SLOW_REQUEST_MS', 500))
+# 'sampler' (collapsed stacks for flame graphs) or 'cprofile'
+PROFILE_MODE = os.getenv('PROFILE_MODE', 'sampler')
+PROFILE_SAMPLER_INTERVAL_MS = float(os.getenv('PROFILE_SAMPLER_INTERVAL_MS', 5))
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(BASE_DIR, 'profiles'))
 
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
@@ -129,6 +210,53 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing (see accounts/hashing.py)
+# PASSWORD_HASHER picks the hasher for new passwords: pbkdf2 (default),
+# scrypt or argon2 (needs argon2-cffi). The others stay listed so existing
+# hashes keep verifying and are upgraded on the next successful login.
+PASSWORD_HASHER_CLASSES = {
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'scrypt': 'django.contrib.auth.hashers.ScryptPasswordHasher',
+    'argon2': 'django.contrib.auth.hashers.Argon2PasswordHasher',
+}
+PASSWORD_HASHER = os.getenv('PASSWORD_HASHER', 'pbkdf2')
+PASSWORD_HASHERS = [PASSWORD_HASHER_CLASSES.get(PASSWORD_HASHER, PASSWORD_HASHER)] + [
+    hasher for name, hasher in PASSWORD_HASHER_CLASSES.items() if name != PASSWORD_HASHER
+] + ['django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher']
+
+# Hashes that may be queued or running per web process before requests get a
+# 503. A gthread worker can't have more requests in flight than its threads
+# (GUNICORN_THREADS, as in the Procfile), so the default leaves one of them
+# to requests that don't hash. Under ASGI requests aren't bounded that way.
+PASSWORD_HASHING_MAX_QUEUE = int(os.getenv(
+    'PASSWORD_HASHING_MAX_QUEUE',
+    16 if DB_CONNECTION_PROFILE == 'asgi' else max(int(os.getenv('GUNICORN_THREADS', 2)) - 1, 1),
+))
+# Worker processes per web process that run password hashing; 0 hashes
+# inline. Processes beyond PASSWORD_HASHING_MAX_QUEUE never get work, so the
+# default is one per queue slot, up to one per core.
+PASSWORD_HASHING_WORKERS = int(os.getenv(
+    'PASSWORD_HASHING_WORKERS', min(PASSWORD_HASHING_MAX_QUEUE, os.cpu_count() or 1)
+))
+# Seconds a request waits for a queue slot before giving up. A PBKDF2 hash
+# takes about 0.4s, so the default lets a request wait out a few of them
+# rather than fail behind the first one.
+PASSWORD_HASHING_QUEUE_TIMEOUT = float(os.getenv('PASSWORD_HASHING_QUEUE_TIMEOUT', 2.0))
+# Retry-After sent with the 503
+PASSWORD_HASHING_RETRY_AFTER = int(os.getenv('PASSWORD_HASHING_RETRY_AFTER', 1))
+# spawn keeps pool workers clear of locks held by the threaded web process
+PASSWORD_HASHING_START_METHOD = os.getenv('PASSWORD_HASHING_START_METHOD', 'spawn')
+
+# Login and refresh throttling (see reddit_clone/throttling.py)
+THROTTLING_ENABLED = env_bool(os.environ, 'THROTTLING_ENABLED', True)
+
+
+def throttle_rate(name, default):
+    """A DRF rate string such as '10/min' from the environment; 'none' disables."""
+    value = os.getenv(name, default)
+    return None if value.lower() in ('', 'none') else value
+
+
 # Docs settings
 SPECTACULAR_SETTINGS = {
     'TITLE': 'A Feature rich Reddit clone in Django',
@@ -138,19 +266,34 @@ SPECTACULAR_SETTINGS = {
     # OTHER SETTINGS
 }
 
+# Where manage.py generate_schema writes the schema served by /api-schema/
+API_SCHEMA_DIR = os.path.join(BASE_DIR, 'schema')
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
         'rest_framework.permissions.IsAdminUser',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.JWTAuthentication',
         'rest_framework.authentication.TokenAuthentication',
     ],
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
     'PAGE_SIZE': 50,
-    'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    'DEFAULT_SCHEMA_CLASS': 'api.openapi.AutoSchema',
+    # <view.throttle_scope>_<ip|email|global>, counted over a sliding window
+    'DEFAULT_THROTTLE_RATES': {
+        'login_ip': throttle_rate('THROTTLE_LOGIN_IP', '30/min'),
+        'login_email': throttle_rate('THROTTLE_LOGIN_EMAIL', '10/min'),
+        'login_global': throttle_rate('THROTTLE_LOGIN_GLOBAL', '3000/min'),
+        'refresh_ip': throttle_rate('THROTTLE_REFRESH_IP', '120/min'),
+        'refresh_global': throttle_rate('THROTTLE_REFRESH_GLOBAL', '6000/min'),
+    },
+    # Proxies in front of gunicorn (nginx, or the Heroku router). The client IP
+    # throttled on is the X-Forwarded-For entry the outermost of them added;
+    # earlier entries are whatever the client sent. 0 uses REMOTE_ADDR.
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', 1)),
     # 'DEFAULT_PERMISSION_CLASSES': [
     #     'rest_framework.permissions.IsAuthenticated',
     # ]
@@ -160,11 +303,54 @@ SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(days=1),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
     "TOKEN_OBTAIN_SERIALIZER": "api.serializers.CustomTokenObtainPairSerializer",
-    
+    # Each refresh token works once; see api/revocation.py
+    "ROTATE_REFRESH_TOKENS": True,
+    "TOKEN_REFRESH_SERIALIZER": "api.serializers.RotatingTokenRefreshSerializer",
     "AUTH_HEADER_TYPES": ("Bearer", ),
     "AUTH_HEADER_NAME": "HTTP_AUTHORIZATION",
 }
 
+# Seconds a user's is_active flag and token generation are cached for
+# api.authentication.StatelessJWTAuthentication
+AUTH_USER_STATE_CACHE_TIMEOUT = 300
+
+# Bloom filters of used refresh tokens (api.revocation.UsedTokenStore): one
+# bucket per REFRESH_TOKEN_BLOOM_BUCKET_SECONDS of token expiry, sized for
+# REFRESH_TOKEN_BLOOM_CAPACITY refreshes at the given false positive rate
+# and split into REFRESH_TOKEN_BLOOM_SHARDS cache keys
+REFRESH_TOKEN_BLOOM_BUCKET_SECONDS = int(os.getenv('REFRESH_TOKEN_BLOOM_BUCKET_SECONDS', 3600))
+REFRESH_TOKEN_BLOOM_CAPACITY = int(os.getenv('REFRESH_TOKEN_BLOOM_CAPACITY', 100_000))
+REFRESH_TOKEN_BLOOM_ERROR_RATE = float(os.getenv('REFRESH_TOKEN_BLOOM_ERROR_RATE', 1e-6))
+REFRESH_TOKEN_BLOOM_SHARDS = int(os.getenv('REFRESH_TOKEN_BLOOM_SHARDS', 64))
+
+# Votes are folded into post and comment counters in batches (api.votes):
+# a process flushes its buffered votes once it holds VOTE_FLUSH_SIZE of them
+# or the oldest is VOTE_FLUSH_INTERVAL seconds old
+VOTE_FLUSH_SIZE = int(os.getenv('VOTE_FLUSH_SIZE', 500))
+VOTE_FLUSH_INTERVAL = float(os.getenv('VOTE_FLUSH_INTERVAL', 2.0))
+# the job workers apply votes left pending by any process this often
+VOTE_SWEEP_INTERVAL = float(os.getenv('VOTE_SWEEP_INTERVAL', 60.0))
+
+# Text search configuration for the search index on Postgres (api.search)
+SEARCH_CONFIG = os.getenv('SEARCH_CONFIG', 'english')
+
+# Background jobs (api.jobs), run by `manage.py run_workers`. Each worker
+# claims JOBS_BATCH_SIZE jobs at a time and polls every JOBS_POLL_INTERVAL
+# seconds when idle; a claimed job not finished within JOBS_LEASE_SECONDS
+# runs again. Failed jobs are retried up to JOBS_MAX_ATTEMPTS times, waiting
+# JOBS_RETRY_BASE_DELAY seconds and doubling up to JOBS_RETRY_MAX_DELAY.
+# Failed jobs are deleted JOBS_FAILED_RETENTION_DAYS after their last attempt.
+# JOBS_EAGER runs jobs when they are enqueued instead, without workers
+JOBS_EAGER = env_bool(os.environ, 'JOBS_EAGER', False)
+JOBS_BATCH_SIZE = int(os.getenv('JOBS_BATCH_SIZE', 10))
+JOBS_POLL_INTERVAL = float(os.getenv('JOBS_POLL_INTERVAL', 1.0))
+JOBS_LEASE_SECONDS = int(os.getenv('JOBS_LEASE_SECONDS', 300))
+JOBS_MAX_ATTEMPTS = int(os.getenv('JOBS_MAX_ATTEMPTS', 5))
+JOBS_RETRY_BASE_DELAY = float(os.getenv('JOBS_RETRY_BASE_DELAY', 5.0))
+JOBS_RETRY_MAX_DELAY = float(os.getenv('JOBS_RETRY_MAX_DELAY', 3600.0))
+JOBS_REPORT_INTERVAL = float(os.getenv('JOBS_REPORT_INTERVAL', 60.0))
+JOBS_FAILED_RETENTION_DAYS = int(os.getenv('JOBS_FAILED_RETENTION_DAYS', 7))
+
 # Internationalization
 # https://docs.djangoproject.com/en/3.1/topics/i18n/
 
@@ -188,9 +374,26 @@ LOGIN_REDIRECT_URL = '/'
 # https://docs.djangoproject.com/en/3.1/howto/static-files/
 
 STATIC_URL = '/static/'
-STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
+STATICFILES_DIRS = [
+    os.path.join(BASE_DIR, 'static'),
+    # The Vite build of client/ (npm run build), served under STATIC_URL + 'spa/'
+    ('spa', os.path.join(BASE_DIR, 'client', 'dist')),
+]
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
+# collectstatic writes content-hashed copies plus .gz and .br (with the
+# brotli package) next to them; {% static %} resolves through the manifest.
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage'},
+}
+# Cached for a year with Cache-Control: immutable: names hashed by Django,
+# and everything in the Vite build's assets/, which Vite hashes itself.
+WHITENOISE_IMMUTABLE_FILE_TEST = r'\.[0-9a-f]{12}\.\w+$|^' + re.escape(STATIC_URL) + r'spa/assets/'
+
+# Manifest written by vite build, read by {% vite_assets %} (see reddit_clone/vite.py)
+VITE_MANIFEST_PATH = os.path.join(BASE_DIR, 'client', 'dist', 'manifest.json')
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
@@ -0,0 +1,61 @@
+import copy
+import warnings
+
+from django.db import connections
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Run the tests with login throttling switched off, plain static storage,
+    reads from the primary only and background jobs run as they are queued.
+
+    Every test client request comes from 127.0.0.1 and many tests log in as
+    the same user, so the production limits would fail unrelated tests.
+    Throttling tests turn it back on with ``override_settings``. The
+    manifest storage would need a ``collectstatic`` run before any template
+    using ``{% static %}`` could render, and WhiteNoise would warn about the
+    missing ``STATIC_ROOT`` on every request handler.
+
+    Configured replicas are test mirrors of the primary, which can't see
+    the data of a test's open transaction, so no reads are routed to them.
+    Replica tests route to ``standby`` instead: a separate database,
+    created only for tests that ask for it, standing in for a replica.
+
+    Tests expect the effects of a request, like its search document, once
+    it returns; job queue tests turn ``JOBS_EAGER`` off.
+
+    Tests run without DEBUG in a single process, whose local memory cache
+    every request shares, so the shared cache check is silenced.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._overrides = override_settings(
+            THROTTLING_ENABLED=False,
+            STORAGES={
+                'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+                'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+            },
+            DATABASE_REPLICAS=[],
+            JOBS_EAGER=True,
+            SILENCED_SYSTEM_CHECKS=['reddit_clone.E003'],
+        )
+        self._overrides.enable()
+        self.add_standby_database()
+        warnings.filterwarnings('ignore', message='No directory at: ', category=UserWarning)
+
+    def teardown_test_environment(self, **kwargs):
+        self._overrides.disable()
+        super().teardown_test_environment(**kwargs)
+
+    def add_standby_database(self):
+        databases = connections.settings
+        if 'standby' in databases:
+            return
+        standby = copy.deepcopy(databases['default'])
+        standby['TEST'] = {**standby['TEST'], 'MIRROR': None}
+        if not standby['ENGINE'].endswith('sqlite3'):
+            standby['TEST']['NAME'] = f"{standby['TEST']['NAME'] or 'test_' + standby['NAME']}_standby"
+        databases['standby'] = standby
@@ -17,18 +17,25 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf.urls.static import static
 from reddit_clone import settings
+from django.views.decorators.cache import cache_page
 from django.views.generic import TemplateView
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
+from drf_spectacular.views import SpectacularSwaggerView
+from api.schema import PrecomputedSchemaView
+from reddit_clone.cache import cache_anonymous_page
 
 urlpatterns = [
-    path('', TemplateView.as_view(template_name='index.html'), name='home'),
+    path('', cache_anonymous_page()(TemplateView.as_view(template_name='index.html')), name='home'),
+    path('about', cache_anonymous_page()(TemplateView.as_view(template_name='about.html')), name='about'),
+    # The contact form renders a CSRF token, so it isn't page-cached.
+    path('contact', TemplateView.as_view(template_name='contact.html'), name='contact'),
     path('admin/', admin.site.urls),
     path('accounts/', include(('accounts.urls', 'accounts'), namespace='accounts')),
     path('api/', include(('api.urls', 'api'), namespace='api')),
-    path('api-schema/', SpectacularAPIView.as_view(), name='schema'),
+    path('api-schema/', PrecomputedSchemaView.as_view(), name='schema'),
     # Optional UI:
-    path('api-docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
+    path('api-docs/', cache_page(settings.PAGE_CACHE_TIMEOUT)(SpectacularSwaggerView.as_view(url_name='schema')), name='swagger-ui'),
 ]
 
+# Development only (static() is a no-op without DEBUG); static files are
+# served by WhiteNoise or nginx, media by nginx.
 urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
-urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
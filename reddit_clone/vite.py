@@ -0,0 +1,83 @@
+"""
+Template tags for the Vite build of the Vue client.
+
+``npm run build`` in ``client/`` writes ``client/dist/manifest.json``
+(see ``client/vite.config.js``), which maps each entry point to its
+content-hashed script, stylesheets and imported chunks. ``collectstatic``
+copies the build to ``STATIC_URL + 'spa/'``.
+
+    {% load vite %}
+    {% vite_assets 'index.html' %}
+
+renders the stylesheet, ``modulepreload`` and module script tags for an
+entry, or nothing when the client has not been built.
+
+The URLs use Vite's file names rather than the manifest storage's hashed
+copies: chunks import each other by those names, and a second URL for the
+same chunk would load it twice. Vite's names are already content-hashed,
+so they are served as immutable too (``WHITENOISE_IMMUTABLE_FILE_TEST``).
+"""
+
+import json
+import os
+
+from django import template
+from django.conf import settings
+from django.utils.html import format_html, format_html_join
+
+
+register = template.Library()
+
+SPA_PREFIX = 'spa/'
+
+_manifests = {}
+
+
+def load_manifest(path=None):
+    """The parsed manifest, re-read when the file changes; ``{}`` if missing."""
+    path = path or settings.VITE_MANIFEST_PATH
+    try:
+        mtime = os.stat(path).st_mtime
+    except FileNotFoundError:
+        return {}
+    cached = _manifests.get(path)
+    if cached is None or cached[0] != mtime:
+        with open(path) as f:
+            cached = _manifests[path] = (mtime, json.load(f))
+    return cached[1]
+
+
+def entry_files(manifest, entry):
+    """Return ``(script, stylesheets, preloads)`` for an entry and its static imports."""
+    stylesheets, preloads, seen = [], [], set()
+
+    def visit(name):
+        if name in seen:
+            return
+        seen.add(name)
+        chunk = manifest[name]
+        for imported in chunk.get('imports', ()):
+            visit(imported)
+            preloads.append(manifest[imported]['file'])
+        stylesheets.extend(chunk.get('css', ()))
+
+    visit(entry)
+    return manifest[entry]['file'], list(dict.fromkeys(stylesheets)), list(dict.fromkeys(preloads))
+
+
+def spa_url(name):
+    return f'{settings.STATIC_URL}{SPA_PREFIX}{name}'
+
+
+@register.simple_tag
+def vite_assets(entry='index.html'):
+    manifest = load_manifest()
+    if entry not in manifest:
+        return ''
+    script, stylesheets, preloads = entry_files(manifest, entry)
+    return format_html(
+        '{}{}<script type="module" crossorigin src="{}"></script>',
+        format_html_join('', '<link rel="stylesheet" crossorigin href="{}">\n', ((spa_url(f),) for f in stylesheets)),
+        format_html_join('', '<link rel="modulepreload" crossorigin href="{}">\n', ((spa_url(f),) for f in preloads)),
+        spa_url(script),
+    )